@@ -0,0 +1,213 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Batched accepts and accept-rate figures, for connection storms.
+
+The ansar runtime accepts a single connection for every readiness of
+a listening socket, i.e. a storm of connects (e.g. thousands of clients
+reconnecting after a network blip) costs a trip around the select loop
+for each one. A call to batch_accept(), before ar.listen(), arranges for
+up to the batch size of pending connections to be accepted on each
+readiness. Further connections are detected with a zero-timeout select
+on the listening socket, i.e. the accepts stop as soon as the queue is
+empty.
+
+Figures are collected from two places;
+
+* AcceptCounters - readiness events, accepts and failed accepts,
+  counted by the batched accept. The largest batch shows whether the
+  batch size is ever reached. A failed accept (i.e. NotAccepted sent
+  to the listener) ends the batch and is not counted as accepted,
+* the kernel - the current depth of the accept queue of the
+  listening port (/proc/net/tcp) and the system-wide count of
+  listen overflows and drops (/proc/net/netstat). Overflows are
+  connects that completed the handshake but found the accept queue
+  full, drops include SYNs discarded for a full SYN backlog.
+
+An AcceptSampler turns successive readings into an AcceptMetrics
+message, i.e. rates and changes over the period. Kernel figures are
+for Linux and are left as None elsewhere.
+'''
+import time
+import select
+import ansar.connect as ar
+
+__all__ = [
+	'AcceptCounters',
+	'AcceptMetrics',
+	'AcceptSampler',
+	'batch_accept',
+	'counters',
+	'accept_queue',
+	'listen_overflows',
+]
+
+class AcceptCounters(object):
+	"""Running totals of the batched accept."""
+	def __init__(self):
+		self.events = 0
+		self.accepted = 0
+		self.failed = 0
+		self.largest = 0
+
+counters = AcceptCounters()
+
+class Accepting(object):
+	"""The listening socket, as seen by a single accept. Notes success."""
+	def __init__(self, s):
+		self.s = s
+		self.accepted = False
+
+	def accept(self):
+		a = self.s.accept()
+		self.accepted = True
+		return a
+
+def batch_accept(batch=1):
+	"""Accept up to batch connections for each readiness of a listening socket. Return True on success."""
+	try:
+		from ansar.connect import socketry
+	except ImportError:
+		return False
+	batch = max(batch or 1, 1)
+	key = (socketry.TcpServer, socketry.ReceiveBlock)
+	table = socketry.select_table
+	single = getattr(table[key], 'single', table[key])
+
+	def batched(self, server, s):
+		n = 0
+		while n < batch:
+			if n > 0:						# Readiness means at least one.
+				r, _, _ = select.select([s], [], [], 0)
+				if not r:
+					break
+			a = Accepting(s)
+			single(self, server, a)
+			if not a.accepted:
+				counters.failed += 1
+				break
+			n += 1
+		counters.events += 1
+		counters.accepted += n
+		if n > counters.largest:
+			counters.largest = n
+
+	batched.single = single				# For a later batch_accept().
+	table[key] = batched
+	return True
+
+#
+#
+def accept_queue(port):
+	"""Current depth of the accept queue for the listening port. Return an int or None."""
+	for name in ('/proc/net/tcp', '/proc/net/tcp6'):
+		try:
+			with open(name) as f:
+				next(f)
+				for line in f:
+					field = line.split()
+					if field[3] != '0A':			# LISTEN.
+						continue
+					if int(field[1].split(':')[1], 16) != port:
+						continue
+					return int(field[4].split(':')[1], 16)
+		except (OSError, StopIteration, IndexError, ValueError):
+			continue
+	return None
+
+def listen_overflows():
+	"""System-wide counts of listen overflows and drops. Return a tuple or None."""
+	try:
+		with open('/proc/net/netstat') as f:
+			lines = f.read().splitlines()
+	except OSError:
+		return None
+	for names, values in zip(lines[0::2], lines[1::2]):
+		if not names.startswith('TcpExt:'):
+			continue
+		table = dict(zip(names.split()[1:], values.split()[1:]))
+		try:
+			return int(table['ListenOverflows']), int(table['ListenDrops'])
+		except (KeyError, ValueError):
+			return None
+	return None
+
+class AcceptMetrics(object):
+	def __init__(self, seconds=None, accepted=0, rate=None, events=0, mean_batch=None, largest_batch=0,
+			queue_depth=None, overflows=None, drops=None):
+		self.seconds = seconds
+		self.accepted = accepted
+		self.rate = rate
+		self.events = events
+		self.mean_batch = mean_batch
+		self.largest_batch = largest_batch
+		self.queue_depth = queue_depth
+		self.overflows = overflows
+		self.drops = drops
+
+ACCEPT_METRICS_SCHEMA = {
+	'seconds': ar.Float8(),
+	'accepted': int,
+	'rate': ar.Float8(),
+	'events': int,
+	'mean_batch': ar.Float8(),
+	'largest_batch': int,
+	'queue_depth': int,
+	'overflows': int,
+	'drops': int,
+}
+
+ar.bind(AcceptMetrics, object_schema=ACCEPT_METRICS_SCHEMA)
+
+class AcceptSampler(object):
+	"""Figures for the listening port, over the period since the previous sample.
+
+	:param port: the listening port
+	:type port: int
+	"""
+	def __init__(self, port):
+		self.port = port
+		self.taken = time.monotonic()
+		self.events = counters.events
+		self.accepted = counters.accepted
+		self.kernel = listen_overflows()
+
+	def sample(self):
+		"""Return the AcceptMetrics since the previous call, or since creation."""
+		t = time.monotonic()
+		events = counters.events
+		accepted = counters.accepted
+		kernel = listen_overflows()
+		depth = accept_queue(self.port)
+
+		seconds = t - self.taken
+		m = AcceptMetrics(seconds=seconds, accepted=accepted - self.accepted, events=events - self.events,
+			largest_batch=counters.largest, queue_depth=depth)
+		m.rate = m.accepted / seconds if seconds > 0.0 else None
+		m.mean_batch = m.accepted / m.events if m.events else None
+		if kernel is not None and self.kernel is not None:
+			m.overflows = kernel[0] - self.kernel[0]
+			m.drops = kernel[1] - self.kernel[1]
+
+		self.taken, self.events, self.accepted, self.kernel = t, events, accepted, kernel
+		counters.largest = 0
+		return m
@@ -0,0 +1,226 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''NumPy arrays as messages, for the packed codec.
+
+A numeric vector declared as ar.VectorOf(ar.Float8()) is encoded one
+element at a time, i.e. a Python float for every element, at both
+ends. A NumericArray carries the dtype and shape of an array and a
+single block of the raw, contiguous bytes;
+
+* numeric_array() wraps an existing array without a copy, i.e. the
+  block is a memoryview of the array buffer,
+* the packed codec (see packing.py) appends the header and then the
+  block to the bytearray of the outgoing Packed envelope, i.e. one copy
+  of the bytes, and the runtime copies them again as it encodes the
+  envelope (base64). There is no element-by-element encoding,
+* at the receiver the array is rebuilt by numpy.frombuffer() over
+  the bytes of the received envelope, i.e. without a copy. The bytes
+  are aligned to ALIGNMENT within the envelope.
+
+Frames of the ansar runtime are limited to 1MB and a packed block
+is expanded by a third on the way (base64). Larger arrays are sent
+as a sequence of segments, each a NumericArray covering a range of
+the bytes, i.e. offset and total. array_segments() produces the
+segments as views of the one array buffer and an ArrayAssembly at
+the receiver copies them into place, i.e. the one copy needed to
+bring separate frames together. Segments of an array arrive in order
+over the one connection, i.e. each starts where the previous ended. An
+assembly rejects a segment at any other offset (e.g. a repeat or an
+overlap) or that does not match the dtype, shape and total of the
+array in progress. The start of the next array abandons an incomplete
+one.
+
+A NumericArray may be a message in its own right or a field of
+another message, declared as ar.UserDefined(NumericArray). Messages
+holding a memoryview must not be copied, i.e. they are bound with
+copy_before_sending=False. A NumericArray is intended for sessions
+that have agreed on the packed codec. The default codec accepts a
+bytearray block, e.g. bytearray(m.block), at the cost of a copy.
+
+The values of a rebuilt array share memory with the envelope, i.e.
+a receiver that holds on to many small arrays of large messages may
+want a copy().
+
+NumPy is optional for the other modules. Where it is not installed,
+the functions of this module raise PackingError.
+'''
+import struct
+import ansar.connect as ar
+from packing import PackingError, LENGTH, custom_codec
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+__all__ = [
+	'NumericArray',
+	'numeric_array',
+	'array_segments',
+	'array_of',
+	'ArrayAssembly',
+	'ALIGNMENT',
+	'SEGMENT',
+]
+
+ALIGNMENT = 16				# Of the array bytes within a packed block.
+SEGMENT = 512 * 1024		# Bytes, i.e. well within a frame after base64.
+
+DIMENSION = struct.Struct('<q')
+
+class NumericArray(object):
+	def __init__(self, dtype=None, shape=None, offset=0, total=0, block=None):
+		self.dtype = dtype
+		self.shape = shape or []
+		self.offset = offset
+		self.total = total
+		self.block = block or bytearray()
+
+NUMERIC_ARRAY_SCHEMA = {
+	'dtype': str,
+	'shape': ar.VectorOf(ar.Integer8()),
+	'offset': ar.Integer8(),
+	'total': ar.Integer8(),
+	'block': ar.Block(),
+}
+
+ar.bind(NumericArray, object_schema=NUMERIC_ARRAY_SCHEMA, copy_before_sending=False)
+
+def required():
+	if numpy is None:
+		raise PackingError('numpy is not installed')
+
+def contiguous(a):
+	required()
+	a = numpy.ascontiguousarray(a)		# No copy unless the array is strided.
+	if a.dtype.hasobject:
+		raise PackingError(f'cannot send array of "{a.dtype}"')
+	return a
+
+def numeric_array(a):
+	"""Wrap an array for sending. Return a NumericArray sharing the buffer of the array."""
+	a = contiguous(a)
+	return NumericArray(a.dtype.str, list(a.shape), 0, a.nbytes, memoryview(a).cast('B'))
+
+def array_segments(a, size=SEGMENT):
+	"""Wrap an array for sending in parts. Return a list of NumericArray, one for each segment."""
+	a = contiguous(a)
+	b = memoryview(a).cast('B')
+	n = a.nbytes
+	dtype, shape = a.dtype.str, list(a.shape)
+	if n <= size:
+		return [NumericArray(dtype, shape, 0, n, b)]
+	return [NumericArray(dtype, shape, i, n, b[i:i + size]) for i in range(0, n, size)]
+
+def array_of(m):
+	"""Recover the array from a received NumericArray. Return a numpy array over the block."""
+	required()
+	try:
+		dtype = numpy.dtype(m.dtype)
+		return numpy.frombuffer(m.block, dtype=dtype).reshape(m.shape)
+	except (TypeError, ValueError) as e:
+		raise PackingError(f'cannot rebuild array ({e})')
+
+class ArrayAssembly(object):
+	"""Rebuild arrays from segments, one array at a time."""
+	def __init__(self):
+		self.buffer = None
+		self.header = None
+		self.received = 0
+		self.abandoned = 0
+
+	def reset(self):
+		self.buffer = None
+		self.header = None
+		self.received = 0
+
+	def add(self, m):
+		"""Accept the next segment. Return the array when complete, or None. Raise PackingError."""
+		n = len(m.block)
+		if m.offset < 0 or m.total < 0:
+			self.reset()
+			raise PackingError(f'segment at {m.offset} of {m.total} bytes is not possible')
+		if m.offset == 0 and self.buffer is not None:		# Start of the next array.
+			self.abandoned += 1
+			self.reset()
+		if self.buffer is None:
+			if m.offset == 0 and n == m.total:		# Not segmented.
+				return array_of(m)
+			if m.offset != 0:
+				raise PackingError(f'segment at {m.offset} without the start of an array')
+			required()
+			self.buffer = numpy.empty(m.total, dtype=numpy.uint8)
+			self.header = (m.dtype, list(m.shape), m.total)
+		elif (m.dtype, list(m.shape), m.total) != self.header:
+			self.reset()
+			raise PackingError(f'segment at {m.offset} does not match the array in progress')
+		elif m.offset != self.received:
+			raise PackingError(f'segment at {m.offset} is not the next, expected {self.received}')
+		if m.offset + n > len(self.buffer):
+			self.reset()
+			raise PackingError(f'segment at {m.offset} exceeds array of {m.total} bytes')
+		self.buffer[m.offset:m.offset + n] = numpy.frombuffer(m.block, dtype=numpy.uint8)
+		self.received += n
+		if self.received < len(self.buffer):
+			return None
+		b = self.buffer
+		self.reset()
+		return array_of(NumericArray(m.dtype, m.shape, 0, len(b), b.data))
+
+def array_codec():
+	"""Put and get for a NumericArray, i.e. header, padding and the raw bytes."""
+	def put(b, v):
+		e = v.dtype.encode('ascii')
+		block = v.block
+		n = block.nbytes if isinstance(block, memoryview) else len(block)
+		b.append(len(e))
+		b += e
+		b.append(len(v.shape))
+		for d in v.shape:
+			b += DIMENSION.pack(d)
+		b += DIMENSION.pack(v.offset)
+		b += DIMENSION.pack(v.total)
+		b += LENGTH.pack(n)
+		b += bytes(-len(b) % ALIGNMENT)
+		b += block
+
+	def get(m, i):
+		k = m[i]
+		dtype = str(m[i + 1:i + 1 + k], 'ascii')
+		i += 1 + k
+		r = m[i]
+		i += 1
+		shape = [DIMENSION.unpack_from(m, i + j * DIMENSION.size)[0] for j in range(r)]
+		i += r * DIMENSION.size
+		offset = DIMENSION.unpack_from(m, i)[0]
+		total = DIMENSION.unpack_from(m, i + DIMENSION.size)[0]
+		i += 2 * DIMENSION.size
+		n = LENGTH.unpack_from(m, i)[0]
+		i += LENGTH.size
+		i += -i % ALIGNMENT
+		if i + n > len(m):
+			raise PackingError(f'array of {n} bytes exceeds block')
+		return NumericArray(dtype, shape, offset, total, m[i:i + n]), i + n
+	return put, get
+
+custom_codec(NumericArray, array_codec)
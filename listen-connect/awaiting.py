@@ -0,0 +1,239 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Asyncio access to the messaging of an ansar object.
+
+A function object such as the client in connect-client-ask.py makes its
+requests with the blocking self.ask() and self.select() methods. That
+requires a thread for every object that is waiting. This module allows
+the same exchanges to be written as coroutines, within an asyncio event
+loop running on the thread of a single function object;
+
+* await aw.ask() - send a request and wait for the response,
+* await aw.select() - wait for a message sent to the function object,
+* await aw.ready() - create a GroupTable and wait for Ready.
+
+Each ask() is carried by an instance of Asker, a small machine that
+has no thread of its own. The response is passed back to the loop as
+the completion of that machine, i.e. thousands of concurrent requests
+are thousands of coroutines and lightweight machines, not threads.
+Networking remains with the ansar runtime.
+
+Messages sent to the function object itself (e.g. Connected, Stop) are
+passed to the loop by a single pump thread, for collection by select().
+A Stop also sets aw.stopping, an asyncio.Event, i.e. a coroutine can
+wait for a Stop while others are selecting other messages.
+
+Usage;
+	def client(self, settings):
+		return awaiting.run(self, session, settings)
+
+where session is a coroutine function accepting an Awaiting and the
+remaining arguments.
+'''
+import asyncio
+import threading
+import ansar.connect as ar
+
+__all__ = [
+	'Asker',
+	'Awaiting',
+	'run',
+]
+
+# Closing of the pump.
+class Release(object):
+	pass
+
+ar.bind(Release)
+
+# Carry a single request-response. The
+# response is the completion value, whether
+# it matches or not.
+class INITIAL: pass
+class ASKING: pass
+
+class Asker(ar.Point, ar.StateMachine):
+	def __init__(self, request, matching, address, seconds=None):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.request = request
+		self.matching = matching
+		self.server = address
+		self.seconds = seconds
+
+def Asker_INITIAL_Start(self, message):
+	self.send(self.request, self.server)
+	if self.seconds:
+		self.start(ar.T1, self.seconds)
+	return ASKING
+
+def Asker_ASKING_T1(self, message):				# Took too long.
+	self.complete(ar.SelectTimer())
+
+def Asker_ASKING_Stop(self, message):			# Cancelled.
+	self.complete(ar.Aborted())
+
+def Asker_ASKING_Unknown(self, message):		# Response, matching or not.
+	if not isinstance(message, self.matching) and ar.Other in self.matching:
+		self.complete(ar.Other(message))
+	self.complete(message)
+
+ASKER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	ASKING: (
+		(ar.T1, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Asker, ASKER_DISPATCH)
+
+#
+#
+def resolve(future, value):
+	if not future.done():
+		future.set_result(value)
+
+class Awaiting(object):
+	"""Coroutine versions of the blocking methods of a function object.
+
+	:param point: the function object, i.e. the self passed to it
+	:type point: ansar object
+	"""
+	def __init__(self, point):
+		self.point = point
+		self.loop = None
+		self.inbox = None
+		self.saved = []
+		self.pump = None
+		self.return_address = None
+		self.stopping = None
+
+	async def __aenter__(self):
+		self.loop = asyncio.get_running_loop()
+		self.inbox = asyncio.Queue()
+		self.stopping = asyncio.Event()
+		self.pump = threading.Thread(target=self.pumping, daemon=True)
+		self.pump.start()
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		self.point.send(Release(), self.point.address)
+		await self.loop.run_in_executor(None, self.pump.join)
+
+	def pumping(self):
+		"""Pass every message sent to the function object over to the loop."""
+		while True:
+			m = self.point.input()
+			if isinstance(m, Release):
+				break
+			self.loop.call_soon_threadsafe(self.inbox.put_nowait, (m, self.point.return_address))
+			if isinstance(m, ar.Stop):
+				self.loop.call_soon_threadsafe(self.stopping.set)
+
+	async def ask(self, request, matching, address, seconds=None):
+		"""Send the request and wait for the response. Return the response, SelectTimer or Aborted.
+
+		A response that is not one of the matching types is returned
+		as it is, or wrapped in Other where Other is matching.
+		"""
+		if not isinstance(matching, tuple):
+			matching = (matching,)
+		loop = self.loop
+		future = loop.create_future()
+
+		def ending(value, parent, address):
+			loop.call_soon_threadsafe(resolve, future, value)
+
+		a = self.point.create(Asker, request, matching, address, seconds, object_ending=ending)
+		try:
+			return await future
+		except asyncio.CancelledError:
+			self.point.send(ar.Stop(), a)
+			raise
+
+	async def select(self, *matching, saving=None, seconds=None):
+		"""Wait for one of the matching messages. Return the message.
+
+		Behaves as the select() of a function object. Messages
+		that are neither matched or saved are dropped. The sender
+		of the returned message is available as return_address.
+		"""
+		saving = saving or ()
+		def matched(m):
+			if isinstance(m, matching):
+				return m
+			if ar.Other in matching:
+				return ar.Other(m)
+			return None
+
+		for i, (m, r) in enumerate(self.saved):
+			s = matched(m)
+			if s is not None:
+				del self.saved[i]
+				self.return_address = r
+				return s
+
+		deadline = self.loop.time() + seconds if seconds else None
+		while True:
+			try:
+				if deadline is None:
+					m, r = await self.inbox.get()
+				else:
+					m, r = await asyncio.wait_for(self.inbox.get(), max(deadline - self.loop.time(), 0.0))
+			except asyncio.TimeoutError:
+				return ar.SelectTimer()
+			s = matched(m)
+			if s is not None:
+				self.return_address = r
+				return s
+			if saving == ar.Unknown or isinstance(m, saving):
+				self.saved.append((m, r))
+
+	async def ready(self, group, seconds=None):
+		"""Create the group and wait for it to be ready. Return the group address and the final message.
+
+		The final message is Ready, Completed or Stop, as for the loop
+		in group-table.py.
+		"""
+		a = group.create(self.point, seconds=seconds)
+		while True:
+			m = await self.select(ar.GroupUpdate, ar.Ready, ar.Completed, ar.Stop)
+			if isinstance(m, ar.GroupUpdate):
+				group.update(m)
+				continue
+			return a, m
+
+	async def stop(self, address):
+		"""Terminate a child object and wait for completion. Return the completion value."""
+		self.point.send(ar.Stop(), address)
+		m = await self.select(ar.Completed, saving=ar.Unknown)
+		return m.value
+
+def run(point, main, *args):
+	"""Run the coroutine function within a new event loop, on the thread of the function object. Return its result."""
+	async def awaiting():
+		async with Awaiting(point) as aw:
+			return await main(aw, *args)
+	return asyncio.run(awaiting())
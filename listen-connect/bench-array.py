@@ -0,0 +1,202 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Throughput of NumPy arrays as NumericArray messages, 1KB to 100MB.
+
+For each size, an array of float64 values is sent as a NumericArray
+(see arraying.py) and, up to the vector limit, as a message with an
+ar.VectorOf(ar.Float8()) field, i.e. the generic declaration of a
+numeric vector. Both travel with the packed codec (see packing.py).
+Arrays larger than a segment are sent as a sequence of NumericArray
+segments. Measures;
+
+* pack - from the array to the Packed envelopes,
+* unpack - from the envelopes to the rebuilt array,
+* transfer - from the array to an Ack from a responder that has
+  rebuilt the array, over a connection within this process.
+
+Figures are in MB/s of array bytes. The transfer figures include the
+encoding of the envelope and the recovery of frames by the ansar
+runtime, which is the same for both kinds of message and, for the
+larger arrays, the bulk of the time. The vector figures stop at the limit, i.e. a
+vector cannot be segmented and must fit in a single frame.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import ansar.connect as ar
+from packing import Packing, Encoding, Packed, PACKED_CODEC
+from arraying import NumericArray, ArrayAssembly, array_segments
+from benchmarking import BenchReport, per_call
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class Settings(object):
+	def __init__(self, repeat=None, sizes=None, volume=None, vector_limit=None, seconds=None):
+		self.repeat = repeat
+		self.sizes = sizes or []
+		self.volume = volume
+		self.vector_limit = vector_limit
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'sizes': ar.VectorOf(int),
+	'volume': int,
+	'vector_limit': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The generic declaration.
+class NumericVector(object):
+	def __init__(self, values=None):
+		self.values = values or []
+
+NUMERIC_VECTOR_SCHEMA = {
+	'values': ar.VectorOf(ar.Float8()),
+}
+
+ar.bind(NumericVector, object_schema=NUMERIC_VECTOR_SCHEMA)
+
+PACKING = Packing(ar.Ack, NumericArray, NumericVector)
+
+def vector(a):
+	return [NumericVector(a.tolist())]
+
+def rebuild(assembly, m):
+	"""Pass the message to the assembly. Return the array when complete, or None."""
+	if isinstance(m, NumericArray):
+		return assembly.add(m)
+	return numpy.array(m.values)
+
+def pack(wrap, a):
+	return [PACKING.pack(m) for m in wrap(a)]
+
+def unpack(packed):
+	assembly = ArrayAssembly()
+	for p in packed:
+		a = rebuild(assembly, PACKING.unpack(p))
+	return a
+
+# Other end of the transfer.
+def responder(self):
+	encoding = Encoding(PACKING, codec=PACKED_CODEC)
+	assembly = ArrayAssembly()
+	ar.listen(self, ar.HostPort('127.0.0.1', 0))
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	self.send(m, self.parent_address)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	while True:
+		m = self.select(Packed, ar.Accepted, ar.Abandoned, ar.Closed, ar.Stop)
+		if isinstance(m, Packed):
+			a = rebuild(assembly, encoding.inbound(m))
+			if a is not None:
+				self.reply(ar.Ack())
+		elif isinstance(m, ar.Stop):
+			return ar.Aborted()
+
+ar.bind(responder)
+
+def transfer(self, server, a, wrap, number, seconds):
+	"""Send and wait for the Ack, number times. Return microseconds per transfer or a failure."""
+	encoding = Encoding(PACKING, codec=PACKED_CODEC)
+	t = time.perf_counter()
+	for _ in range(number):
+		for s in wrap(a):
+			self.send(encoding.outbound(s), server)
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=seconds)
+		if not isinstance(m, ar.Ack):
+			return m
+	return (time.perf_counter() - t) * 1000000.0 / number
+
+def measure(self, server, name, n, wrap, settings, report):
+	a = numpy.arange(n // 8, dtype=numpy.float64)
+	number = max(1, settings.volume // n)
+	p = pack(wrap, a)
+	packing = per_call(lambda: pack(wrap, a), settings.repeat, number)
+	unpacking = per_call(lambda: unpack(p), settings.repeat, number)
+
+	samples = []
+	for _ in range(settings.repeat):
+		us = transfer(self, server, a, wrap, number, settings.seconds)
+		if not isinstance(us, float):
+			return us
+		samples.append(n / us)
+
+	report.add(f'{name}/{n}/pack', 'MB/s', [n / us for us in packing])
+	report.add(f'{name}/{n}/unpack', 'MB/s', [n / us for us in unpacking])
+	report.add(f'{name}/{n}/transfer', 'MB/s', samples)
+	return None
+
+def bench(self, settings):
+	if numpy is None:
+		return ar.Faulted('cannot benchmark arrays', 'numpy is not installed')
+
+	r = self.create(responder)
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	def stop():
+		self.send(ar.Stop(), r)
+		self.select(ar.Completed)
+
+	ar.connect(self, m.listening_ipp)
+	m = self.select(ar.Connected, ar.NotConnected, ar.Stop)
+	if not isinstance(m, ar.Connected):
+		stop()
+		return m
+	server = self.return_address
+
+	report = BenchReport('array')
+	for n in settings.sizes:
+		m = measure(self, server, 'array', n, array_segments, settings, report)
+		if m is None and n <= settings.vector_limit:
+			m = measure(self, server, 'vector', n, vector, settings, report)
+		if m is not None:
+			stop()
+			return ar.Aborted() if isinstance(m, ar.Stop) else m
+
+	self.send(ar.Close(), server)
+	self.select(ar.Closed, ar.Abandoned, seconds=settings.seconds)
+	stop()
+	return report
+
+ar.bind(bench)
+
+#
+#
+KB = 1024
+MB = 1024 * KB
+
+factory_settings = Settings(repeat=3, sizes=[KB, 10 * KB, 100 * KB, MB, 10 * MB, 100 * MB],
+	volume=10 * MB, vector_limit=100 * KB, seconds=60.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
@@ -0,0 +1,169 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Benchmark of concurrent requests, threaded objects against asyncio.
+
+Measures the time to complete a batch of concurrent Enquiry-Ack
+exchanges with a local responder, in two ways;
+* threaded - each request is a function object calling self.ask(),
+  i.e. a thread per request,
+* asyncio - each request is an await of aw.ask() (see awaiting.py),
+  i.e. a coroutine and a lightweight machine per request.
+
+The responder is a machine within the same process. It holds each
+request for the configured delay, standing in for the latency of a
+remote server, so that the requests of a batch are truly concurrent.
+There is no networking and the figures are the cost of the concurrency
+model. The number of threads in the process is also recorded, once all
+the requests of a batch are in flight. Ansar timers have a resolution
+of a quarter second and shorter delays expire immediately.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import asyncio
+import threading
+import ansar.connect as ar
+import awaiting
+from benchmarking import BenchReport
+
+# How much to measure.
+class Settings(object):
+	def __init__(self, repeat=None, concurrency=None, delay=None, seconds=None):
+		self.repeat = repeat
+		self.concurrency = concurrency or []
+		self.delay = delay
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'concurrency': ar.VectorOf(int),
+	'delay': float,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Local server.
+class INITIAL: pass
+class RUNNING: pass
+
+class Responder(ar.Point, ar.StateMachine):
+	def __init__(self, delay):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.delay = delay
+		self.pending = []
+
+def Responder_INITIAL_Start(self, message):
+	return RUNNING
+
+def Responder_RUNNING_Enquiry(self, message):
+	if not self.delay:
+		self.reply(ar.Ack())
+		return RUNNING
+	if not self.pending:
+		self.start(ar.T1, self.delay)
+	self.pending.append(self.return_address)
+	return RUNNING
+
+def Responder_RUNNING_T1(self, message):		# Release the held requests.
+	for a in self.pending:
+		self.send(ar.Ack(), a)
+	self.pending = []
+	return RUNNING
+
+def Responder_RUNNING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+RESPONDER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, ar.T1, ar.Stop), ()
+	),
+}
+
+ar.bind(Responder, RESPONDER_DISPATCH)
+
+# Threaded model.
+def asking(self, responder, seconds):
+	return self.ask(ar.Enquiry(), (ar.Ack, ar.Nak), responder, seconds=seconds)
+
+ar.bind(asking)
+
+def threaded(self, responder, n, seconds):
+	"""Run n concurrent requests as function objects. Return the elapsed seconds and peak threads."""
+	started = time.perf_counter()
+	for _ in range(n):
+		self.create(asking, responder, seconds)
+	peak = threading.active_count()
+	for _ in range(n):
+		self.select(ar.Completed)
+	return time.perf_counter() - started, peak
+
+# Asyncio model.
+async def concurrent(aw, responder, n, seconds):
+	started = time.perf_counter()
+	asks = [asyncio.ensure_future(aw.ask(ar.Enquiry(), (ar.Ack, ar.Nak), responder, seconds=seconds)) for _ in range(n)]
+	await asyncio.sleep(0)					# Every ask has started.
+	peak = threading.active_count()
+	await asyncio.gather(*asks)
+	return time.perf_counter() - started, peak
+
+def bench(self, settings):
+	repeat = settings.repeat or 5
+	seconds = settings.seconds or 10.0
+	report = BenchReport('asyncio')
+
+	responder = self.create(Responder, settings.delay)
+
+	for n in settings.concurrency:
+		elapsed, threads = [], []
+		for _ in range(repeat):
+			e, t = threaded(self, responder, n, seconds)
+			elapsed.append(e * 1000.0)
+			threads.append(t)
+		report.add(f'threaded/{n}/elapsed', 'ms', elapsed)
+		report.add(f'threaded/{n}/threads', 'threads', threads)
+
+		elapsed, threads = [], []
+		for _ in range(repeat):
+			e, t = awaiting.run(self, concurrent, responder, n, seconds)
+			elapsed.append(e * 1000.0)
+			threads.append(t)
+		report.add(f'asyncio/{n}/elapsed', 'ms', elapsed)
+		report.add(f'asyncio/{n}/threads', 'threads', threads)
+
+	self.send(ar.Stop(), responder)
+	self.select(ar.Completed)
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(repeat=5, concurrency=[10, 100, 1000], delay=0.5, seconds=10.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
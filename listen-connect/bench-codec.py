@@ -0,0 +1,134 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Benchmark of the default ansar codec against the packed codec.
+
+Measures the cost of encoding and decoding a small selection of
+messages and the number of bytes produced. The small messages (i.e.
+Enquiry and Ack) are the typical request and response of the other
+examples. ConnectSettings is a copy of the settings used by the
+connect-client-codec.py example, i.e. a larger registered class with
+nested structure.
+
+For the packed codec there are two sets of figures. The "pack"
+figures cover the reduction of a message to a block of bytes. The
+"encode" figures cover what happens during a send, i.e. the pack and
+then the encoding of the Packed envelope by the networking machinery.
+Bytes on the wire are the size of the encoded envelope.
+
+The "session" figures are for the full send and receive paths of a
+session using the packed codec (see Encoding in packing.py), i.e. the
+Enquiry and Ack and other small messages are sent as they are. The
+"compressed" figures are for a session that agreed on zlib compression
+with the default codec. ServerList is large enough to pass the default
+compression threshold.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import ansar.connect as ar
+from packing import Packing, Encoding, ServerList, ANSAR_CODEC, PACKED_CODEC, ZLIB_COMPRESSION
+from benchmarking import BenchReport, per_call, REPEAT, NUMBER
+
+# How much to measure.
+class Settings(object):
+	def __init__(self, repeat=None, number=None):
+		self.repeat = repeat
+		self.number = number
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'number': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# A larger, registered message.
+class ConnectSettings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, codec=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.seconds = seconds
+		self.codec = codec
+
+CONNECT_SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'seconds': float,
+	'codec': str,
+}
+
+ar.bind(ConnectSettings, object_schema=CONNECT_SETTINGS_SCHEMA)
+
+PACKING = Packing(ar.Enquiry, ar.Ack, ar.Nak, ConnectSettings, ServerList)
+
+SAMPLE = (
+	('Enquiry', ar.Enquiry()),
+	('Ack', ar.Ack()),
+	('ConnectSettings', ConnectSettings(ar.HostPort('127.0.0.1', 5015), 3.0, 'packed')),
+	('ServerList', ServerList([ar.HostPort(f'10.0.{i // 250}.{i % 250}', 5011) for i in range(500)])),
+)
+
+SESSION = (
+	('session', PACKED_CODEC, None),
+	('compressed', ANSAR_CODEC, ZLIB_COMPRESSION),
+)
+
+def bench(self, settings):
+	repeat = settings.repeat or REPEAT
+	number = settings.number or NUMBER
+	codec = ar.CodecJson()
+	report = BenchReport('codec')
+
+	for name, m in SAMPLE:
+		# Default codec.
+		s = codec.encode(m, ar.Any())
+		report.add(f'{name}/ansar/encode', 'us', per_call(lambda: codec.encode(m, ar.Any()), repeat, number))
+		report.add(f'{name}/ansar/decode', 'us', per_call(lambda: codec.decode(s, ar.Any()), repeat, number))
+		report.add(f'{name}/ansar/bytes', 'bytes', [len(s.encode('utf-8'))])
+
+		# Packed codec.
+		p = PACKING.pack(m)
+		e = codec.encode(p, ar.Any())
+		report.add(f'{name}/packed/pack', 'us', per_call(lambda: PACKING.pack(m), repeat, number))
+		report.add(f'{name}/packed/unpack', 'us', per_call(lambda: PACKING.unpack(p), repeat, number))
+		report.add(f'{name}/packed/encode', 'us', per_call(lambda: codec.encode(PACKING.pack(m), ar.Any()), repeat, number))
+		report.add(f'{name}/packed/decode', 'us', per_call(lambda: PACKING.unpack(codec.decode(e, ar.Any())[0]), repeat, number))
+		report.add(f'{name}/packed/block', 'bytes', [len(p.block)])
+		report.add(f'{name}/packed/bytes', 'bytes', [len(e.encode('utf-8'))])
+
+		# Sessions, i.e. what is sent.
+		for label, session, compression in SESSION:
+			encoding = Encoding(PACKING, codec=session)
+			encoding.compression = compression
+			w = codec.encode(encoding.outbound(m), ar.Any())
+			report.add(f'{name}/{label}/encode', 'us', per_call(lambda: codec.encode(encoding.outbound(m), ar.Any()), repeat, number))
+			report.add(f'{name}/{label}/decode', 'us', per_call(lambda: encoding.inbound(codec.decode(w, ar.Any())[0]), repeat, number))
+			report.add(f'{name}/{label}/bytes', 'bytes', [len(w.encode('utf-8'))])
+
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(repeat=REPEAT, number=NUMBER)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
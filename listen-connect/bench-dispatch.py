@@ -0,0 +1,139 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Benchmark of the dispatch of messages to state machine handlers.
+
+Measures the raw cost of a call to received(), i.e. the lookup of the
+handler and the call of a handler that does nothing but return the
+next state. There is no queueing or threading. Three copies of the same
+machine are measured;
+
+* standard - ar.StateMachine, as bound by ar.bind(),
+* compiled - the Compiled base (see dispatching.py),
+* instrumented - the Instrumented base, i.e. compiled dispatch with
+  figures for each transition.
+
+Each is measured with an expected message (Enquiry) and with a message
+that falls through to the Unknown handler (Nak). Each is also measured
+with the execution trace on (the default) and off, i.e. as if bound with
+execution_trace=False. A trace is a log entry for every message, which
+is far more expensive than the lookup of the handler.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import ansar.connect as ar
+from dispatching import Compiled, Instrumented
+from benchmarking import BenchReport, per_call, REPEAT, NUMBER
+
+# How much to measure.
+class Settings(object):
+	def __init__(self, repeat=None, number=None):
+		self.repeat = repeat
+		self.number = number
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'number': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Three copies of the same machine.
+class INITIAL: pass
+class RUNNING: pass
+
+class Standard(ar.Point, ar.StateMachine):
+	def __init__(self):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+
+class Fast(Compiled, ar.Point, ar.StateMachine):
+	def __init__(self):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+
+class Counted(Instrumented, ar.Point, ar.StateMachine):
+	def __init__(self):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+
+def Standard_INITIAL_Start(self, message):
+	return RUNNING
+
+def Standard_RUNNING_Enquiry(self, message):
+	return RUNNING
+
+def Standard_RUNNING_Unknown(self, message):
+	return RUNNING
+
+Fast_INITIAL_Start = Standard_INITIAL_Start
+Fast_RUNNING_Enquiry = Standard_RUNNING_Enquiry
+Fast_RUNNING_Unknown = Standard_RUNNING_Unknown
+Counted_INITIAL_Start = Standard_INITIAL_Start
+Counted_RUNNING_Enquiry = Standard_RUNNING_Enquiry
+Counted_RUNNING_Unknown = Standard_RUNNING_Unknown
+
+DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, ar.Unknown), ()
+	),
+}
+
+ar.bind(Standard, DISPATCH)
+ar.bind(Fast, DISPATCH)
+ar.bind(Counted, DISPATCH)
+
+MACHINE = (
+	('standard', Standard),
+	('compiled', Fast),
+	('instrumented', Counted),
+)
+
+def bench(self, settings):
+	repeat = settings.repeat or REPEAT
+	number = settings.number or NUMBER
+	report = BenchReport('dispatch')
+	return_address = self.address
+
+	enquiry = ar.Enquiry()
+	nak = ar.Nak()
+	for trace in ('traced', 'untraced'):
+		for name, machine in MACHINE:
+			machine.__art__.execution_trace = trace == 'traced'
+			m = machine()
+			m.received(None, ar.Start(), return_address)
+			report.add(f'{name}/{trace}/expected', 'us', per_call(lambda: m.received(None, enquiry, return_address), repeat, number))
+			report.add(f'{name}/{trace}/unknown', 'us', per_call(lambda: m.received(None, nak, return_address), repeat, number))
+
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(repeat=REPEAT, number=100000)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
@@ -0,0 +1,169 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Time to Ready and memory of GroupTable and LargeGroup, by member count.
+
+Members are light machines within this process that deliver an
+address as soon as they start, i.e. the figures are for the group
+machinery rather than for networking. For each member count;
+
+* ready - milliseconds from the creation of the group to the Ready,
+  including the updates applied by the owner,
+* memory - peak KB per member allocated during a run (by tracemalloc,
+  in a separate run),
+* messages - updates (GroupTable) or batches (LargeGroup) received
+  by the owner.
+
+The GroupTable figures stop at the table limit, i.e. its readiness
+check grows with the square of the member count.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import tracemalloc
+import ansar.connect as ar
+from grouping import LargeGroup, GroupBatch
+from benchmarking import BenchReport
+
+class Settings(object):
+	def __init__(self, repeat=None, members=None, parallel=None, batch=None, table_limit=None, seconds=None):
+		self.repeat = repeat
+		self.members = members or []
+		self.parallel = parallel
+		self.batch = batch
+		self.table_limit = table_limit
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'members': ar.VectorOf(int),
+	'parallel': int,
+	'batch': int,
+	'table_limit': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# A member with an address from the start.
+class INITIAL: pass
+class READY: pass
+
+class Member(ar.Point, ar.StateMachine):
+	def __init__(self, group_address=None):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+
+def Member_INITIAL_Start(self, message):
+	self.send(ar.UseAddress(self.address), self.parent_address)
+	return READY
+
+def Member_READY_Stop(self, message):
+	self.complete(ar.Aborted())
+
+MEMBER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	READY: (
+		(ar.Stop,), ()
+	),
+}
+
+ar.bind(Member, MEMBER_DISPATCH, execution_trace=False)
+
+def table(n):
+	return {f'm{i}': ar.CreateFrame(Member) for i in range(n)}
+
+def group_table(self, n, settings):
+	return ar.GroupTable(**table(n))
+
+def large_group(self, n, settings):
+	return LargeGroup(table(n), parallel=settings.parallel, batch=settings.batch)
+
+def run(self, group, settings):
+	"""Create the group and wait for Ready. Return the seconds and messages, or a failure."""
+	started = time.perf_counter()
+	a = group.create(self)
+	messages = 0
+	while True:
+		m = self.select(ar.GroupUpdate, GroupBatch, ar.Ready, ar.Completed, ar.Stop, seconds=settings.seconds)
+		if isinstance(m, (ar.GroupUpdate, GroupBatch)):
+			group.update(m)
+			messages += 1
+			continue
+		break
+	t = time.perf_counter() - started
+
+	if isinstance(m, ar.Completed):
+		return m.value
+	self.send(ar.Stop(), a)
+	self.select(ar.Completed)
+	if isinstance(m, ar.Stop):
+		return ar.Aborted()
+	elif isinstance(m, ar.SelectTimer):
+		return ar.TimedOut(m)
+	return t, messages
+
+def measure(self, name, n, create, settings, report):
+	ready = []
+	for _ in range(settings.repeat):
+		r = run(self, create(self, n, settings), settings)
+		if not isinstance(r, tuple):
+			return r
+		ready.append(r[0] * 1000.0)
+		messages = r[1]
+
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	group = create(self, n, settings)
+	r = run(self, group, settings)
+	after = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	if not isinstance(r, tuple):
+		return r
+
+	report.add(f'{name}/{n}/ready', 'ms', ready)
+	report.add(f'{name}/{n}/memory', 'KB/member', [(after - before) / 1024.0 / n])
+	report.add(f'{name}/{n}/messages', 'messages', [messages])
+	return None
+
+def bench(self, settings):
+	report = BenchReport('group')
+	for n in settings.members:
+		m = None
+		if n <= settings.table_limit:
+			m = measure(self, 'table', n, group_table, settings, report)
+		m = m or measure(self, 'large', n, large_group, settings, report)
+		if m is not None:
+			return m
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(repeat=3, members=[10, 100, 500, 1000, 2000, 5000],
+	parallel=64, batch=64, table_limit=5000, seconds=120.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
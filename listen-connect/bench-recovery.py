@@ -0,0 +1,288 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Recovery latency of the connection objects, under injected faults.
+
+Runs a FaultProxy (see faulting.py) in front of listen-server.py and
+a stream of Enquiry requests through it, first with a ConnectToAddress
+and then with a GroupTable. Each trial injects a fault after a short
+warm-up and observes the recovery;
+
+* reset - all connections are aborted,
+* blackhole - all data is held for a few seconds,
+* restart - connections are aborted and refused for a few seconds.
+
+For each trial the figures are the seconds from the fault to;
+
+* detect - the NoAddress (or NotReady) notification,
+* usable - the next UseAddress (or Ready),
+* service - the response to the first request sent after the fault,
+
+and the outage, i.e. from NoAddress to UseAddress or from NotReady to
+Ready. Requests are lost when there is no address to send to, or when
+there is no response within the configured seconds. A fault that does
+not disturb the connection (e.g. a short blackhole) has no detect,
+usable or outage figures.
+
+A trial ends when service is restored and the connection object has
+recovered, plus a settling period. A trial that does not recover
+within the patience is counted as unrecovered. The GroupTable is
+created without a ready timer, i.e. it does not give up on its own.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import asyncio
+import ansar.connect as ar
+import awaiting
+from faulting import RESET, BLACKHOLE, REFUSE, CLEAR, FaultStep, FaultProxy, ProxyThread
+from benchmarking import BenchReport
+
+CONNECT_TO_ADDRESS = 'connect-to-address'
+GROUP_TABLE = 'group-table'
+MODES = (CONNECT_TO_ADDRESS, GROUP_TABLE)
+
+RESTART = 'restart'
+TRIALS = (RESET, BLACKHOLE, RESTART)
+
+class Settings(object):
+	def __init__(self, connecting_ipp=None, proxy_ipp=None, trials=None, seconds=None,
+			interval=None, warm=None, settle=None, patience=None, hold=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.proxy_ipp = proxy_ipp or ar.HostPort()
+		self.trials = trials
+		self.seconds = seconds
+		self.interval = interval
+		self.warm = warm
+		self.settle = settle
+		self.patience = patience
+		self.hold = hold
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'proxy_ipp': ar.UserDefined(ar.HostPort),
+	'trials': int,
+	'seconds': float,
+	'interval': float,
+	'warm': float,
+	'settle': float,
+	'patience': float,
+	'hold': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def steps(fault, hold):
+	if fault == RESET:
+		return [FaultStep(0.0, RESET)]
+	elif fault == BLACKHOLE:
+		return [FaultStep(0.0, BLACKHOLE, seconds=hold)]
+	return [FaultStep(0.0, REFUSE, seconds=hold), FaultStep(0.0, RESET)]
+
+# The status of the connection, driven by the
+# notifications of either object.
+class Link(object):
+	def __init__(self, mode, group=None):
+		self.mode = mode
+		self.group = group
+		self.server = None
+		if mode == CONNECT_TO_ADDRESS:
+			self.matching = (ar.UseAddress, ar.NoAddress)
+		else:
+			self.matching = (ar.GroupUpdate, ar.Ready, ar.NotReady)
+
+	def notified(self, m):
+		"""Update the status. Return True for up, False for down or None."""
+		if isinstance(m, ar.UseAddress):
+			self.server = m.address
+			return True
+		elif isinstance(m, ar.Ready):
+			self.server = self.group.server
+			return True
+		elif isinstance(m, (ar.NoAddress, ar.NotReady)):
+			self.server = None
+			return False
+		elif isinstance(m, ar.GroupUpdate):
+			self.group.update(m)
+		return None
+
+class Trial(object):
+	def __init__(self):
+		self.injected = None
+		self.detect = None
+		self.usable = None
+		self.service = None
+		self.sent = 0
+		self.lost = 0
+
+	def recovered(self):
+		if self.service is None:
+			return False
+		return self.detect is None or self.usable is not None
+
+async def request(aw, server, seconds, trial):
+	trial.sent += 1
+	sent = time.monotonic()
+	m = await aw.ask(ar.Enquiry(), (ar.Ack, ar.Nak), server, seconds=seconds)
+	if not isinstance(m, (ar.Ack, ar.Nak)):		# Timed out or aborted.
+		trial.lost += 1
+		return
+	if trial.injected is not None and sent >= trial.injected and trial.service is None:
+		trial.service = time.monotonic() - trial.injected
+
+async def run_trial(aw, settings, proxy, link, fault):
+	trial = Trial()
+	outstanding = set()
+	begun = time.monotonic()
+	inject = begun + settings.warm
+	tick = begun
+	ending = None
+	while True:
+		t = time.monotonic()
+		if trial.injected is None and t >= inject:
+			for s in steps(fault, settings.hold):
+				proxy.inject(s)
+			trial.injected = time.monotonic()
+		if t >= tick:
+			tick += settings.interval
+			if link.server is None:
+				trial.sent += 1
+				trial.lost += 1
+			else:
+				r = asyncio.ensure_future(request(aw, link.server, settings.seconds, trial))
+				outstanding.add(r)
+				r.add_done_callback(outstanding.discard)
+		if ending is None:
+			if trial.recovered():
+				ending = time.monotonic() + settings.settle
+			elif trial.injected is not None and t - trial.injected > settings.patience:
+				break
+		elif t >= ending:
+			break
+
+		wake = tick if ending is None else min(tick, ending)
+		if trial.injected is None:
+			wake = min(wake, inject)
+		m = await aw.select(*link.matching, ar.Completed, ar.Stop, seconds=max(wake - time.monotonic(), 0.001))
+		if isinstance(m, ar.SelectTimer):
+			continue
+		elif isinstance(m, (ar.Completed, ar.Stop)):
+			for r in outstanding:
+				r.cancel()
+			return m
+		up = link.notified(m)
+		if up is None or trial.injected is None:
+			continue
+		t = time.monotonic() - trial.injected
+		if up is False and trial.detect is None:
+			trial.detect = t
+		elif up is True and trial.detect is not None and trial.usable is None:
+			trial.usable = t
+
+	if outstanding:
+		await asyncio.gather(*outstanding)
+	proxy.inject(FaultStep(0.0, CLEAR))
+	return trial
+
+async def connector(aw, settings, mode):
+	"""Create the connection object. Return its address, the link and the final message."""
+	if mode == CONNECT_TO_ADDRESS:
+		link = Link(mode)
+		a = aw.point.create(ar.ConnectToAddress, settings.proxy_ipp)
+		m = await aw.select(ar.UseAddress, ar.Completed, ar.Stop)
+	else:
+		group = ar.GroupTable(
+			server=ar.CreateFrame(ar.ConnectToAddress, settings.proxy_ipp)
+		)
+		link = Link(mode, group)
+		a, m = await aw.ready(group)		# No timer, see patience.
+	if isinstance(m, (ar.UseAddress, ar.Ready)):
+		link.notified(m)
+	return a, link, m
+
+async def recover(aw, settings, proxy):
+	report = BenchReport('recovery')
+	for mode in MODES:
+		a, link, m = await connector(aw, settings, mode)
+		if isinstance(m, ar.Completed):
+			return m.value
+		elif isinstance(m, ar.Stop):
+			await aw.stop(a)
+			return ar.Aborted()
+
+		for fault in TRIALS:
+			figures = {k: [] for k in ('detect', 'usable', 'outage', 'service', 'lost', 'sent')}
+			unrecovered = 0
+			for i in range(settings.trials):
+				trial = await run_trial(aw, settings, proxy, link, fault)
+				if isinstance(trial, ar.Completed):
+					return trial.value
+				elif isinstance(trial, ar.Stop):
+					await aw.stop(a)
+					return ar.Aborted()
+				if not trial.recovered():
+					unrecovered += 1
+				for k in ('detect', 'usable', 'service'):
+					v = getattr(trial, k)
+					if v is not None:
+						figures[k].append(v)
+				if trial.detect is not None and trial.usable is not None:
+					figures['outage'].append(trial.usable - trial.detect)
+				figures['lost'].append(trial.lost)
+				figures['sent'].append(trial.sent)
+				aw.point.console(f'{mode}/{fault} ({i + 1}), service after {trial.service}s, lost {trial.lost}')
+
+			for k in ('detect', 'usable', 'outage', 'service'):
+				report.add(f'{mode}/{fault}/{k}', 's', figures[k])
+			report.add(f'{mode}/{fault}/lost', 'requests', figures['lost'])
+			report.add(f'{mode}/{fault}/sent', 'requests', figures['sent'])
+			report.add(f'{mode}/{fault}/unrecovered', 'trials', [unrecovered])
+		await aw.stop(a)
+	return report
+
+def bench(self, settings):
+	listening = (settings.proxy_ipp.host, settings.proxy_ipp.port)
+	target = (settings.connecting_ipp.host, settings.connecting_ipp.port)
+	p = ProxyThread(FaultProxy(listening, target))
+	try:
+		p.begin()
+	except OSError as e:
+		return ar.Faulted(f'cannot listen at {listening}', str(e))
+	try:
+		report = awaiting.run(self, recover, settings, p)
+	finally:
+		p.end()
+	if p.proxy.failures:
+		_, r = p.proxy.failures[0]
+		return ar.Faulted('fault proxy failed', r)
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5011),
+	proxy_ipp=ar.HostPort(host='127.0.0.1', port=5112),
+	trials=3, seconds=2.0, interval=0.05, warm=1.0, settle=1.0, patience=30.0, hold=3.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
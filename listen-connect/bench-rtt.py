@@ -0,0 +1,160 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Enquiry-Ack round trips against the listen-server variants.
+
+Each variant is started as a separate process at the same port and
+connected to from this process, i.e. the figures include the sockets
+and the messaging of two processes, as in a deployment. For each
+variant, measures;
+
+* latency - microseconds per Enquiry-Ack round trip, one request at
+  a time,
+* throughput - Enquiry-Ack exchanges per second, with a batch of
+  requests sent before the collection of the responses.
+
+The variants are those that answer a plain Enquiry with an Ack, each
+with its factory settings apart from the address.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import sys
+import time
+import signal
+import subprocess
+import ansar.connect as ar
+from accepting import accept_queue
+from benchmarking import BenchReport
+
+SERVERS = [
+	'listen-server', 'listen-server-fsm', 'listen-server-session',
+	'listen-server-codec', 'listen-server-dispatch', 'listen-server-storm',
+	'listen-server-handoff',
+]
+
+class Settings(object):
+	def __init__(self, listening_ipp=None, servers=None, repeat=None, requests=None, batch=None, seconds=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.servers = servers or []
+		self.repeat = repeat
+		self.requests = requests
+		self.batch = batch
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'servers': ar.VectorOf(str),
+	'repeat': int,
+	'requests': int,
+	'batch': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def server(name, settings):
+	"""Start the variant and wait for its listen. Return the process or None."""
+	ipp = settings.listening_ipp
+	cmd = [sys.executable, f'{name}.py', f'--listening-ipp={{"host":"{ipp.host}","port":{ipp.port}}}']
+	p = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	ending = time.monotonic() + settings.seconds
+	while time.monotonic() < ending:
+		if accept_queue(ipp.port) is not None:
+			return p
+		if p.poll() is not None:
+			return None
+		time.sleep(0.1)
+	p.kill()
+	p.wait()
+	return None
+
+def stop_server(p, seconds):
+	p.send_signal(signal.SIGINT)
+	try:
+		p.wait(seconds)
+	except subprocess.TimeoutExpired:
+		p.kill()
+		p.wait()
+
+def latency(self, server, settings):
+	t = time.perf_counter()
+	for _ in range(settings.requests):
+		self.send(ar.Enquiry(), server)
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if not isinstance(m, ar.Ack):
+			return m
+	return (time.perf_counter() - t) * 1000000.0 / settings.requests
+
+def throughput(self, server, settings):
+	t = time.perf_counter()
+	for _ in range(settings.batch):
+		self.send(ar.Enquiry(), server)
+	for _ in range(settings.batch):
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if not isinstance(m, ar.Ack):
+			return m
+	return settings.batch / (time.perf_counter() - t)
+
+def measure(self, name, settings, report):
+	ar.connect(self, settings.listening_ipp)
+	m = self.select(ar.Connected, ar.NotConnected, ar.Stop, seconds=settings.seconds)
+	if not isinstance(m, ar.Connected):
+		return m
+	server = self.return_address
+
+	samples = {'latency': [], 'throughput': []}
+	for _ in range(settings.repeat):
+		for k, f in (('latency', latency), ('throughput', throughput)):
+			v = f(self, server, settings)
+			if not isinstance(v, float):
+				return ar.TimedOut(v) if isinstance(v, ar.SelectTimer) else v
+			samples[k].append(v)
+
+	report.add(f'{name}/latency', 'us', samples['latency'])
+	report.add(f'{name}/throughput', 'requests/s', samples['throughput'])
+	self.send(ar.Close(), server)
+	self.select(ar.Closed, ar.Abandoned, seconds=settings.seconds)
+	return None
+
+def bench(self, settings):
+	report = BenchReport('rtt')
+	for name in settings.servers:
+		p = server(name, settings)
+		if p is None:
+			return ar.Faulted(f'cannot start "{name}" at {settings.listening_ipp}', 'check the port')
+		try:
+			m = measure(self, name, settings, report)
+		finally:
+			stop_server(p, settings.seconds)
+		if m is not None:
+			return ar.Aborted() if isinstance(m, ar.Stop) else m
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(listening_ipp=ar.HostPort('127.0.0.1', 5125), servers=SERVERS,
+	repeat=5, requests=500, batch=2000, seconds=10.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
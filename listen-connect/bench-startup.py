@@ -0,0 +1,161 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Benchmark of the start-up time of the client executables.
+
+Each client is started as a new process and pointed at a plain socket
+that stands in for the server. The time from process start to the
+arrival of the first bytes (first-frame) and to the arrival of the
+first Enquiry (first-enquiry) is recorded. The client is then cut off,
+which it reports as a network problem before terminating.
+
+Executables are found in the folder named in the settings, e.g.;
+* dist ............. a build with BUILD_MODE=onefile (the default),
+* dist/runtime ..... a build with BUILD_MODE=onedir,
+* empty ............ run the python sources, i.e. no build.
+
+The cost of importing ansar.connect into a fresh python is also
+measured, as a floor for the other figures. That import cannot be
+deferred in these examples as the ar.bind() calls at module level
+need it.
+
+Detection of the Enquiry is a search of the received bytes for the
+type name. Where that name is not on the wire first-enquiry is absent.
+The Hello sent by connect-client-codec lists the name, i.e. for that
+client both figures are the arrival of the Hello.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import os
+import sys
+import time
+import socket
+import subprocess
+import ansar.connect as ar
+from benchmarking import BenchReport
+
+# What to start and how often.
+class Settings(object):
+	def __init__(self, folder=None, executables=None, repeat=None, seconds=None):
+		self.folder = folder
+		self.executables = executables or []
+		self.repeat = repeat
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'folder': str,
+	'executables': ar.VectorOf(str),
+	'repeat': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+#
+#
+def command(folder, name, port):
+	ipp = f'--connecting-ipp={{"host":"127.0.0.1","port":{port}}}'
+	if not folder:
+		return [sys.executable, f'{name}.py', ipp]
+	return [os.path.join(folder, name), ipp]
+
+def first_enquiry(cmd, listener, seconds):
+	"""Start the client and wait for its request. Return seconds to first frame and first Enquiry."""
+	started = time.perf_counter()
+	p = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	frame, enquiry = None, None
+	try:
+		listener.settimeout(seconds)
+		connection, _ = listener.accept()
+		with connection:
+			connection.settimeout(seconds)
+			received = bytearray()
+			while enquiry is None:
+				b = connection.recv(4096)
+				if not b:
+					break
+				if frame is None:
+					frame = time.perf_counter() - started
+				received += b
+				if b'Enquiry' in received:
+					enquiry = time.perf_counter() - started
+	except socket.timeout:
+		pass
+	finally:
+		try:
+			p.wait(seconds)
+		except subprocess.TimeoutExpired:
+			p.kill()
+			p.wait()
+	return frame, enquiry
+
+def import_time():
+	started = time.perf_counter()
+	subprocess.run([sys.executable, '-c', 'import ansar.connect'], check=True)
+	return time.perf_counter() - started
+
+def bench(self, settings):
+	repeat = settings.repeat or 5
+	seconds = settings.seconds or 10.0
+	report = BenchReport('startup')
+
+	report.add('python/import-ansar-connect', 'ms', [import_time() * 1000.0 for _ in range(repeat)])
+
+	listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	listener.bind(('127.0.0.1', 0))
+	listener.listen(5)
+	port = listener.getsockname()[1]
+
+	try:
+		for name in settings.executables:
+			cmd = command(settings.folder, name, port)
+			frame, enquiry = [], []
+			for _ in range(repeat):
+				f, e = first_enquiry(cmd, listener, seconds)
+				if f is None:
+					return ar.Faulted(f'no connection from "{name}"', f'check the folder "{settings.folder}" and the build')
+				frame.append(f * 1000.0)
+				if e is not None:
+					enquiry.append(e * 1000.0)
+			report.add(f'{name}/first-frame', 'ms', frame)
+			if enquiry:
+				report.add(f'{name}/first-enquiry', 'ms', enquiry)
+	finally:
+		listener.close()
+
+	return report
+
+ar.bind(bench)
+
+#
+#
+CLIENTS = [
+	'connect-client', 'connect-client-ask', 'connect-client-fsm', 'connect-client-session',
+	'connect-to-address', 'group-table', 'group-table-session',
+	'connect-client-channel', 'connect-client-codec',
+]
+
+factory_settings = Settings(folder='dist', executables=CLIENTS, repeat=5, seconds=10.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
@@ -0,0 +1,176 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Connection storms against batched accepts.
+
+For each batch size, starts listen-server-storm.py as a separate
+process, with that batch and a large backlog (see accepting.py and
+tuning.py). Then issues all the connects at once and measures;
+
+* connected - seconds from the start of the storm to each Connected,
+* storm - seconds from the start to the last Connected,
+* first-response - seconds from the last Connected to the Ack of an
+  Enquiry sent over every connection, i.e. whether the sessions are
+  usable at the end of the storm,
+* failed - connects that ended in NotConnected,
+* overflows and drops - the system-wide listen figures of the kernel,
+  over the storm.
+
+The sockets of the ansar runtime are multiplexed with select(), i.e. a
+process is limited to around 1000 descriptors, hence the default of
+800 connections. The figures for each batch (e.g. mean batch) are
+logged by the server.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import sys
+import time
+import signal
+import subprocess
+import ansar.connect as ar
+from accepting import accept_queue, listen_overflows
+from benchmarking import BenchReport
+
+BATCHES = (1, 16, 64)
+BACKLOG = 1024
+
+class Settings(object):
+	def __init__(self, listening_ipp=None, connections=None, repeat=None, seconds=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.connections = connections
+		self.repeat = repeat
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'connections': int,
+	'repeat': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def storm(self, listening_ipp, settings):
+	"""Connect, exchange and close. Return the figures or a failure."""
+	begun = time.monotonic()
+	for _ in range(settings.connections):
+		ar.connect(self, listening_ipp)
+
+	connected = []
+	servers = []
+	failed = 0
+	while len(connected) + failed < settings.connections:
+		m = self.select(ar.Connected, ar.NotConnected, ar.Stop, seconds=settings.seconds)
+		if isinstance(m, ar.Connected):
+			connected.append(time.monotonic() - begun)
+			servers.append(self.return_address)
+		elif isinstance(m, ar.NotConnected):
+			failed += 1
+		elif isinstance(m, ar.Stop):
+			return ar.Aborted()
+		else:
+			return ar.TimedOut(m)
+
+	stormed = time.monotonic()
+	for s in servers:
+		self.send(ar.Enquiry(), s)
+	for _ in servers:
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if isinstance(m, ar.Stop):
+			return ar.Aborted()
+		elif not isinstance(m, ar.Ack):
+			return ar.TimedOut(m) if isinstance(m, ar.SelectTimer) else m
+	responded = time.monotonic() - stormed
+
+	for s in servers:
+		self.send(ar.Close(), s)
+	for _ in servers:
+		m = self.select(ar.Closed, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if not isinstance(m, (ar.Closed, ar.Abandoned)):
+			break
+	return connected, failed, responded
+
+def server(settings, batch):
+	"""Start the storm server and wait for its listen. Return the process or None."""
+	ipp = settings.listening_ipp
+	cmd = [sys.executable, 'listen-server-storm.py',
+		f'--listening-ipp={{"host":"{ipp.host}","port":{ipp.port}}}',
+		f'--batch={batch}', f'--backlog={BACKLOG}']
+	p = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+	ending = time.monotonic() + settings.seconds
+	while time.monotonic() < ending:
+		if accept_queue(ipp.port) is not None:
+			return p
+		if p.poll() is not None:
+			return None
+		time.sleep(0.1)
+	p.kill()
+	p.wait()
+	return None
+
+def stop_server(p, seconds):
+	p.send_signal(signal.SIGINT)
+	try:
+		p.wait(seconds)
+	except subprocess.TimeoutExpired:
+		p.kill()
+		p.wait()
+
+def bench(self, settings):
+	report = BenchReport('storm')
+	for batch in BATCHES:
+		p = server(settings, batch)
+		if p is None:
+			return ar.Faulted(f'cannot start the storm server at {settings.listening_ipp}', 'check the port')
+
+		figures = {k: [] for k in ('connected', 'storm', 'first-response', 'failed', 'overflows', 'drops')}
+		try:
+			for _ in range(settings.repeat):
+				kernel = listen_overflows()
+				r = storm(self, settings.listening_ipp, settings)
+				if not isinstance(r, tuple):
+					return r
+				connected, failed, responded = r
+				figures['connected'].extend(connected)
+				figures['storm'].append(max(connected, default=0.0))
+				figures['first-response'].append(responded)
+				figures['failed'].append(failed)
+				after = listen_overflows()
+				if kernel is not None and after is not None:
+					figures['overflows'].append(after[0] - kernel[0])
+					figures['drops'].append(after[1] - kernel[1])
+		finally:
+			stop_server(p, settings.seconds)
+
+		units = {'failed': 'connects', 'overflows': 'connects', 'drops': 'connects'}
+		for k, v in figures.items():
+			report.add(f'batch-{batch}/{k}', units.get(k, 's'), v)
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(listening_ipp=ar.HostPort('127.0.0.1', 5124), connections=800, repeat=3, seconds=10.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
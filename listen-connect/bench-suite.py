@@ -0,0 +1,194 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''The standard set of benchmarks, compared against stored baselines.
+
+Runs each of a fixed selection of the bench-* objects as a separate
+process, each storing its BenchReport in the latest folder;
+
+* dispatch - cost of the dispatch to handlers (bench-dispatch.py),
+* codec - encode and decode of the default and packed codecs
+  (bench-codec.py),
+* rtt - Enquiry/Ack latency and throughput of the listen-server
+  variants (bench-rtt.py),
+* storm - accept rate of batched accepts (bench-storm.py),
+* startup - time to first Enquiry of the built connect-client
+  variants (bench-startup.py), where a folder is configured.
+
+Each report is compared with the baseline report of the same name in
+the baselines folder (see compare() in benchmarking.py), i.e. a change
+beyond the threshold that is also significant by a t-test of the
+samples. Where there is no baseline, or with --update, the latest
+report becomes the baseline. Figures are specific to a host, i.e. the
+baselines should be taken on the machine that runs the comparisons,
+and the threshold should be wider than the variation between runs on
+that machine.
+
+The version of ansar-connect is recorded with the baselines. A run
+under a different version is noted, i.e. the figures of a new pin are
+compared with those of the old.
+
+Output is the SuiteReport, also stored in the latest folder. Where
+there are regressions the output is a Faulted listing them, i.e. the
+exit status of "make bench" is a failure.
+'''
+import os
+import sys
+import subprocess
+from importlib import metadata
+import ansar.connect as ar
+from benchmarking import BenchReport, SuiteReport, compare, REGRESSION, IMPROVEMENT
+
+SUITE = 'suite.json'
+
+class Settings(object):
+	def __init__(self, baselines=None, latest=None, benches=None, folder=None,
+			threshold=None, alpha=None, update=False, seconds=None):
+		self.baselines = baselines
+		self.latest = latest
+		self.benches = benches or []
+		self.folder = folder
+		self.threshold = threshold
+		self.alpha = alpha
+		self.update = update
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'baselines': str,
+	'latest': str,
+	'benches': ar.VectorOf(str),
+	'folder': str,
+	'threshold': float,
+	'alpha': float,
+	'update': ar.Boolean(),
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+#
+#
+def command(name, settings):
+	"""The command line for a bench of the suite, or None."""
+	if name == 'dispatch':
+		return ['bench-dispatch.py', '--number=20000']
+	if name == 'codec':
+		return ['bench-codec.py']
+	if name == 'rtt':
+		return ['bench-rtt.py']
+	if name == 'storm':
+		return ['bench-storm.py']
+	if name == 'startup' and settings.folder:
+		return ['bench-startup.py', f'--folder={settings.folder}']
+	return None
+
+def run(name, cmd, path, seconds):
+	"""Run the bench, storing the report at the path. Return a BenchReport or a Faulted."""
+	try:
+		os.remove(path)
+	except FileNotFoundError:
+		pass
+	try:
+		p = subprocess.run([sys.executable, *cmd, f'--output-file={path}'],
+			stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=seconds)
+	except subprocess.TimeoutExpired:
+		return ar.Faulted(f'bench "{name}" ran past {seconds} seconds')
+	if p.returncode != 0:
+		return ar.Faulted(f'bench "{name}" failed', p.stderr.decode('utf-8', 'replace').strip())
+	return load(path)
+
+def load(path, t=BenchReport):
+	"""Recover the object stored at path, as by --output-file. Return it, or None."""
+	try:
+		f = ar.File(path, ar.Any(), decorate_names=False)
+		r, _ = f.recover()
+	except (ar.FileFailure, FileNotFoundError):
+		return None
+	return r if isinstance(r, t) else None
+
+def store(path, r):
+	f = ar.File(path, ar.Any(), decorate_names=False)
+	f.store(r)
+
+def pinned():
+	try:
+		return metadata.version('ansar-connect')
+	except metadata.PackageNotFoundError:
+		return None
+
+def suite(self, settings):
+	os.makedirs(settings.baselines, exist_ok=True)
+	os.makedirs(settings.latest, exist_ok=True)
+
+	version = pinned()
+	before = load(os.path.join(settings.baselines, SUITE), SuiteReport)
+	report = SuiteReport(ansar_connect=version,
+		baseline_ansar_connect=before.ansar_connect if before else None,
+		threshold=settings.threshold, alpha=settings.alpha)
+	if before and before.ansar_connect != version:
+		self.console(f'Comparing ansar-connect {version} against baselines of {before.ansar_connect}')
+
+	for name in settings.benches:
+		cmd = command(name, settings)
+		if cmd is None:
+			self.console(f'Skipping bench "{name}"')
+			continue
+		self.console(f'Running bench "{name}"')
+		current = run(name, cmd, os.path.join(settings.latest, f'{name}.json'), settings.seconds)
+		if isinstance(current, ar.Faulted):
+			return current
+		if current is None:
+			return ar.Faulted(f'no report from bench "{name}"')
+
+		path = os.path.join(settings.baselines, f'{name}.json')
+		baseline = None if settings.update else load(path)
+		if baseline is None:
+			store(path, current)
+			continue
+
+		for c in compare(baseline, current, settings.threshold, settings.alpha):
+			c.name = f'{name}/{c.name}'
+			report.comparisons.append(c)
+			if c.verdict == REGRESSION:
+				report.regressions.append(c.name)
+			elif c.verdict == IMPROVEMENT:
+				report.improvements.append(c.name)
+
+	if settings.update or before is None:
+		store(os.path.join(settings.baselines, SUITE), SuiteReport(ansar_connect=version))
+	store(os.path.join(settings.latest, SUITE), report)
+
+	if report.regressions:
+		listed = ', '.join(report.regressions)
+		return ar.Faulted(f'{len(report.regressions)} regressions against the baselines', listed)
+	return report
+
+ar.bind(suite)
+
+#
+#
+factory_settings = Settings(baselines='baselines', latest='bench-latest',
+	benches=['dispatch', 'codec', 'rtt', 'storm', 'startup'],
+	threshold=0.1, alpha=0.05, update=False, seconds=600.0)
+
+if __name__ == '__main__':
+	ar.create_object(suite, factory_settings=factory_settings)
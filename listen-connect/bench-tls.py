@@ -0,0 +1,224 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Handshake time and throughput of TLS, with and without resumption.
+
+Starts a responder that listens at a free port and a TlsTerminator
+(see securing.py) in front of it, within this process. Clients connect
+through a TlsTunnel, or directly for the plain figures. Measures;
+
+* handshake - milliseconds for the TLS handshake of the tunnel, full
+  (no session cache) and resumed (sessions kept in a SessionCache),
+* reconnect - milliseconds per short connection, i.e. connect, one
+  Enquiry-Ack and close, for plain, full and resumed,
+* throughput - Enquiry-Ack exchanges per second over one connection,
+  with a batch of requests sent before the collection of the
+  responses, for plain and TLS.
+
+Each sample of the resumed figures starts with a priming connection
+that is not timed, i.e. every timed connection offers a session.
+Certificate and key are those generated by the certs target of the
+Makefile.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import ansar.connect as ar
+from securing import TlsSettings, SessionCache, server_context, client_context, TlsTerminator, TlsTunnel
+from benchmarking import BenchReport
+
+class Settings(object):
+	def __init__(self, repeat=None, connections=None, batch=None, seconds=None, tls=None):
+		self.repeat = repeat
+		self.connections = connections
+		self.batch = batch
+		self.seconds = seconds
+		self.tls = tls or TlsSettings()
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'connections': int,
+	'batch': int,
+	'seconds': float,
+	'tls': ar.UserDefined(TlsSettings),
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Other end of the exchange.
+def responder(self):
+	ar.listen(self, ar.HostPort('127.0.0.1', 0))
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	self.send(m, self.parent_address)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	while True:
+		m = self.select(ar.Enquiry, ar.Accepted, ar.Abandoned, ar.Closed, ar.Stop)
+		if isinstance(m, ar.Enquiry):
+			self.reply(ar.Ack())
+		elif isinstance(m, ar.Stop):
+			return ar.Aborted()
+
+ar.bind(responder)
+
+def reconnect(self, connecting_ipp, seconds):
+	"""A short connection. Return None or a failure."""
+	ar.connect(self, connecting_ipp)
+	m = self.select(ar.Connected, ar.NotConnected, ar.Stop, seconds=seconds)
+	if not isinstance(m, ar.Connected):
+		return m
+	server = self.return_address
+	self.send(ar.Enquiry(), server)
+	m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=seconds)
+	if not isinstance(m, ar.Ack):
+		return m
+	self.send(ar.Close(), server)
+	m = self.select(ar.Closed, ar.Abandoned, ar.Stop, seconds=seconds)
+	if not isinstance(m, (ar.Closed, ar.Abandoned)):
+		return m
+	return None
+
+def throughput(self, server, settings):
+	t = time.perf_counter()
+	for _ in range(settings.batch):
+		self.send(ar.Enquiry(), server)
+	for _ in range(settings.batch):
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if not isinstance(m, ar.Ack):
+			return m
+	return settings.batch / (time.perf_counter() - t)
+
+def connections(self, name, public, server, settings, report):
+	"""Samples of reconnect and handshake times, through a tunnel or not."""
+	reconnect_samples = []
+	handshake_samples = []
+	for _ in range(settings.repeat):
+		tunnel = None
+		connecting_ipp = public
+		if server is not None:
+			context, cache = server
+			tunnel = TlsTunnel(('127.0.0.1', 0), public.inet(), context, 'localhost', cache)
+			tunnel.start()
+			connecting_ipp = ar.HostPort(*tunnel.listening)
+		try:
+			if tunnel is not None and cache is not None:
+				m = reconnect(self, connecting_ipp, settings.seconds)	# Priming.
+				if m is not None:
+					return m
+				tunnel.figures.connections = tunnel.figures.full = 0
+				tunnel.handshake_time = 0.0
+			t = time.perf_counter()
+			for _ in range(settings.connections):
+				m = reconnect(self, connecting_ipp, settings.seconds)
+				if m is not None:
+					return m
+			reconnect_samples.append((time.perf_counter() - t) * 1000.0 / settings.connections)
+		finally:
+			if tunnel is not None:
+				tunnel.end()
+		if tunnel is not None:
+			f = tunnel.figures
+			if cache is not None and f.full:
+				self.warning(f'{name}: {f.full} full handshakes after priming')
+			handshake_samples.append(f.handshake_ms)
+
+	if handshake_samples:
+		report.add(f'{name}/handshake', 'ms', handshake_samples)
+	report.add(f'{name}/reconnect', 'ms', reconnect_samples)
+	return None
+
+def exchanges(self, name, connecting_ipp, settings, report):
+	ar.connect(self, connecting_ipp)
+	m = self.select(ar.Connected, ar.NotConnected, ar.Stop, seconds=settings.seconds)
+	if not isinstance(m, ar.Connected):
+		return m
+	server = self.return_address
+
+	samples = []
+	for _ in range(settings.repeat):
+		v = throughput(self, server, settings)
+		if not isinstance(v, float):
+			return v
+		samples.append(v)
+	report.add(f'{name}/throughput', 'requests/s', samples)
+	self.send(ar.Close(), server)
+	self.select(ar.Closed, ar.Abandoned, seconds=settings.seconds)
+	return None
+
+class Public(object):
+	def __init__(self, plain, secured):
+		self.plain = plain
+		self.secured = secured
+
+def measure(self, public, settings, report):
+	client = client_context(settings.tls)
+	m = connections(self, 'plain', public.plain, None, settings, report)
+	m = m or connections(self, 'full', public.secured, (client, None), settings, report)
+	m = m or connections(self, 'resumed', public.secured, (client, SessionCache()), settings, report)
+	if m is not None:
+		return m
+
+	m = exchanges(self, 'plain', public.plain, settings, report)
+	if m is not None:
+		return m
+	tunnel = TlsTunnel(('127.0.0.1', 0), public.secured.inet(), client, 'localhost')
+	tunnel.start()
+	try:
+		return exchanges(self, 'tls', ar.HostPort(*tunnel.listening), settings, report)
+	finally:
+		tunnel.end()
+
+def bench(self, settings):
+	try:
+		context = server_context(settings.tls)
+	except OSError as e:
+		return ar.Faulted(f'cannot load certificate "{settings.tls.certificate}" (make certs?)', str(e))
+
+	r = self.create(responder)
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	if not isinstance(m, ar.Listening):
+		return m
+	terminator = TlsTerminator(('127.0.0.1', 0), m.listening_ipp.inet(), context)
+	terminator.start()
+	public = Public(m.listening_ipp, ar.HostPort(*terminator.listening))
+
+	report = BenchReport('tls')
+	try:
+		m = measure(self, public, settings, report)
+	finally:
+		terminator.end()
+		self.send(ar.Stop(), r)
+		self.select(ar.Completed)
+	if m is not None:
+		return ar.Aborted() if isinstance(m, ar.Stop) else m
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(repeat=5, connections=50, batch=5000, seconds=5.0,
+	tls=TlsSettings(enabled=True, certificate='server.crt', key='server.key', authority='server.crt'))
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
@@ -0,0 +1,161 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Latency and throughput of the socket options in tuning.py.
+
+For each configuration, applies the SocketTuning (see tuning.py),
+starts a responder that listens at a free port and connects to it,
+within this process. Then measures;
+
+* latency - microseconds per Enquiry-Ack round trip, one request at
+  a time,
+* throughput - Enquiry-Ack exchanges per second, with a batch of
+  requests sent before the collection of the responses.
+
+Both ends are in the one process and share the sockets thread of
+the ansar runtime, i.e. figures are for comparison between the
+configurations rather than of a deployment. The effective values
+of each configuration are logged with the connect.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import ansar.connect as ar
+from tuning import SocketTuning, tune, effective
+from benchmarking import BenchReport
+
+CONFIGURATIONS = (
+	('default', SocketTuning()),
+	('nodelay', SocketTuning(nodelay=True)),
+	('quickack', SocketTuning(quickack=True)),
+	('small-buffers', SocketTuning(send_buffer=4096, receive_buffer=4096)),
+	('large-buffers', SocketTuning(send_buffer=1048576, receive_buffer=1048576)),
+	('backlog', SocketTuning(backlog=1024)),
+	('user-timeout', SocketTuning(user_timeout=10.0)),
+	('keepalive', SocketTuning(keepalive=True, keep_idle=10, keep_interval=5, keep_count=3)),
+	('low-latency', SocketTuning(nodelay=True, quickack=True)),
+)
+
+class Settings(object):
+	def __init__(self, repeat=None, requests=None, batch=None, seconds=None):
+		self.repeat = repeat
+		self.requests = requests
+		self.batch = batch
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'repeat': int,
+	'requests': int,
+	'batch': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Other end of the exchange.
+def responder(self):
+	ar.listen(self, ar.HostPort('127.0.0.1', 0))
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	self.send(m, self.parent_address)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	while True:
+		m = self.select(ar.Enquiry, ar.Accepted, ar.Abandoned, ar.Closed, ar.Stop)
+		if isinstance(m, ar.Enquiry):
+			self.reply(ar.Ack())
+		elif isinstance(m, ar.Stop):
+			return ar.Aborted()
+
+ar.bind(responder)
+
+def latency(self, server, settings):
+	t = time.perf_counter()
+	for _ in range(settings.requests):
+		self.send(ar.Enquiry(), server)
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if not isinstance(m, ar.Ack):
+			return m
+	return (time.perf_counter() - t) * 1000000.0 / settings.requests
+
+def throughput(self, server, settings):
+	t = time.perf_counter()
+	for _ in range(settings.batch):
+		self.send(ar.Enquiry(), server)
+	for _ in range(settings.batch):
+		m = self.select(ar.Ack, ar.Abandoned, ar.Stop, seconds=settings.seconds)
+		if not isinstance(m, ar.Ack):
+			return m
+	return settings.batch / (time.perf_counter() - t)
+
+def measure(self, name, tuning, settings, report):
+	tune(tuning)
+	r = self.create(responder)
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	def stop():
+		self.send(ar.Stop(), r)
+		self.select(ar.Completed)
+
+	ar.connect(self, m.listening_ipp)
+	m = self.select(ar.Connected, ar.NotConnected, ar.Stop)
+	if not isinstance(m, ar.Connected):
+		stop()
+		return m
+	server = self.return_address
+	e = effective(m.connected_ipp)
+	self.console(f'{name}: {vars(e) if e else None}')
+
+	samples = {'latency': [], 'throughput': []}
+	for _ in range(settings.repeat):
+		for k, f in (('latency', latency), ('throughput', throughput)):
+			v = f(self, server, settings)
+			if not isinstance(v, float):
+				stop()
+				return ar.Aborted() if isinstance(v, ar.Stop) else v
+			samples[k].append(v)
+
+	report.add(f'{name}/latency', 'us', samples['latency'])
+	report.add(f'{name}/throughput', 'requests/s', samples['throughput'])
+	self.send(ar.Close(), server)
+	self.select(ar.Closed, ar.Abandoned, seconds=settings.seconds)
+	stop()
+	return None
+
+def bench(self, settings):
+	report = BenchReport('tuning')
+	for name, tuning in CONFIGURATIONS:
+		m = measure(self, name, tuning, settings, report)
+		if m is not None:
+			return m
+	return report
+
+ar.bind(bench)
+
+#
+#
+factory_settings = Settings(repeat=5, requests=1000, batch=5000, seconds=5.0)
+
+if __name__ == '__main__':
+	ar.create_object(bench, factory_settings=factory_settings)
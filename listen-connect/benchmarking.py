@@ -0,0 +1,244 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Common messages and timing for the bench-* objects.
+
+Every benchmark is an ansar object that completes with a BenchReport,
+i.e. the report is printed on stdout or, with --output-file, stored as
+a file that other tools can load. A report is a list of Measurements,
+each a name, a unit and a list of samples. Keeping the samples (rather
+than just an average) allows for later statistical comparisons.
+
+compare() is that comparison, of a report against a baseline report
+of the same benchmark. Each measurement is judged on the change in
+its mean and on Welch's t-test of the two sets of samples;
+
+* a change beyond the threshold (e.g. 10%) in the wrong direction,
+  with a p-value under alpha (e.g. 0.05), is a regression,
+* the same in the right direction is an improvement,
+* anything else is unchanged, i.e. small or not significant.
+
+The right direction is lower, except for units that are rates (i.e.
+ending in "/s"). A measurement with a single sample (e.g. a count of
+bytes) has no variance and is judged on the threshold alone.
+'''
+import math
+import time
+import statistics
+import ansar.connect as ar
+
+__all__ = [
+	'Measurement',
+	'BenchReport',
+	'REPEAT',
+	'NUMBER',
+	'per_call',
+	'elapsed',
+	'Comparison',
+	'SuiteReport',
+	't_test',
+	'compare',
+	'REGRESSION',
+	'IMPROVEMENT',
+	'UNCHANGED',
+	'NEW',
+	'MISSING',
+]
+
+REPEAT = 7			# Default number of samples.
+NUMBER = 1000		# Default calls per sample.
+
+class Measurement(object):
+	def __init__(self, name=None, unit=None, samples=None):
+		self.name = name
+		self.unit = unit
+		self.samples = samples or []
+
+MEASUREMENT_SCHEMA = {
+	'name': str,
+	'unit': str,
+	'samples': ar.VectorOf(float),
+}
+
+ar.bind(Measurement, object_schema=MEASUREMENT_SCHEMA)
+
+class BenchReport(object):
+	def __init__(self, benchmark=None, measurements=None):
+		self.benchmark = benchmark
+		self.measurements = measurements or []
+
+	def add(self, name, unit, samples):
+		self.measurements.append(Measurement(name, unit, [float(s) for s in samples]))
+
+BENCH_REPORT_SCHEMA = {
+	'benchmark': str,
+	'measurements': ar.VectorOf(ar.UserDefined(Measurement)),
+}
+
+ar.bind(BenchReport, object_schema=BENCH_REPORT_SCHEMA)
+
+#
+#
+def per_call(f, repeat=REPEAT, number=NUMBER):
+	"""Time repeated calls to f. Return a list of microseconds per call, one for each repeat."""
+	samples = []
+	for _ in range(repeat):
+		t = time.perf_counter()
+		for _ in range(number):
+			f()
+		samples.append((time.perf_counter() - t) * 1000000.0 / number)
+	return samples
+
+def elapsed(started):
+	"""Microseconds since a time.perf_counter() value."""
+	return (time.perf_counter() - started) * 1000000.0
+
+#
+#
+REGRESSION = 'regression'
+IMPROVEMENT = 'improvement'
+UNCHANGED = 'unchanged'
+NEW = 'new'					# No baseline.
+MISSING = 'missing'			# Baseline only.
+
+class Comparison(object):
+	def __init__(self, name=None, unit=None, baseline=None, current=None, change=None, p_value=None, verdict=None):
+		self.name = name
+		self.unit = unit
+		self.baseline = baseline
+		self.current = current
+		self.change = change
+		self.p_value = p_value
+		self.verdict = verdict
+
+COMPARISON_SCHEMA = {
+	'name': str,
+	'unit': str,
+	'baseline': ar.Float8(),
+	'current': ar.Float8(),
+	'change': ar.Float8(),
+	'p_value': ar.Float8(),
+	'verdict': str,
+}
+
+ar.bind(Comparison, object_schema=COMPARISON_SCHEMA)
+
+class SuiteReport(object):
+	def __init__(self, ansar_connect=None, baseline_ansar_connect=None, threshold=None, alpha=None,
+			comparisons=None, regressions=None, improvements=None):
+		self.ansar_connect = ansar_connect
+		self.baseline_ansar_connect = baseline_ansar_connect
+		self.threshold = threshold
+		self.alpha = alpha
+		self.comparisons = comparisons or []
+		self.regressions = regressions or []
+		self.improvements = improvements or []
+
+SUITE_REPORT_SCHEMA = {
+	'ansar_connect': str,
+	'baseline_ansar_connect': str,
+	'threshold': ar.Float8(),
+	'alpha': ar.Float8(),
+	'comparisons': ar.VectorOf(ar.UserDefined(Comparison)),
+	'regressions': ar.VectorOf(str),
+	'improvements': ar.VectorOf(str),
+}
+
+ar.bind(SuiteReport, object_schema=SUITE_REPORT_SCHEMA)
+
+def beta_fraction(a, b, x):
+	"""Continued fraction of the incomplete beta function (modified Lentz)."""
+	tiny = 1e-300
+	c = 1.0
+	d = 1.0 - (a + b) * x / (a + 1.0)
+	d = 1.0 / (d if abs(d) > tiny else tiny)
+	f = d
+	for m in range(1, 300):
+		m2 = 2 * m
+		for n in (m * (b - m) * x / ((a + m2 - 1.0) * (a + m2)),
+				-(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))):
+			d = 1.0 + n * d
+			d = 1.0 / (d if abs(d) > tiny else tiny)
+			c = 1.0 + n / c
+			c = c if abs(c) > tiny else tiny
+			f *= d * c
+		if abs(d * c - 1.0) < 1e-12:
+			break
+	return f
+
+def incomplete_beta(a, b, x):
+	"""The regularized incomplete beta function, I(x; a, b)."""
+	if x <= 0.0:
+		return 0.0
+	if x >= 1.0:
+		return 1.0
+	front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+		+ a * math.log(x) + b * math.log(1.0 - x))
+	if x < (a + 1.0) / (a + b + 2.0):
+		return front * beta_fraction(a, b, x) / a
+	return 1.0 - front * beta_fraction(b, a, 1.0 - x) / b
+
+def t_test(a, b):
+	"""Welch's t-test of two lists of samples. Return the two-sided p-value, or None for too few samples."""
+	n1, n2 = len(a), len(b)
+	if n1 < 2 or n2 < 2:
+		return None
+	m1, m2 = statistics.fmean(a), statistics.fmean(b)
+	e1, e2 = statistics.variance(a) / n1, statistics.variance(b) / n2
+	e = e1 + e2
+	if e == 0.0:
+		return 1.0 if m1 == m2 else 0.0
+	t = (m1 - m2) / math.sqrt(e)
+	df = e * e / (e1 * e1 / (n1 - 1) + e2 * e2 / (n2 - 1))
+	return incomplete_beta(df / 2.0, 0.5, df / (df + t * t))
+
+def compare(baseline, current, threshold=0.1, alpha=0.05):
+	"""Judge each measurement of the current report against the baseline. Return a list of Comparisons."""
+	before = {m.name: m for m in baseline.measurements}
+	comparisons = []
+	for m in current.measurements:
+		c = Comparison(m.name, m.unit, current=statistics.fmean(m.samples) if m.samples else None)
+		b = before.pop(m.name, None)
+		if b is None or not b.samples or not m.samples:
+			c.verdict = NEW
+			comparisons.append(c)
+			continue
+		c.baseline = statistics.fmean(b.samples)
+		c.p_value = t_test(b.samples, m.samples)
+		if c.baseline:
+			c.change = (c.current - c.baseline) / abs(c.baseline)
+		else:
+			c.change = 0.0 if c.current == c.baseline else math.copysign(math.inf, c.current)
+
+		worse = -c.change if m.unit.endswith('/s') else c.change
+		significant = c.p_value is None or c.p_value < alpha
+		if significant and worse > threshold:
+			c.verdict = REGRESSION
+		elif significant and -worse > threshold:
+			c.verdict = IMPROVEMENT
+		else:
+			c.verdict = UNCHANGED
+		comparisons.append(c)
+
+	for b in before.values():
+		comparisons.append(Comparison(b.name, b.unit, baseline=statistics.fmean(b.samples) if b.samples else None, verdict=MISSING))
+	return comparisons
@@ -0,0 +1,230 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Circuit breakers for clients of multiple servers.
+
+A server can be sick and still accept connections. Clients continue to
+send requests and each request waits the full timeout before failing.
+A circuit breaker records the outcome of requests to a server and stops
+sending when too many are failing;
+
+* CLOSED - requests are sent and outcomes recorded over a sliding
+  window. When the rate of failure in the window reaches the limit
+  the breaker trips,
+* OPEN - requests fail immediately, without being sent. After the
+  open period the breaker moves to half-open,
+* HALF_OPEN - a limited number of probe requests are sent. If they
+  all succeed the breaker closes. Any failure trips the breaker again.
+
+Failures are timeouts, faults and unexpected responses, as decided by
+the caller of record().
+
+A BreakerTable holds a breaker for each member of a group (e.g. the
+names in a GroupTable) and routes requests to the next member that
+will accept traffic. A request that cannot be routed anywhere fails
+fast with CircuitOpen.
+'''
+import time
+from collections import deque
+import ansar.connect as ar
+
+__all__ = [
+	'CLOSED',
+	'OPEN',
+	'HALF_OPEN',
+	'CircuitOpen',
+	'BreakerStatus',
+	'BreakerReport',
+	'CircuitBreaker',
+	'BreakerTable',
+]
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+WINDOW = 20				# Outcomes considered.
+MINIMUM = 5				# Outcomes before a trip is possible.
+FAILURE_RATE = 0.5		# Fraction of failures that trips the breaker.
+OPEN_SECONDS = 5.0		# Period before probing.
+PROBES = 1				# Successes required to close.
+
+class CircuitOpen(ar.Faulted):
+	def __init__(self, name=None):
+		ar.Faulted.__init__(self, 'circuit open', f'no server available for "{name}"' if name else None)
+		self.name = name
+
+CIRCUIT_OPEN_SCHEMA = {
+	'condition': ar.Unicode(),
+	'explanation': ar.Unicode(),
+	'error_code': ar.Integer8(),
+	'exit_code': ar.Integer8(),
+	'name': ar.Unicode(),
+}
+
+ar.bind(CircuitOpen, object_schema=CIRCUIT_OPEN_SCHEMA)
+
+class BreakerStatus(object):
+	def __init__(self, name=None, state=None, sent=0, failed=0, rejected=0, trips=0):
+		self.name = name
+		self.state = state
+		self.sent = sent
+		self.failed = failed
+		self.rejected = rejected
+		self.trips = trips
+
+BREAKER_STATUS_SCHEMA = {
+	'name': ar.Unicode(),
+	'state': ar.Unicode(),
+	'sent': int,
+	'failed': int,
+	'rejected': int,
+	'trips': int,
+}
+
+ar.bind(BreakerStatus, object_schema=BREAKER_STATUS_SCHEMA)
+
+class BreakerReport(object):
+	def __init__(self, status=None):
+		self.status = status or []
+
+BREAKER_REPORT_SCHEMA = {
+	'status': ar.VectorOf(ar.UserDefined(BreakerStatus)),
+}
+
+ar.bind(BreakerReport, object_schema=BREAKER_REPORT_SCHEMA)
+
+#
+#
+class CircuitBreaker(object):
+	"""Health of a single server.
+
+	:param name: identity of the server, for reporting
+	:type name: str
+	:param window: number of recent outcomes considered
+	:type window: int
+	:param minimum: outcomes required before a trip
+	:type minimum: int
+	:param failure_rate: fraction of failures that trips the breaker
+	:type failure_rate: float
+	:param open_seconds: period in the open state
+	:type open_seconds: float
+	:param probes: successes in the half-open state that close the breaker
+	:type probes: int
+	"""
+	def __init__(self, name, window=WINDOW, minimum=MINIMUM, failure_rate=FAILURE_RATE,
+			open_seconds=OPEN_SECONDS, probes=PROBES):
+		self.name = name
+		self.minimum = minimum
+		self.failure_rate = failure_rate
+		self.open_seconds = open_seconds
+		self.probes = probes
+		self.state = CLOSED
+		self.outcome = deque(maxlen=window)
+		self.opened = None
+		self.probing = 0
+		self.succeeded = 0
+		self.status = BreakerStatus(name, CLOSED)
+
+	def shift(self, state):
+		self.state = state
+		self.status.state = state
+
+	def trip(self):
+		self.shift(OPEN)
+		self.opened = time.monotonic()
+		self.status.trips += 1
+
+	def allow(self):
+		"""Decide whether a request may be sent. Return true if it may."""
+		if self.state == OPEN:
+			if time.monotonic() - self.opened < self.open_seconds:
+				self.status.rejected += 1
+				return False
+			self.shift(HALF_OPEN)
+			self.probing = 0
+			self.succeeded = 0
+
+		if self.state == HALF_OPEN:
+			if self.probing >= self.probes:
+				self.status.rejected += 1
+				return False
+			self.probing += 1
+
+		self.status.sent += 1
+		return True
+
+	def record(self, success):
+		"""Note the outcome of a request that was allowed."""
+		if not success:
+			self.status.failed += 1
+
+		if self.state == HALF_OPEN:
+			if not success:
+				self.trip()
+				return
+			self.succeeded += 1
+			if self.succeeded >= self.probes:
+				self.shift(CLOSED)
+				self.outcome.clear()
+			return
+
+		if self.state != CLOSED:	# Late outcome.
+			return
+		self.outcome.append(success)
+		n = len(self.outcome)
+		if n < self.minimum:
+			return
+		failed = n - sum(self.outcome)
+		if failed / n >= self.failure_rate:
+			self.trip()
+
+class BreakerTable(object):
+	"""A circuit breaker for each member of a group.
+
+	:param names: the names of the members
+	:type names: list
+	:param kw: settings for each CircuitBreaker
+	:type kw: named args
+	"""
+	def __init__(self, names, **kw):
+		self.breaker = {k: CircuitBreaker(k, **kw) for k in names}
+		self.names = list(names)
+		self.next = 0
+
+	def route(self):
+		"""Select the next member that accepts traffic, in rotation. Return the name or None."""
+		n = len(self.names)
+		for i in range(n):
+			k = self.names[(self.next + i) % n]
+			if self.breaker[k].allow():
+				self.next = (self.next + i + 1) % n
+				return k
+		return None
+
+	def record(self, name, success):
+		"""Note the outcome of a request routed to the named member."""
+		self.breaker[name].record(success)
+
+	def report(self):
+		"""Current status of every breaker. Return a BreakerReport."""
+		return BreakerReport([self.breaker[k].status for k in self.names])
@@ -0,0 +1,209 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Capture of inbound traffic to a compact file, for later replay.
+
+A CaptureWriter records the life of every session at a server, i.e.
+the opening, each inbound message and the close, with the time since
+the start of the capture. A CaptureReader loads the file as a Workload,
+i.e. the sessions with their messages in order, ready for replay by
+replay-capture.py.
+
+The file is a short header followed by binary records;
+
+* OPEN - offset and session id,
+* MESSAGE - offset, session id and payload code,
+* CLOSE - offset and session id,
+* PAYLOAD - payload code, type name and encoded message.
+
+Messages are encoded with the standard ansar codec. Production traffic
+tends to repeat itself (e.g. every Enquiry is the same) so identical
+encodings are stored once, as a PAYLOAD record, and a MESSAGE costs
+17 bytes. Interning stops at PAYLOAD_LIMIT distinct payloads, after
+which every new payload is written out in full.
+
+A file that ends part way through a record (e.g. the server was
+killed), or with a payload that cannot be decoded, is loaded up to
+that record. Loading requires that the types
+of all the captured messages are registered, i.e. the reading process
+imports the same message definitions as the server.
+
+A CaptureWriter is not thread-safe. It is intended for the machines
+of a server that share the one dispatching thread.
+'''
+import struct
+import time
+import ansar.connect as ar
+
+__all__ = [
+	'MAGIC',
+	'PAYLOAD_LIMIT',
+	'CaptureError',
+	'CaptureWriter',
+	'Recorded',
+	'Workload',
+	'CaptureReader',
+]
+
+MAGIC = b'ANSARCAP\x01'
+PAYLOAD_LIMIT = 4096
+
+OPEN = 1
+MESSAGE = 2
+CLOSE = 3
+PAYLOAD = 4
+
+KIND = struct.Struct('<B')
+SESSION = struct.Struct('<dI')			# OPEN, CLOSE.
+MESSAGED = struct.Struct('<dII')		# MESSAGE.
+PAYLOADED = struct.Struct('<IHI')		# PAYLOAD, followed by name and encoding.
+
+class CaptureError(Exception):
+	pass
+
+class CaptureWriter(object):
+	"""Record the traffic of a server.
+
+	:param path: name of the capture file
+	:type path: str
+	"""
+	def __init__(self, path):
+		self.file = open(path, 'wb', buffering=64 * 1024)
+		self.file.write(MAGIC)
+		self.started = time.monotonic()
+		self.codec = ar.CodecJson()
+		self.payload = {}
+		self.code = 0
+		self.session = 0
+		self.messages = 0
+
+	def offset(self):
+		return time.monotonic() - self.started
+
+	def put(self, record):
+		if self.file.closed:		# Late activity, e.g. sessions closing after the server.
+			return
+		self.file.write(record)
+
+	def open_session(self):
+		"""Note the start of a session. Return the session id."""
+		self.session += 1
+		self.put(KIND.pack(OPEN) + SESSION.pack(self.offset(), self.session))
+		return self.session
+
+	def message(self, session, message):
+		"""Note an inbound message."""
+		encoding = self.codec.encode(message, ar.Any()).encode('utf-8')
+		code = self.payload.get(encoding, None)
+		if code is None:
+			self.code += 1
+			code = self.code
+			name = message.__art__.path.encode('utf-8')
+			self.put(KIND.pack(PAYLOAD) + PAYLOADED.pack(code, len(name), len(encoding)) + name + encoding)
+			if len(self.payload) < PAYLOAD_LIMIT:
+				self.payload[encoding] = code
+		self.put(KIND.pack(MESSAGE) + MESSAGED.pack(self.offset(), session, code))
+		self.messages += 1
+
+	def close_session(self, session):
+		"""Note the end of a session."""
+		self.put(KIND.pack(CLOSE) + SESSION.pack(self.offset(), session))
+
+	def close(self):
+		self.file.close()
+
+#
+#
+class Recorded(object):
+	"""The history of one session."""
+	def __init__(self, session, opened):
+		self.session = session
+		self.opened = opened
+		self.closed = None
+		self.messages = []			# (offset, payload code)
+
+class Workload(object):
+	"""The contents of a capture file."""
+	def __init__(self):
+		self.sessions = {}
+		self.payload = {}			# Code -> (type name, message).
+
+	def message(self, code):
+		return self.payload[code][1]
+
+	def duration(self):
+		"""Time from start of capture to the last recorded event."""
+		last = 0.0
+		for r in self.sessions.values():
+			last = max(last, r.closed or 0.0, r.messages[-1][0] if r.messages else 0.0)
+		return last
+
+class CaptureReader(object):
+	"""Load a capture file."""
+	def __init__(self, path):
+		self.path = path
+		self.codec = ar.CodecJson()
+
+	def load(self):
+		"""Read the file. Return a Workload."""
+		with open(self.path, 'rb') as f:
+			m = memoryview(f.read())
+		if bytes(m[:len(MAGIC)]) != MAGIC:
+			raise CaptureError(f'"{self.path}" is not a capture file')
+
+		w = Workload()
+		i = len(MAGIC)
+		n = len(m)
+		try:
+			while i < n:
+				kind = m[i]
+				i += 1
+				if kind == MESSAGE:
+					offset, session, code = MESSAGED.unpack_from(m, i)
+					i += MESSAGED.size
+					w.sessions[session].messages.append((offset, code))
+				elif kind == OPEN:
+					offset, session = SESSION.unpack_from(m, i)
+					i += SESSION.size
+					w.sessions[session] = Recorded(session, offset)
+				elif kind == CLOSE:
+					offset, session = SESSION.unpack_from(m, i)
+					i += SESSION.size
+					w.sessions[session].closed = offset
+				elif kind == PAYLOAD:
+					code, name_size, size = PAYLOADED.unpack_from(m, i)
+					i += PAYLOADED.size
+					if i + name_size + size > n:
+						break					# Cut short.
+					name = str(m[i:i + name_size], 'utf-8')
+					i += name_size
+					encoding = str(m[i:i + size], 'utf-8')
+					i += size
+					message, _ = self.codec.decode(encoding, ar.Any())
+					w.payload[code] = (name, message)
+				else:
+					raise CaptureError(f'unknown record {kind} at byte {i - 1}')
+		except (struct.error, UnicodeDecodeError, ar.CodecError):
+			pass				# Last record cut short, e.g. server killed.
+		except KeyError as e:
+			raise CaptureError(f'"{self.path}" is damaged (no session or payload {e})')
+		return w
@@ -0,0 +1,210 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Logical channels multiplexed over a single network connection.
+
+A connection normally carries the messages of exactly one pair of
+session objects. The Multiplexer in this module is used as the session
+object (i.e. the session=CreateFrame(...) argument to connect() or
+listen()) and in turn creates any number of channel objects. Every
+message between a channel object and its remote peer is wrapped in an
+OnChannel message that carries the channel number.
+
+Channel objects are written as if they were session objects. They are
+passed a remote_address and use it as the destination for their
+messages. That address is actually the local Multiplexer, which
+adds the channel number and passes the message on to the remote
+Multiplexer. Replies (i.e. self.reply()) work in the same manner.
+
+Opening a channel is a single OpenChannel message, with no round
+trip. A channel is closed by the completion of either of its
+channel objects, resulting in a single ChannelClosed message and
+the termination of the other object. There is no connection setup,
+no additional socket and no additional kernel buffering.
+
+Notes:
+* channel numbers are allocated by the opening end, odd numbers for
+  the connecting end and even numbers for the listening end, i.e. the
+  Multiplexer passed to connect() is created with connecting=True,
+* the connecting end completes when all the channels it opened are
+  closed, passing a list of the channel completion values,
+* the listening end runs until the connection is lost.
+'''
+import ansar.connect as ar
+
+__all__ = [
+	'OpenChannel',
+	'CloseChannel',
+	'ChannelClosed',
+	'OnChannel',
+	'Multiplexer',
+]
+
+# Channel management and application messages.
+class OpenChannel(object):
+	def __init__(self, channel=None):
+		self.channel = channel
+
+class CloseChannel(object):
+	def __init__(self, channel=None):
+		self.channel = channel
+
+class ChannelClosed(object):
+	def __init__(self, channel=None, value=None):
+		self.channel = channel
+		self.value = value
+
+class OnChannel(object):
+	def __init__(self, channel=None, message=None):
+		self.channel = channel
+		self.message = message
+
+CHANNEL_SCHEMA = {
+	'channel': int,
+}
+
+CHANNEL_CLOSED_SCHEMA = {
+	'channel': int,
+	'value': ar.Any(),
+}
+
+ON_CHANNEL_SCHEMA = {
+	'channel': int,
+	'message': ar.Any(),
+}
+
+ar.bind(OpenChannel, object_schema=CHANNEL_SCHEMA)
+ar.bind(CloseChannel, object_schema=CHANNEL_SCHEMA)
+ar.bind(ChannelClosed, object_schema=CHANNEL_CLOSED_SCHEMA)
+ar.bind(OnChannel, object_schema=ON_CHANNEL_SCHEMA)
+
+#
+#
+class INITIAL: pass
+class RUNNING: pass
+class CLEARING: pass
+
+class Multiplexer(ar.Point, ar.StateMachine):
+	def __init__(self, accept=None, opening=None, connecting=False, remote_address=None, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.accept = accept						# Object for channels opened remotely.
+		self.opening = opening or []				# Objects for channels opened locally.
+		self.remote_address = remote_address		# The remote Multiplexer.
+		self.next_channel = 1 if connecting else 2	# Parity of the end of the connection.
+		self.channel_address = {}					# Channel number to local object.
+		self.closed = []							# Completion values of opened channels.
+
+	def open_channel(self, frame, channel):
+		a = self.create(frame.object_type, *frame.args, remote_address=self.address, **frame.kw)
+		self.assign(a, channel)
+		self.channel_address[channel] = a
+		return a
+
+	def ours(self, channel):
+		return channel % 2 == self.next_channel % 2
+
+	def close_channel(self, channel):
+		a = self.channel_address.pop(channel, None)
+		if a is not None:
+			self.send(ar.Stop(), a)
+
+def Multiplexer_INITIAL_Start(self, message):
+	for f in self.opening:
+		c = self.next_channel
+		self.next_channel += 2
+		self.send(OpenChannel(c), self.remote_address)		# Remote end creates its object.
+		self.open_channel(f, c)								# Local end immediately live.
+	return RUNNING
+
+def Multiplexer_RUNNING_OpenChannel(self, message):
+	c = message.channel
+	if self.accept is None or c in self.channel_address or self.ours(c):
+		self.send(ChannelClosed(c, ar.Nak()), self.remote_address)
+		return RUNNING
+	self.open_channel(self.accept, c)
+	return RUNNING
+
+def Multiplexer_RUNNING_OnChannel(self, message):			# Inbound, from remote.
+	a = self.channel_address.get(message.channel, None)
+	if a is None:											# Closed or never opened.
+		return RUNNING
+	self.send(message.message, a)
+	return RUNNING
+
+def Multiplexer_RUNNING_CloseChannel(self, message):
+	self.close_channel(message.channel)
+	return RUNNING
+
+def Multiplexer_RUNNING_ChannelClosed(self, message):		# Remote object has completed.
+	self.close_channel(message.channel)
+	return RUNNING
+
+def Multiplexer_RUNNING_Completed(self, message):			# Local object has completed.
+	c = self.debrief()
+	if c is None:
+		return RUNNING
+	if self.channel_address.pop(c, None) is not None:		# Not already closed by remote.
+		self.send(ChannelClosed(c, message.value), self.remote_address)
+
+	if self.ours(c):
+		self.closed.append(message.value)
+		if len(self.closed) == len(self.opening):
+			self.complete(self.closed)
+	return RUNNING
+
+def Multiplexer_RUNNING_Stop(self, message):				# Connection is going down.
+	if self.abort() == 0:
+		self.complete(ar.Aborted())
+	self.channel_address = {}
+	return CLEARING
+
+def Multiplexer_RUNNING_Unknown(self, message):				# Outbound, from local object.
+	c = self.progress()
+	if c is None:
+		t = ar.tof(message)
+		s = ar.Rejected(client_request=(t, [ar.tof(OnChannel)]))
+		self.warning(s)
+		return RUNNING
+	if c in self.channel_address:
+		self.send(OnChannel(c, message), self.remote_address)
+	return RUNNING
+
+def Multiplexer_CLEARING_Completed(self, message):
+	self.debrief()
+	if self.working() == 0:
+		self.complete(ar.Aborted())
+	return CLEARING
+
+MULTIPLEXER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(OpenChannel, OnChannel, CloseChannel, ChannelClosed, ar.Completed, ar.Stop, ar.Unknown), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(Multiplexer, MULTIPLEXER_DISPATCH)
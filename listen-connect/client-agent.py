@@ -0,0 +1,250 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A long-lived client agent that keeps warm connections to servers.
+
+The connect-client examples run as short-lived processes. Every run pays
+for the process start, the TCP handshake and the Connected negotiation,
+only to send a single Enquiry. This agent takes on the connecting. It
+uses ConnectToAddress (see connect-to-address.py) to maintain a connection
+to each of the configured servers, across restarts of those servers and
+loss of the network.
+
+The agent also listens on a local port. A thin client (see
+connect-client-agent.py) connects to that port and sends its request. The
+request is relayed over one of the warm connections and the response is
+relayed back. The cost to the thin client is a local hop rather than a
+connection to the remote server.
+
+Essential actions of the 2-state relay machine (Relay);
+* INITIAL - receive Start, send request to server, shift to RELAYING
+* RELAYING - receive any response, send it to the client, complete
+
+Essential actions of the 4-state controller machine (Agent);
+* INITIAL - receive Start, create connectors, call listen(), shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive UseAddress/NoAddress, update the table of servers
+* RUNNING - receive a client request, create Relay, shift to RUNNING
+* RUNNING - receive Stop, stop connectors and relays, shift to CLEARING
+* CLEARING - receive Completed, complete when all are done
+
+Each request is passed to the next server that has a connection, in
+rotation. Where none of the servers is connected the client receives
+a NoAddress.
+'''
+import ansar.connect as ar
+
+# Where are the servers and
+# where to listen for clients.
+class Settings(object):
+	def __init__(self, listening_ipp=None, connecting_ipp=None, seconds=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.connecting_ipp = connecting_ipp or []
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'connecting_ipp': ar.VectorOf(ar.UserDefined(ar.HostPort)),
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Pass one request to a server and the response
+# back to the client.
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+class RELAYING: pass
+class CLEARING: pass
+
+class Relay(ar.Point, ar.StateMachine):
+	def __init__(self, request, server, client, seconds):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.request = request
+		self.server = server
+		self.client = client
+		self.seconds = seconds
+
+def Relay_INITIAL_Start(self, message):
+	self.send(self.request, self.server)
+	if self.seconds:
+		self.start(ar.T1, self.seconds)
+	return RELAYING
+
+def Relay_RELAYING_T1(self, message):			# Server took too long.
+	t = ar.TimedOut(message)
+	self.send(t, self.client)
+	self.complete(t)
+
+def Relay_RELAYING_Stop(self, message):			# Agent is clearing.
+	self.send(ar.Aborted(), self.client)
+	self.complete(ar.Aborted())
+
+def Relay_RELAYING_Unknown(self, message):		# Response from server.
+	self.send(message, self.client)
+	self.complete(ar.Ack())
+
+RELAY_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RELAYING: (
+		(ar.T1, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Relay, RELAY_DISPATCH)
+
+# Controller for the agent. Connections to
+# servers, the local port and the relays.
+class Agent(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+		self.connector = {}		# Connector address -> server address or None.
+		self.relay = set()		# Addresses of relays in progress.
+		self.next = 0
+		self.reason = None
+
+	def server(self):
+		"""Select the next connected server, in rotation. Return its address or None."""
+		ready = [s for s in self.connector.values() if s is not None]
+		if not ready:
+			return None
+		s = ready[self.next % len(ready)]
+		self.next += 1
+		return s
+
+	def clear(self, reason):
+		"""Stop everything this agent has created. Return true if there is nothing to wait for."""
+		self.reason = reason
+		for a in self.connector.keys():
+			self.send(ar.Stop(), a)
+		for a in self.relay:
+			self.send(ar.Stop(), a)
+		return not self.connector and not self.relay
+
+def Agent_INITIAL_Start(self, message):
+	for ipp in self.settings.connecting_ipp:
+		a = self.create(ar.ConnectToAddress, ipp)
+		self.connector[a] = None
+	ar.listen(self, self.settings.listening_ipp)
+	return STARTING
+
+def Agent_STARTING_Listening(self, message):
+	self.listening = message
+	return RUNNING
+
+def Agent_STARTING_NotListening(self, message):
+	if self.clear(message):
+		self.complete(message)
+	return CLEARING
+
+def Agent_STARTING_Stop(self, message):
+	if self.clear(ar.Aborted()):
+		self.complete(self.reason)
+	return CLEARING
+
+def Agent_RUNNING_UseAddress(self, message):		# Server connected.
+	self.connector[self.return_address] = message.address
+	return RUNNING
+
+def Agent_RUNNING_NoAddress(self, message):			# Server lost.
+	self.connector[self.return_address] = None
+	return RUNNING
+
+def Agent_RUNNING_Accepted(self, message):			# Session management.
+	return RUNNING
+
+def Agent_RUNNING_Abandoned(self, message):
+	return RUNNING
+
+def Agent_RUNNING_Closed(self, message):
+	return RUNNING
+
+def Agent_RUNNING_Completed(self, message):
+	self.relay.discard(self.return_address)
+	self.connector.pop(self.return_address, None)
+	return RUNNING
+
+def Agent_RUNNING_NotAccepted(self, message):		# Network problems.
+	if self.clear(message):
+		self.complete(message)
+	return CLEARING
+
+def Agent_RUNNING_NotListening(self, message):
+	if self.clear(message):
+		self.complete(message)
+	return CLEARING
+
+def Agent_RUNNING_Stop(self, message):				# Intervention.
+	if self.clear(ar.Aborted()):
+		self.complete(self.reason)
+	return CLEARING
+
+def Agent_RUNNING_Unknown(self, message):			# Client request.
+	server = self.server()
+	if server is None:
+		self.reply(ar.NoAddress())
+		return RUNNING
+	a = self.create(Relay, message, server, self.return_address, self.settings.seconds)
+	self.relay.add(a)
+	return RUNNING
+
+def Agent_CLEARING_Completed(self, message):
+	self.relay.discard(self.return_address)
+	self.connector.pop(self.return_address, None)
+	if self.connector or self.relay:
+		return CLEARING
+	self.complete(self.reason)
+
+AGENT_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), (ar.UseAddress, ar.NoAddress)
+	),
+	RUNNING: (
+		(ar.UseAddress, ar.NoAddress,
+		ar.Accepted, ar.Abandoned, ar.Closed, ar.Completed,
+		ar.NotAccepted, ar.NotListening, ar.Stop, ar.Unknown), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(Agent, AGENT_DISPATCH)
+
+#
+#
+factory_settings = Settings(listening_ipp=ar.HostPort('127.0.0.1', 5016),
+	connecting_ipp=[ar.HostPort('127.0.0.1', 5011)],
+	seconds=3.0)
+
+if __name__ == '__main__':
+	ar.create_object(Agent, factory_settings=factory_settings)
@@ -0,0 +1,223 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Coalescing of identical requests and caching of responses, for servers.
+
+A server that performs real work for each request (e.g. a database
+query) can be swamped when many clients send the same request at the
+same moment, i.e. a "thundering herd". The Coalescer object sits
+between the sessions of a server and the work;
+
+* sessions forward each request to the Coalescer, passing the return
+  address of the client,
+* the first instance of a request starts the work and the client is
+  recorded as waiting,
+* identical requests arriving while the work is in progress are added
+  to the waiting clients, i.e. there is no further work,
+* on completion of the work the response is sent to every waiting
+  client and optionally saved in a cache,
+* a request that matches an entry in the cache is answered immediately.
+
+Requests are identical when they encode to the same text. Only requests
+that are idempotent (i.e. the same request always produces the same
+response) should be passed to a Coalescer.
+
+The cache is limited in size and the age of its entries. The least
+recently used entry is evicted when the cache is full, and entries older
+than the time-to-live are expired at the moment of lookup. A size of
+zero disables the cache.
+
+Counts of requests, hits, misses, coalesced requests, evictions and
+expirations are kept in a CoalescingMetrics object and logged as a
+sample, periodically and at termination.
+'''
+import time
+from collections import OrderedDict
+import ansar.connect as ar
+
+__all__ = [
+	'CoalescingMetrics',
+	'ResponseCache',
+	'Coalescer',
+]
+
+#
+#
+class CoalescingMetrics(object):
+	def __init__(self):
+		self.requests = 0
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self.computed = 0
+		self.evictions = 0
+		self.expirations = 0
+
+	def sample(self, point):
+		"""Log the counts as a sample."""
+		point.sample(requests=self.requests, hits=self.hits, misses=self.misses,
+			coalesced=self.coalesced, computed=self.computed,
+			evictions=self.evictions, expirations=self.expirations)
+
+class ResponseCache(object):
+	"""A map of key to response with LRU eviction and a time-to-live.
+
+	:param size: maximum number of entries, zero to disable
+	:type size: int
+	:param ttl: seconds before an entry expires, or None
+	:type ttl: float
+	:param metrics: counts of cache activity
+	:type metrics: CoalescingMetrics
+	"""
+	def __init__(self, size, ttl, metrics):
+		self.size = size or 0
+		self.ttl = ttl
+		self.metrics = metrics
+		self.entry = OrderedDict()		# Key -> [response, expiry].
+
+	def get(self, key):
+		"""Lookup the key. Return the response or None."""
+		if self.size < 1:
+			return None
+		e = self.entry.get(key, None)
+		if e is None:
+			self.metrics.misses += 1
+			return None
+		if e[1] is not None and time.monotonic() > e[1]:
+			del self.entry[key]
+			self.metrics.expirations += 1
+			self.metrics.misses += 1
+			return None
+		self.entry.move_to_end(key)
+		self.metrics.hits += 1
+		return e[0]
+
+	def put(self, key, response):
+		"""Save the response, evicting the least recently used if full."""
+		if self.size < 1:
+			return
+		expiry = time.monotonic() + self.ttl if self.ttl else None
+		self.entry[key] = [response, expiry]
+		self.entry.move_to_end(key)
+		while len(self.entry) > self.size:
+			self.entry.popitem(last=False)
+			self.metrics.evictions += 1
+
+#
+#
+class INITIAL: pass
+class RUNNING: pass
+class CLEARING: pass
+
+SAMPLE_PERIOD = 10.0
+
+class Coalescer(ar.Point, ar.StateMachine):
+	def __init__(self, work, coalesce=True, size=None, ttl=None):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.work = work				# CreateFrame, request passed as additional arg.
+		self.coalesce = coalesce
+		self.metrics = CoalescingMetrics()
+		self.cache = ResponseCache(size, ttl, self.metrics)
+		self.codec = ar.CodecJson()
+		self.waiting = {}				# Key -> list of client addresses.
+		self.in_flight = {}				# Work address -> key, waiting key.
+
+	def key(self, request):
+		"""Reduce the request to a hashable form."""
+		return self.codec.encode(request, ar.Any())
+
+def Coalescer_INITIAL_Start(self, message):
+	self.start(ar.T1, SAMPLE_PERIOD, repeating=True)
+	return RUNNING
+
+def Coalescer_RUNNING_Completed(self, message):		# Work is done.
+	k = self.in_flight.pop(self.return_address, None)
+	if k is None:
+		return RUNNING
+	k, w = k
+	response = message.value
+	for a in self.waiting.pop(w, ()):
+		self.send(response, a)
+	if isinstance(response, ar.Faulted):				# Do not cache errors.
+		return RUNNING
+	self.cache.put(k, response)
+	return RUNNING
+
+def Coalescer_RUNNING_T1(self, message):
+	self.metrics.sample(self)
+	return RUNNING
+
+def Coalescer_RUNNING_Stop(self, message):
+	self.metrics.sample(self)
+	if not self.in_flight:
+		self.complete(ar.Aborted())
+	for a in self.in_flight.keys():
+		self.send(ar.Stop(), a)
+	return CLEARING
+
+def Coalescer_RUNNING_Unknown(self, message):		# Client request.
+	self.metrics.requests += 1
+	k = self.key(message)
+	response = self.cache.get(k)
+	if response is not None:
+		self.reply(response)
+		return RUNNING
+
+	if self.coalesce:
+		w = k
+		waiting = self.waiting.get(w, None)
+		if waiting is not None:							# Already in progress.
+			waiting.append(self.return_address)
+			self.metrics.coalesced += 1
+			return RUNNING
+	else:
+		w = (k, self.metrics.requests)					# Unique.
+
+	self.waiting[w] = [self.return_address]
+	self.metrics.computed += 1
+	c = self.work
+	a = self.create(c.object_type, message, *c.args, **c.kw)
+	self.in_flight[a] = (k, w)
+	return RUNNING
+
+def Coalescer_CLEARING_Completed(self, message):
+	k, w = self.in_flight.pop(self.return_address, (None, None))
+	for a in self.waiting.pop(w, ()):
+		self.send(ar.Aborted(), a)
+	if self.in_flight:
+		return CLEARING
+	self.complete(ar.Aborted())
+
+COALESCER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Completed, ar.T1, ar.Stop, ar.Unknown), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(Coalescer, COALESCER_DISPATCH)
@@ -0,0 +1,96 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''An asyncio client for listen-server.
+
+A copy of connect-client-ask except that the exchanges are coroutines,
+running in an asyncio event loop (see awaiting.py). The single blocking
+ask() becomes a configured number of concurrent awaits of aw.ask(), all
+over the one connection and all within the thread of the function
+object.
+
+Procedure is;
+* connect and await Connected,
+* send the configured number of Enquiry requests, concurrently,
+* await every response,
+* return the first unexpected response, or else the last Ack.
+
+Refer to connect-client-ask.py and awaiting.py for further notes.
+'''
+import asyncio
+import ansar.connect as ar
+import awaiting
+
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, requests=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.seconds = seconds
+		self.requests = requests
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'seconds': float,
+	'requests': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+async def session(aw, settings):
+	ar.connect(aw.point, settings.connecting_ipp)
+
+	m = await aw.select(ar.Connected, ar.NotConnected, ar.Stop)
+	if isinstance(m, ar.NotConnected):
+		return m
+	elif isinstance(m, ar.Stop):
+		return ar.Aborted()
+	server = aw.return_address
+
+	# Send the requests and expect the responses.
+	asking = [aw.ask(ar.Enquiry(), (ar.Ack, ar.Nak, ar.Other), server, seconds=settings.seconds)
+		for _ in range(settings.requests or 1)]
+	response = await asyncio.gather(*asking)
+
+	expected = (ar.Ack, ar.Nak)
+	for m in response:
+		if isinstance(m, expected):
+			continue
+		elif isinstance(m, ar.SelectTimer):
+			return ar.TimedOut(m)
+		elif isinstance(m, ar.Aborted):
+			return m
+		t = ar.tof(m.value)
+		a = [ar.tof(e) for e in expected]
+		return ar.Rejected(server_response=(t, a))
+
+	return response[-1]
+
+def client(self, settings):
+	return awaiting.run(self, session, settings)
+
+ar.bind(client)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5011), seconds=3.0, requests=100)
+
+if __name__ == '__main__':
+	ar.create_object(client, factory_settings=factory_settings)
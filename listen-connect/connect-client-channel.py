@@ -0,0 +1,182 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based client that opens multiple logical channels over one connection.
+
+A copy of connect-client-session except that the session object passed
+to connect() is a Multiplexer (see channelling.py). The Multiplexer opens
+the configured number of channels, each with its own instance of the
+ClientChannel machine. Every ClientChannel performs the Enquiry-Ack
+exchange independently of the others, sharing the single connection.
+
+Essential actions of the 2-state channel machine (ClientChannel);
+* INITIAL - receive Start, send Enquiry, shift to ENQUIRED
+* ENQUIRED - receive Ack, complete
+
+Essential actions of the 3-state controller machine (Client);
+* INITIAL - receive Start, call connect(), shift to STARTING
+* STARTING - receive Connected, shift to RUNNING
+* RUNNING - receive Closed, complete
+
+The Multiplexer completes when every channel it opened has closed,
+returning the list of channel completion values. The Client reduces
+that list to a single output, i.e. the first channel that did not
+receive an Ack or else the final Ack.
+
+Refer below and to connect-client-session.py and channelling.py for
+further notes.
+'''
+import ansar.connect as ar
+from channelling import Multiplexer
+
+# Where is the server?
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, channels=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.seconds = seconds
+		self.channels = channels
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'seconds': float,
+	'channels': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Opening end of a channel.
+# Instantiated by the Multiplexer for each channel it
+# opens. The remote_address is the local Multiplexer.
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+class ENQUIRED: pass
+
+class ClientChannel(ar.Point, ar.StateMachine):
+	def __init__(self, seconds, remote_address=None, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.seconds = seconds
+		self.remote_address = remote_address
+		self.expected = (ar.Ack, ar.Nak)
+
+def ClientChannel_INITIAL_Start(self, message):
+	self.send(ar.Enquiry(), self.remote_address)	# Send the request.
+	if self.seconds:
+		self.start(ar.T1, self.seconds)				# Start timer.
+	return ENQUIRED
+
+def ClientChannel_ENQUIRED_Ack(self, message):		# Receive server response.
+	self.complete(message)
+
+def ClientChannel_ENQUIRED_Nak(self, message):
+	self.complete(message)
+
+def ClientChannel_ENQUIRED_Stop(self, message):		# Channel or connection is closing.
+	self.complete(ar.Aborted())
+
+def ClientChannel_ENQUIRED_T1(self, message):		# Server took too long.
+	t = ar.TimedOut(message)
+	self.complete(t)
+
+def ClientChannel_ENQUIRED_Unknown(self, message):	# None of the above.
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	r = ar.Rejected(server_response=(t, a))
+	self.complete(r)
+
+CLIENT_CHANNEL_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	ENQUIRED: (
+		(ar.Ack, ar.Nak, ar.Stop, ar.T1, ar.Unknown), ()
+	),
+}
+
+ar.bind(ClientChannel, CLIENT_CHANNEL_DISPATCH)
+
+# Controller for the connecting end.
+# Session management and network problems,
+# instantiated by create_object().
+class Client(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.connected = None
+
+def Client_INITIAL_Start(self, message):
+	channel = ar.CreateFrame(ClientChannel, self.settings.seconds)
+	opening = [channel] * (self.settings.channels or 1)
+	session = ar.CreateFrame(Multiplexer, opening=opening, connecting=True)
+	ar.connect(self, self.settings.connecting_ipp, session=session)
+	return STARTING
+
+def Client_STARTING_Connected(self, message):
+	self.connected = message
+	return RUNNING
+
+def Client_STARTING_NotConnected(self, message):
+	self.complete(message)
+
+def Client_STARTING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+def Client_RUNNING_Closed(self, message):
+	# Multiplexer has completed. Pass the first
+	# channel that failed or the last Ack.
+	closed = message.value
+	if not isinstance(closed, list):
+		self.complete(closed)
+	for c in closed:
+		if not isinstance(c, ar.Ack):
+			self.complete(c)
+	self.complete(closed[-1])
+
+def Client_RUNNING_Abandoned(self, message):
+	# Connection was interrupted.
+	self.complete(message)
+
+def Client_RUNNING_Stop(self, message):
+	self.complete(message)
+
+CLIENT_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Connected, ar.NotConnected, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Closed, ar.Abandoned, ar.Stop), ()
+	),
+}
+
+ar.bind(Client, CLIENT_DISPATCH)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5014), seconds=3.0, channels=8)
+
+if __name__ == '__main__':
+	ar.create_object(Client, factory_settings=factory_settings)
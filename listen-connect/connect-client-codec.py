@@ -0,0 +1,224 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based client that negotiates a compact binary codec and compression with the server.
+
+A copy of connect-client-session except that the session opens with
+a Hello-Welcome exchange that selects the codec for the remainder of
+the session (see packing.py). The Enquiry has no fields and is sent
+as it is, whatever the codec. The response is a ServerList, i.e. a
+message with real fields that is packed with the packed codec and,
+where compression was agreed, compressed as a block larger than the
+threshold. The ServerList is the output of the client.
+
+Essential actions of the 3-state session machine (ClientSession);
+* INITIAL - receive Start, send Hello, shift to OPENING
+* OPENING - receive Welcome, send Enquiry, shift to ENQUIRED
+* ENQUIRED - receive Packed or Compressed, forward contents to self, shift to ENQUIRED
+* ENQUIRED - receive ServerList, complete
+
+The controller machine (Client) is unchanged from connect-client-session.
+
+Refer below and to connect-client-session.py and packing.py for further
+notes.
+'''
+import ansar.connect as ar
+from packing import Welcome, Packed, Compressed, ServerList, Packing, Encoding, PackingError
+from packing import PACKED_CODEC, ZLIB_COMPRESSION, COMPRESSION_THRESHOLD
+
+# Where is the server and which codec and compression to ask for?
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, codec=None, compression=None, threshold=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.seconds = seconds
+		self.codec = codec
+		self.compression = compression
+		self.threshold = threshold
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'seconds': float,
+	'codec': str,
+	'compression': str,
+	'threshold': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The messages that may be packed. Must be the same
+# table, in the same order, at both ends.
+PACKING = Packing(ar.Enquiry, ar.Ack, ar.Nak, ServerList)
+
+# Session for the connecting end.
+# Instantiated by the sockets subsystem at the moment
+# a transport is successfully established, as directed
+# by the "connect()" call in the controller object below.
+# The server session is available at "remote_address".
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+class OPENING: pass
+class ENQUIRED: pass
+
+class ClientSession(ar.Point, ar.StateMachine):
+	def __init__(self, seconds, codec, compression, threshold, remote_address=None, **kv):		# Connection is verified.
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.seconds = seconds						# Save values needed during the
+		self.codec = codec							# life of the session.
+		self.compression = compression
+		self.remote_address = remote_address
+		self.encoding = Encoding(PACKING, threshold=threshold)
+		self.expected = (ServerList, ar.Ack, ar.Nak)
+
+	def metrics(self):
+		if self.encoding.compression:
+			self.sample(**self.encoding.metrics.sample())
+
+def ClientSession_INITIAL_Start(self, message):
+	hello = self.encoding.hello(self.codec, self.compression)	# Propose codecs.
+	self.send(hello, self.remote_address)
+	if self.seconds:
+		self.start(ar.T1, self.seconds)				# Start timer.
+	return OPENING
+
+def ClientSession_OPENING_Welcome(self, message):	# Codec selected by server.
+	self.encoding.welcomed(message)
+	request = self.encoding.outbound(ar.Enquiry())
+	self.send(request, self.remote_address)			# Send the request.
+	return ENQUIRED
+
+def ClientSession_OPENING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+def ClientSession_OPENING_T1(self, message):
+	t = ar.TimedOut(message)
+	self.complete(t)
+
+def ClientSession_ENQUIRED_Packed(self, message):	# Unpack and dispatch as normal.
+	try:
+		m = self.encoding.inbound(message)
+	except PackingError as e:
+		self.complete(ar.Faulted('cannot unpack response', str(e)))
+	self.forward(m, self.address, self.return_address)
+	return ENQUIRED
+
+ClientSession_ENQUIRED_Compressed = ClientSession_ENQUIRED_Packed
+
+def ClientSession_ENQUIRED_ServerList(self, message):	# Receive server response.
+	self.metrics()
+	self.complete(message)
+
+def ClientSession_ENQUIRED_Ack(self, message):
+	self.metrics()
+	self.complete(message)
+
+def ClientSession_ENQUIRED_Nak(self, message):
+	self.metrics()
+	self.complete(message)
+
+def ClientSession_ENQUIRED_Stop(self, message):		# Session is being terminated, e.g. Abandoned.
+	self.complete(ar.Aborted())
+
+def ClientSession_ENQUIRED_T1(self, message):		# Server took too long.
+	t = ar.TimedOut(message)
+	self.complete(t)
+
+def ClientSession_ENQUIRED_Unknown(self, message):	# None of the above.
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	r = ar.Rejected(server_response=(t, a))
+	self.complete(r)
+
+CLIENT_SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	OPENING: (
+		(Welcome, ar.Stop, ar.T1), ()
+	),
+	ENQUIRED: (
+		(Packed, Compressed, ServerList, ar.Ack, ar.Nak, ar.Stop, ar.T1, ar.Unknown), ()
+	),
+}
+
+ar.bind(ClientSession, CLIENT_SESSION_DISPATCH)
+
+# Controller for the connecting end.
+# Session management and network problems,
+# instantiated by create_object().
+class Client(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.connected = None
+
+def Client_INITIAL_Start(self, message):
+	session = ar.CreateFrame(ClientSession, self.settings.seconds, self.settings.codec,
+		self.settings.compression, self.settings.threshold)
+	ar.connect(self, self.settings.connecting_ipp, session=session)
+	return STARTING
+
+def Client_STARTING_Connected(self, message):
+	self.connected = message
+	return RUNNING
+
+def Client_STARTING_NotConnected(self, message):
+	self.complete(message)
+
+def Client_STARTING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+def Client_RUNNING_Closed(self, message):
+	# Session has completed. Terminate this controller passing
+	# the session value as the completion value for this machine.
+	self.complete(message.value)
+
+def Client_RUNNING_Abandoned(self, message):
+	# Session was interrupted
+	self.complete(message)
+
+def Client_RUNNING_Stop(self, message):
+	self.complete(message)
+
+CLIENT_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Connected, ar.NotConnected, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Closed, ar.Abandoned, ar.Stop), ()
+	),
+}
+
+ar.bind(Client, CLIENT_DISPATCH)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5015), seconds=3.0,
+	codec=PACKED_CODEC, compression=ZLIB_COMPRESSION, threshold=COMPRESSION_THRESHOLD)
+
+if __name__ == '__main__':
+	ar.create_object(Client, factory_settings=factory_settings)
@@ -0,0 +1,120 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A client for listen-server-tls, with TLS session resumption.
+
+A variation of connect-client that makes a series of short
+connections, i.e. connect, Enquiry, Ack and close, as a client
+that reconnects. Where enabled in the tls member of the settings,
+the connects are made to a local TlsTunnel (see securing.py) that
+relays over TLS to the server.
+
+With resume enabled the tunnel keeps the session of the latest
+connection and offers it on the next, i.e. only the first connection
+has a full handshake. The output is the TlsFigures of the tunnel,
+e.g. compare with resume disabled.
+
+The certificate of the server is trusted through the authority file,
+i.e. the self-signed server.crt generated by the certs target of the
+Makefile.
+'''
+import ansar.connect as ar
+from securing import TlsSettings, TlsFigures, SessionCache, client_context, TlsTunnel
+
+# Where is the server?
+class Settings(object):
+	def __init__(self, connecting_ipp=None, connections=None, seconds=None, tls=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.connections = connections
+		self.seconds = seconds
+		self.tls = tls or TlsSettings()
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'connections': int,
+	'seconds': float,
+	'tls': ar.UserDefined(TlsSettings),
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def exchange(self, connecting_ipp, seconds):
+	"""Connect, one Enquiry and close. Return None or a failure."""
+	ar.connect(self, connecting_ipp)
+	m = self.select(ar.Connected, ar.NotConnected, ar.Stop)
+	if isinstance(m, ar.NotConnected):
+		return m
+	elif isinstance(m, ar.Stop):
+		return ar.Aborted()
+	server = self.return_address
+
+	self.send(ar.Enquiry(), server)
+	m = self.select(ar.Ack, ar.Nak, ar.Abandoned, ar.Stop, seconds=seconds)
+	if isinstance(m, ar.Abandoned):
+		return m
+	elif isinstance(m, ar.Stop):
+		self.send(ar.Close(), server)
+		return ar.Aborted()
+	elif isinstance(m, ar.SelectTimer):
+		return ar.TimedOut(m)
+
+	self.send(ar.Close(), server)
+	self.select(ar.Closed, ar.Abandoned, seconds=seconds)
+	return None
+
+def client(self, settings):
+	tls = settings.tls
+	connecting_ipp = settings.connecting_ipp
+	tunnel = None
+	if tls.enabled:
+		try:
+			context = client_context(tls)
+		except OSError as e:
+			return ar.Faulted(f'cannot load authority "{tls.authority}"', str(e))
+		cache = SessionCache() if tls.resume else None
+		server_name = tls.server_name or connecting_ipp.host
+		tunnel = TlsTunnel(('127.0.0.1', 0), connecting_ipp.inet(), context, server_name, cache)
+		tunnel.start()
+		connecting_ipp = ar.HostPort(*tunnel.listening)
+
+	try:
+		for _ in range(settings.connections):
+			failed = exchange(self, connecting_ipp, settings.seconds)
+			if failed is not None:
+				return failed
+	finally:
+		if tunnel is not None:
+			tunnel.end()
+
+	if tunnel is None:
+		return TlsFigures(connections=settings.connections)
+	return tunnel.figures
+
+ar.bind(client)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5025), connections=10, seconds=3.0,
+	tls=TlsSettings(enabled=True, authority='server.crt', server_name='localhost'))
+
+if __name__ == '__main__':
+	ar.create_object(client, factory_settings=factory_settings)
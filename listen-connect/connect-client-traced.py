@@ -0,0 +1,207 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based client that traces its requests end-to-end.
+
+A copy of connect-client-session except that the session sends a
+series of requests, one at a time, each inside a Traced envelope (see
+tracing.py). A response arrives in an envelope carrying the stamps from
+both ends of the exchange. The session collects the durations of the
+spans and, where a trace file is configured, the Chrome trace events.
+
+Essential actions of the 2-state session machine (ClientSession);
+* INITIAL - receive Start, send Traced Enquiry, shift to ENQUIRED
+* ENQUIRED - receive Traced, record, send next Traced Enquiry, shift to ENQUIRED
+* ENQUIRED - receive Traced, record, write trace file, complete
+
+The controller machine (Client) is unchanged from connect-client-session.
+
+The output is a TraceReport, i.e. percentiles for the request, handle,
+response and round-trip spans in milliseconds. Use with
+listen-server-traced.py, e.g.;
+
+$ python3 connect-client-traced.py --requests=1000 --trace-file=trace.json
+
+Refer to connect-client-session.py and tracing.py for further notes.
+'''
+import ansar.connect as ar
+from tracing import Tracer, Traced, Breakdown, TraceFile, DISPATCH
+
+# Where is the server, how many requests
+# and where to put the traces.
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, requests=None, trace_file=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.seconds = seconds
+		self.requests = requests
+		self.trace_file = trace_file
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'seconds': float,
+	'requests': int,
+	'trace_file': str,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Session for the connecting end.
+# Instantiated by the sockets subsystem at the moment
+# a transport is successfully established, as directed
+# by the "connect()" call in the controller object below.
+# The server session is available at "remote_address".
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+class ENQUIRED: pass
+
+class ClientSession(ar.Point, ar.StateMachine):
+	def __init__(self, seconds, requests, trace_file, remote_address=None, **kv):		# Connection is verified.
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.seconds = seconds						# Save values needed during the
+		self.requests = requests or 1				# life of the session.
+		self.trace_file = trace_file
+		self.remote_address = remote_address
+		self.tracer = Tracer('client')
+		self.breakdown = Breakdown()
+		self.events = TraceFile() if trace_file else None
+		self.sent = 0
+		self.expected = (ar.Ack, ar.Nak)
+
+	def enquire(self):
+		self.send(self.tracer.begin(ar.Enquiry()), self.remote_address)
+		self.sent += 1
+		if self.seconds:
+			self.start(ar.T1, self.seconds)			# Restart timer.
+
+	def report(self):
+		if self.events is None:
+			return self.breakdown.report()
+		try:
+			self.events.write(self.trace_file)
+		except OSError as e:
+			return ar.Faulted(f'cannot write trace file "{self.trace_file}"', str(e))
+		return self.breakdown.report(self.trace_file)
+
+def ClientSession_INITIAL_Start(self, message):
+	self.enquire()									# Send the first request.
+	return ENQUIRED
+
+def ClientSession_ENQUIRED_Traced(self, message):	# Receive server response.
+	self.tracer.stamp(message, DISPATCH)
+	response = message.message
+	if not isinstance(response, self.expected):
+		t = ar.tof(response)
+		a = [ar.tof(e) for e in self.expected]
+		r = ar.Rejected(server_response=(t, a))
+		self.complete(r)
+	self.breakdown.add(message)
+	if self.events is not None:
+		self.events.add(message)
+	if self.sent < self.requests:
+		self.enquire()
+		return ENQUIRED
+	self.complete(self.report())
+
+def ClientSession_ENQUIRED_Stop(self, message):		# Session is being terminated, e.g. Abandoned.
+	self.complete(ar.Aborted())
+
+def ClientSession_ENQUIRED_T1(self, message):		# Server took too long.
+	t = ar.TimedOut(message)
+	self.complete(t)
+
+def ClientSession_ENQUIRED_Unknown(self, message):	# None of the above, e.g. an untraced server.
+	t = ar.tof(message)
+	a = [ar.tof(Traced)]
+	r = ar.Rejected(server_response=(t, a))
+	self.complete(r)
+
+CLIENT_SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	ENQUIRED: (
+		(Traced, ar.Stop, ar.T1, ar.Unknown), ()
+	),
+}
+
+ar.bind(ClientSession, CLIENT_SESSION_DISPATCH)
+
+# Controller for the connecting end.
+# Session management and network problems,
+# instantiated by create_object().
+class Client(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.connected = None
+
+def Client_INITIAL_Start(self, message):
+	s = self.settings
+	session = ar.CreateFrame(ClientSession, s.seconds, s.requests, s.trace_file)
+	ar.connect(self, s.connecting_ipp, session=session)
+	return STARTING
+
+def Client_STARTING_Connected(self, message):
+	self.connected = message
+	return RUNNING
+
+def Client_STARTING_NotConnected(self, message):
+	self.complete(message)
+
+def Client_STARTING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+def Client_RUNNING_Closed(self, message):
+	# Session has completed. Terminate this controller passing
+	# the session value as the completion value for this machine.
+	self.complete(message.value)
+
+def Client_RUNNING_Abandoned(self, message):
+	# Session was interrupted
+	self.complete(message)
+
+def Client_RUNNING_Stop(self, message):
+	self.complete(message)
+
+CLIENT_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Connected, ar.NotConnected, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Closed, ar.Abandoned, ar.Stop), ()
+	),
+}
+
+ar.bind(Client, CLIENT_DISPATCH)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5019), seconds=3.0, requests=100)
+
+if __name__ == '__main__':
+	ar.create_object(Client, factory_settings=factory_settings)
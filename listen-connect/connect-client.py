@@ -35,18 +35,23 @@ Notes:
 * pre-defined messages (i.e. Enquiry and Ack/Nak) are used as
   request-response messages to minimize the size of this example.
   Any registered messages (i.e. ar.bind()) can be used.
+* socket options can be set in the tuning member of the settings
+  (see tuning.py).
 '''
 import ansar.connect as ar
+from tuning import SocketTuning, tune, effective
 
 # Where is the server?
 class Settings(object):
-	def __init__(self, connecting_ipp=None, seconds=None):
+	def __init__(self, connecting_ipp=None, seconds=None, tuning=None):
 		self.connecting_ipp = connecting_ipp or ar.HostPort()
 		self.seconds = seconds
+		self.tuning = tuning or SocketTuning()
 
 SETTINGS_SCHEMA = {
 	'connecting_ipp': ar.UserDefined(ar.HostPort),
 	'seconds': float,
+	'tuning': ar.UserDefined(SocketTuning),
 }
 
 ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
@@ -64,6 +69,10 @@ ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
 # - network problems.
 
 def client(self, settings):
+	# Socket options, if any.
+	if not settings.tuning.default():
+		tune(settings.tuning)
+
 	# Initiate a connection.
 	ar.connect(self, settings.connecting_ipp)
 
@@ -74,6 +83,10 @@ def client(self, settings):
 	elif isinstance(m, ar.Stop):
 		return ar.Aborted()
 
+	e = effective(m.connected_ipp)
+	if e is not None:
+		self.console(f'Socket options {vars(e)}')
+
 	# Send a request.
 	# Return address (i.e. self.return_address) for the
 	# current Connected message is the remote end of the
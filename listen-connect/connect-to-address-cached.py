@@ -0,0 +1,118 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A client for listen-server using many ConnectToAddress objects and a resolver cache.
+
+A variation of connect-to-address.py where the server is known by a
+name, e.g. "listen-server.test", and a number of ConnectToAddress
+objects are created together, as for a large GroupTable. Lookups of
+the name are routed through a single ResolverCache (see resolving.py),
+i.e. one query for all the objects and all their connect attempts,
+for as long as the TTL of the answer.
+
+The nameserver can be the local stub (see stub-resolver.py) or, with
+an empty host, the nameservers of the system. A name in the hosts file
+needs no nameserver at all.
+
+Each object sends an Enquiry on receipt of its UseAddress. The output
+is the ResolverFigures of the cache, once all the Acks are in.
+
+Notes:
+* the name is resolved before the objects are created, i.e. their
+  first connects find it in the cache,
+* the cache is shared by every connect within the process, including
+  those of ConnectToAddress retries after a lost connection.
+'''
+import ansar.connect as ar
+from resolving import ResolverCache, cache_resolution
+
+# Where is the server?
+class Settings(object):
+	def __init__(self, connecting_ipp=None, nameserver_ipp=None, hosts=None, instances=None, seconds=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.nameserver_ipp = nameserver_ipp or ar.HostPort()
+		self.hosts = hosts
+		self.instances = instances
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'nameserver_ipp': ar.UserDefined(ar.HostPort),
+	'hosts': str,
+	'instances': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def client(self, settings):
+	ns = settings.nameserver_ipp
+	nameservers = [(ns.host, ns.port)] if ns.host else None
+	cache = ResolverCache(nameservers=nameservers, hosts=settings.hosts or None)
+	cache_resolution(cache)
+	cache.prefetch(settings.connecting_ipp.host, seconds=settings.seconds)
+
+	# Start the connection engines.
+	engines = [self.create(ar.ConnectToAddress, settings.connecting_ipp) for _ in range(settings.instances)]
+
+	def disconnect():
+		for a in engines:
+			self.send(ar.Stop(), a)
+		for _ in engines:
+			self.select(ar.Completed, seconds=settings.seconds)
+
+	# Request over each connection as it arrives.
+	acked = 0
+	while acked < settings.instances:
+		m = self.select(ar.UseAddress, ar.Ack, ar.Nak,
+			ar.NoAddress,
+			ar.Completed,
+			ar.Stop,
+			seconds=settings.seconds)
+		if isinstance(m, ar.UseAddress):
+			self.send(ar.Enquiry(), m.address)
+		elif isinstance(m, (ar.Ack, ar.Nak)):
+			acked += 1
+		elif isinstance(m, ar.NoAddress):		# Lost a connection. Another UseAddress to come.
+			continue
+		elif isinstance(m, ar.Completed):
+			disconnect()
+			return m.value
+		elif isinstance(m, ar.Stop):
+			disconnect()
+			return ar.Aborted()
+		else:
+			disconnect()
+			return ar.TimedOut(m)
+
+	disconnect()
+	return cache.report()
+
+ar.bind(client)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='listen-server.test', port=5011),
+	nameserver_ipp=ar.HostPort(host='127.0.0.1', port=5353), hosts='/etc/hosts', instances=20, seconds=5.0)
+
+if __name__ == '__main__':
+	ar.create_object(client, factory_settings=factory_settings)
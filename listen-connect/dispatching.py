@@ -0,0 +1,201 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Compiled and instrumented dispatch for state machines.
+
+The ar.bind() function resolves handler names such as Session_RUNNING_Enquiry
+once, into a table keyed on (state, message class). Each message is then
+dispatched with a lookup on a new tuple and, where there is no entry, an
+exception and a second lookup for the Unknown handler.
+
+This module adds two base classes for state machines, used ahead of
+ar.StateMachine, e.g. class Session(Compiled, ar.Point, ar.StateMachine);
+
+* Compiled - the bound table is compiled into a table of message
+  classes for each state. A class that falls through to the Unknown
+  handler (or is dropped) is added to the table of that state, i.e.
+  every later message of that class is a single lookup,
+* Instrumented - a Compiled machine that also records the count, total
+  and maximum time of each transition, i.e. (machine, state, message).
+
+Compilation happens at the first message received by any instance of
+the machine, i.e. after ar.bind(). Figures are kept for the machine
+class, across all instances, and are collected into a DispatchReport
+by dispatch_report().
+
+Behaviour is otherwise the same as ar.StateMachine, including the
+execution trace logging.
+'''
+import time
+import ansar.connect as ar
+
+__all__ = [
+	'TransitionFigures',
+	'DispatchReport',
+	'DispatchTable',
+	'compile_dispatch',
+	'Compiled',
+	'Instrumented',
+	'dispatch_report',
+]
+
+class TransitionFigures(object):
+	def __init__(self, machine=None, state=None, message=None, handler=None, count=0, mean=None, maximum=None):
+		self.machine = machine
+		self.state = state
+		self.message = message
+		self.handler = handler
+		self.count = count
+		self.mean = mean
+		self.maximum = maximum
+
+TRANSITION_FIGURES_SCHEMA = {
+	'machine': ar.Unicode(),
+	'state': ar.Unicode(),
+	'message': ar.Unicode(),
+	'handler': ar.Unicode(),
+	'count': int,
+	'mean': ar.Float8(),
+	'maximum': ar.Float8(),
+}
+
+ar.bind(TransitionFigures, object_schema=TRANSITION_FIGURES_SCHEMA)
+
+class DispatchReport(object):
+	def __init__(self, transitions=None):
+		self.transitions = transitions or []
+
+DISPATCH_REPORT_SCHEMA = {
+	'transitions': ar.VectorOf(ar.UserDefined(TransitionFigures)),
+}
+
+ar.bind(DispatchReport, object_schema=DISPATCH_REPORT_SCHEMA)
+
+#
+#
+class DispatchTable(object):
+	"""The bound dispatch of a machine, extended as unexpected messages are received.
+
+	:param machine: a bound class derived from ar.StateMachine
+	:type machine: class
+	"""
+	def __init__(self, machine):
+		self.machine = machine
+		self.shift = dict(machine.__art__.value)
+		self.unknown = {state: f for (state, m), f in self.shift.items() if m is ar.Unknown}
+		self.metrics = {}			# (state, message class) -> [count, total, maximum]
+
+	def resolve(self, state, message):
+		"""Find the handler for a class not in the table and remember it. Return the function or None."""
+		f = self.unknown.get(state, None)
+		self.shift[state, message] = f
+		return f
+
+	def record(self, state, message, seconds):
+		m = self.metrics.get((state, message), None)
+		if m is None:
+			self.metrics[state, message] = [1, seconds, seconds]
+			return
+		m[0] += 1
+		m[1] += seconds
+		if seconds > m[2]:
+			m[2] = seconds
+
+	def figures(self):
+		"""Collect the figures for every transition so far. Return a list of TransitionFigures."""
+		figures = []
+		for (state, message), (count, total, maximum) in self.metrics.items():
+			f = self.shift[state, message]
+			figures.append(TransitionFigures(self.machine.__name__, state.__name__, message.__name__,
+				f.__name__, count, total * 1000000.0 / count, maximum * 1000000.0))
+		return figures
+
+def compile_dispatch(machine):
+	"""Compile the bound dispatch of a machine class. Return the table."""
+	table = DispatchTable(machine)
+	machine.dispatch_table = table
+	return table
+
+def dropped(self, message, return_address):
+	pf = self.__art__
+	mf = message.__art__
+	if pf.execution_trace and mf.execution_trace:
+		self.log(ar.TAG_RECEIVED, 'Dropped %s from <%08x>' % (mf.name, return_address[-1]))
+
+class Compiled(object):
+	"""Base for a state machine with compiled dispatch."""
+	dispatch_table = None
+
+	def received(self, queue, message, return_address):
+		table = self.dispatch_table or compile_dispatch(self.__class__)
+		state = self.current_state
+		k = message.__class__
+		try:
+			f = table.shift[state, k]
+		except KeyError:
+			f = table.resolve(state, k)
+		if f is None:
+			dropped(self, message, return_address)
+			return
+
+		pf = self.__art__
+		mf = message.__art__
+		if pf.execution_trace and mf.execution_trace:
+			self.log(ar.TAG_RECEIVED, 'Received %s from <%08x>' % (mf.name, return_address[-1]))
+		self.current_state = f(self, message)
+		self.previous_message = message
+
+class Instrumented(Compiled):
+	"""Base for a state machine with compiled dispatch and figures for each transition."""
+
+	def received(self, queue, message, return_address):
+		table = self.dispatch_table or compile_dispatch(self.__class__)
+		state = self.current_state
+		k = message.__class__
+		try:
+			f = table.shift[state, k]
+		except KeyError:
+			f = table.resolve(state, k)
+		if f is None:
+			dropped(self, message, return_address)
+			return
+
+		pf = self.__art__
+		mf = message.__art__
+		if pf.execution_trace and mf.execution_trace:
+			self.log(ar.TAG_RECEIVED, 'Received %s from <%08x>' % (mf.name, return_address[-1]))
+		t = time.perf_counter()
+		try:
+			self.current_state = f(self, message)
+		finally:
+			table.record(state, k, time.perf_counter() - t)
+		self.previous_message = message
+
+def dispatch_report(*machine):
+	"""Collect the figures for the listed machine classes. Return a DispatchReport."""
+	transitions = []
+	for m in machine:
+		table = m.__dict__.get('dispatch_table', None)
+		if table is None:
+			continue
+		transitions.extend(table.figures())
+	return DispatchReport(transitions)
@@ -0,0 +1,102 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A fault-injecting proxy between a client and listen-server.py.
+
+Runs a FaultProxy (see faulting.py) at the listening address, relaying
+to the server, and applies a schedule of faults. Clients such as
+connect-to-address.py and group-table.py are pointed at the proxy,
+e.g. with --connecting-ipp, to observe their behaviour under latency,
+resets, partitions and refused connections.
+
+The default schedule;
+
+* 5s - a reset of all connections,
+* 15s - a blackhole of 3 seconds,
+* 25s - a reset and refusal of connections for 5 seconds, i.e. a
+  restart of the server,
+* 35s - 200ms of latency with up to 100ms of jitter, for 5 seconds.
+
+With repeat, the schedule starts again a second after the last step.
+The proxy runs until control-c.
+'''
+import ansar.connect as ar
+from faulting import LATENCY, JITTER, RESET, BLACKHOLE, REFUSE, FAULTS, FaultStep, FaultProxy, ProxyThread
+
+class Settings(object):
+	def __init__(self, listening_ipp=None, connecting_ipp=None, schedule=None, repeat=False):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.schedule = schedule or []
+		self.repeat = repeat
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'schedule': ar.VectorOf(ar.UserDefined(FaultStep)),
+	'repeat': ar.Boolean(),
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def proxy(self, settings):
+	for s in settings.schedule:
+		if s.fault not in FAULTS:
+			return ar.Faulted('cannot run schedule', f'unknown fault "{s.fault}"')
+
+	listening = (settings.listening_ipp.host, settings.listening_ipp.port)
+	target = (settings.connecting_ipp.host, settings.connecting_ipp.port)
+	p = ProxyThread(FaultProxy(listening, target))
+	try:
+		p.begin()
+	except OSError as e:
+		return ar.Faulted(f'cannot listen at {listening}', str(e))
+	self.console(f'Relaying {listening} to {target}')
+
+	if settings.schedule:
+		p.schedule(settings.schedule, settings.repeat)
+
+	self.select(ar.Stop)
+	p.end()
+	for t, s in p.proxy.history:
+		self.console(f'Applied {s.fault} ({s.value}, {s.seconds}s)')
+	for t, r in p.proxy.failures:
+		self.warning(f'Failed {r}')
+	return ar.Aborted()
+
+ar.bind(proxy)
+
+#
+#
+factory_settings = Settings(listening_ipp=ar.HostPort(host='127.0.0.1', port=5111),
+	connecting_ipp=ar.HostPort(host='127.0.0.1', port=5011),
+	schedule=[
+		FaultStep(5.0, RESET),
+		FaultStep(15.0, BLACKHOLE, seconds=3.0),
+		FaultStep(25.0, REFUSE, seconds=5.0),
+		FaultStep(25.0, RESET),
+		FaultStep(35.0, LATENCY, 0.2, 5.0),
+		FaultStep(35.0, JITTER, 0.1, 5.0),
+	])
+
+if __name__ == '__main__':
+	ar.create_object(proxy, factory_settings=factory_settings)
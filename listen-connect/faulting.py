@@ -0,0 +1,349 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A local TCP proxy that injects network faults.
+
+A FaultProxy listens at one address and relays every connection to a
+target address, e.g. a client such as connect-to-address.py connects
+to the proxy rather than to listen-server.py. Traffic passes through
+current conditions, changed by FaultSteps;
+
+* latency - seconds added to the delivery of every block of data,
+* jitter - up to this many seconds more, at random. Order is kept,
+* bandwidth - bytes per second in each direction, 0 for no limit,
+* reset - abort every current connection, i.e. an RST to both ends,
+* blackhole - hold all data, in both directions, for the duration.
+  Held data is delivered once the hole closes, as TCP would after
+  a healed partition,
+* refuse - stop listening for the duration, i.e. new connections
+  are refused,
+* clear - remove latency, jitter, bandwidth limit and blackhole, and
+  listen again after a refuse.
+
+A step may have a duration (seconds), after which latency, jitter and
+bandwidth revert to zero. A blackhole or refuse without a duration
+lasts until a clear. A later step of the same fault replaces the
+duration of the earlier, i.e. overlapping faults end with the last.
+A failure of a deferred action (e.g. the listen at the end of a
+refuse) is recorded in the failures of the proxy. A list of steps is
+a schedule, each step at an offset from the start of the schedule. A
+schedule may repeat.
+
+The proxy is asyncio-based and runs in a thread of its own, with its
+own event loop (see ProxyThread), i.e. it can be used from within any
+ansar object.
+'''
+import time
+import random
+import socket
+import struct
+import asyncio
+import threading
+import ansar.connect as ar
+
+__all__ = [
+	'LATENCY',
+	'JITTER',
+	'BANDWIDTH',
+	'RESET',
+	'BLACKHOLE',
+	'REFUSE',
+	'CLEAR',
+	'FAULTS',
+	'FaultStep',
+	'Conditions',
+	'FaultProxy',
+	'ProxyThread',
+]
+
+LATENCY = 'latency'
+JITTER = 'jitter'
+BANDWIDTH = 'bandwidth'
+RESET = 'reset'
+BLACKHOLE = 'blackhole'
+REFUSE = 'refuse'
+CLEAR = 'clear'
+FAULTS = (LATENCY, JITTER, BANDWIDTH, RESET, BLACKHOLE, REFUSE, CLEAR)
+
+BLOCK = 64 * 1024
+LINGER_ZERO = struct.pack('ii', 1, 0)
+
+class FaultStep(object):
+	def __init__(self, at=None, fault=None, value=None, seconds=None):
+		self.at = at
+		self.fault = fault
+		self.value = value
+		self.seconds = seconds
+
+FAULT_STEP_SCHEMA = {
+	'at': ar.Float8(),
+	'fault': ar.Unicode(),
+	'value': ar.Float8(),
+	'seconds': ar.Float8(),
+}
+
+ar.bind(FaultStep, object_schema=FAULT_STEP_SCHEMA)
+
+#
+#
+class Conditions(object):
+	"""Current treatment of the traffic through the proxy."""
+	def __init__(self):
+		self.latency = 0.0
+		self.jitter = 0.0
+		self.bandwidth = 0.0
+
+	def due(self, now, size, last):
+		"""Time of delivery for a block of data. Never earlier than the previous block."""
+		due = now + self.latency
+		if self.jitter:
+			due += random.uniform(0.0, self.jitter)
+		due = max(due, last)
+		if self.bandwidth:
+			due += size / self.bandwidth
+		return due
+
+def abort(writer):
+	s = writer.get_extra_info('socket')
+	if s is not None:
+		try:
+			s.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_ZERO)
+		except OSError:
+			pass
+	writer.transport.abort()
+
+class FaultProxy(object):
+	"""Relay connections from the listening address to the target, under current conditions.
+
+	:param listening: host and port where clients connect
+	:type listening: tuple
+	:param target: host and port of the server
+	:type target: tuple
+	"""
+	def __init__(self, listening, target):
+		self.listening = listening
+		self.target = target
+		self.conditions = Conditions()
+		self.server = None
+		self.links = set()
+		self.passing = None
+		self.reverting = None		# Timer handles, to be cancelled
+		self.holding = None			# by a later step or a clear.
+		self.refusing = None
+		self.history = []			# (time, step) applied.
+		self.failures = []			# (time, reason) of deferred actions.
+
+	async def open(self):
+		self.passing = asyncio.Event()
+		self.passing.set()
+		await self.listen()
+
+	async def listen(self):
+		host, port = self.listening
+		self.server = await asyncio.start_server(self.accepted, host, port, reuse_address=True)
+
+	def close(self):
+		if self.server is not None:
+			self.server.close()
+			self.server = None
+		for client, upstream in list(self.links):
+			client.transport.abort()
+			upstream.transport.abort()
+
+	async def accepted(self, reader, writer):
+		try:
+			up_reader, up_writer = await asyncio.open_connection(*self.target)
+		except OSError:
+			abort(writer)
+			return
+		link = (writer, up_writer)
+		self.links.add(link)
+		try:
+			await asyncio.gather(self.pipe(reader, up_writer), self.pipe(up_reader, writer))
+		finally:
+			self.links.discard(link)
+
+	async def pipe(self, reader, writer):
+		loop = asyncio.get_running_loop()
+		queue = asyncio.Queue()
+
+		async def deliver():
+			while True:
+				due, data = await queue.get()
+				if data is None:
+					break
+				await self.passing.wait()
+				delay = due - loop.time()
+				if delay > 0.0:
+					await asyncio.sleep(delay)
+				writer.write(data)
+				await writer.drain()
+
+		d = asyncio.ensure_future(deliver())
+		last = 0.0
+		try:
+			while True:
+				data = await reader.read(BLOCK)
+				if not data:
+					break
+				last = self.conditions.due(loop.time(), len(data), last)
+				queue.put_nowait((last, data))
+		except (ConnectionError, OSError):
+			pass
+		queue.put_nowait((0.0, None))
+		try:
+			await d
+		except (ConnectionError, OSError):
+			pass
+		writer.close()
+
+	def revert(self):
+		self.conditions = Conditions()
+		self.reverting = None
+
+	def release(self):
+		self.passing.set()
+		self.holding = None
+
+	def reopen(self):
+		self.refusing = None
+		t = asyncio.ensure_future(self.listen())
+		t.add_done_callback(self.reopened)
+
+	def reopened(self, t):
+		if t.cancelled():
+			return
+		e = t.exception()
+		if e is not None:
+			self.failures.append((time.time(), f'cannot listen at {self.listening} ({e})'))
+
+	async def inject(self, step):
+		"""Apply a fault immediately."""
+		loop = asyncio.get_running_loop()
+		self.history.append((time.time(), step))
+		f = step.fault
+		if f in (LATENCY, JITTER, BANDWIDTH):
+			c = Conditions()
+			c.latency, c.jitter, c.bandwidth = self.conditions.latency, self.conditions.jitter, self.conditions.bandwidth
+			setattr(c, f, step.value or 0.0)
+			self.conditions = c
+			if step.seconds:
+				if self.reverting is not None:
+					self.reverting.cancel()
+				self.reverting = loop.call_later(step.seconds, self.revert)
+		elif f == RESET:
+			for client, upstream in list(self.links):
+				abort(client)
+				abort(upstream)
+		elif f == BLACKHOLE:
+			self.passing.clear()
+			if self.holding is not None:
+				self.holding.cancel()
+				self.holding = None
+			if step.seconds:
+				self.holding = loop.call_later(step.seconds, self.release)
+		elif f == REFUSE:
+			if self.server is not None:
+				self.server.close()
+				self.server = None
+			if self.refusing is not None:
+				self.refusing.cancel()
+				self.refusing = None
+			if step.seconds:
+				self.refusing = loop.call_later(step.seconds, self.reopen)
+		elif f == CLEAR:
+			for h in (self.reverting, self.holding, self.refusing):
+				if h is not None:
+					h.cancel()
+			self.revert()
+			self.release()
+			self.refusing = None
+			if self.server is None:
+				self.reopen()
+		else:
+			raise ValueError(f'unknown fault "{f}"')
+
+	async def schedule(self, steps, repeat=False):
+		"""Apply the steps at their offsets from now, optionally forever."""
+		loop = asyncio.get_running_loop()
+		period = max((s.at for s in steps), default=0.0)
+		while True:
+			begun = loop.time()
+			for s in sorted(steps, key=lambda s: s.at):
+				await asyncio.sleep(max(begun + s.at - loop.time(), 0.0))
+				await self.inject(s)
+			if not repeat:
+				break
+			await asyncio.sleep(max(begun + period - loop.time(), 0.0) + 1.0)
+
+class ProxyThread(threading.Thread):
+	"""A FaultProxy running in a thread of its own.
+
+	:param proxy: the proxy to run
+	:type proxy: FaultProxy
+	"""
+	def __init__(self, proxy):
+		threading.Thread.__init__(self, name='fault-proxy', daemon=True)
+		self.proxy = proxy
+		self.loop = None
+		self.ready = threading.Event()
+		self.error = None
+
+	def run(self):
+		self.loop = asyncio.new_event_loop()
+		asyncio.set_event_loop(self.loop)
+		try:
+			self.loop.run_until_complete(self.proxy.open())
+		except OSError as e:
+			self.error = e
+			self.ready.set()
+			return
+		self.ready.set()
+		self.loop.run_forever()
+		self.proxy.close()
+		pending = asyncio.all_tasks(self.loop)
+		for t in pending:
+			t.cancel()
+		self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+		self.loop.close()
+
+	def begin(self):
+		"""Start the thread and wait for the listen. Raise OSError on failure."""
+		self.start()
+		self.ready.wait()
+		if self.error is not None:
+			raise self.error
+
+	def call(self, coroutine):
+		return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+	def inject(self, step):
+		"""Apply a fault from another thread and wait for it to be in place."""
+		self.call(self.proxy.inject(step)).result()
+
+	def schedule(self, steps, repeat=False):
+		"""Start a schedule from another thread. Return a concurrent future."""
+		return self.call(self.proxy.schedule(steps, repeat))
+
+	def end(self):
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self.join()
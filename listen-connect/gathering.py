@@ -0,0 +1,180 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Scatter a request to many addresses and gather the responses.
+
+A function object can ask() one address at a time. A fan-out to 50
+servers using ask() costs 50 round trips. The Gather object sends the
+request to every address at once and collects the responses as they
+arrive. The whole exchange costs about one round trip, i.e. that of
+the slowest server.
+
+Each address is given a name, e.g. the names of members in a GroupTable.
+There is a single, overall deadline. When the deadline passes, any
+outstanding requests are abandoned and the names are listed as missing.
+A response that is not one of the matching types ends that request and
+the name is also listed as missing. The result is always a Gathered message, with whatever
+responses were received;
+
+* responses - map of name to response,
+* missing - list of names that did not respond.
+
+Each request is carried by an Asker (see awaiting.py), which takes
+care of the matching of responses to requests.
+
+A function object can use the ask_many() helper, which creates the
+Gather object and waits for its completion;
+
+	g = ask_many(self, ar.Enquiry(), (ar.Ack, ar.Nak), addresses, seconds=3.0)
+'''
+import ansar.connect as ar
+from awaiting import Asker
+
+__all__ = [
+	'Gathered',
+	'Gather',
+	'ask_many',
+]
+
+class Gathered(object):
+	def __init__(self, responses=None, missing=None):
+		self.responses = responses or {}
+		self.missing = missing or []
+
+GATHERED_SCHEMA = {
+	'responses': ar.MapOf(ar.Unicode(), ar.Any()),
+	'missing': ar.VectorOf(ar.Unicode()),
+}
+
+ar.bind(Gathered, object_schema=GATHERED_SCHEMA)
+
+#
+#
+class INITIAL: pass
+class GATHERING: pass
+class CLEARING: pass
+
+class Gather(ar.Point, ar.StateMachine):
+	def __init__(self, request, matching, addresses, seconds=None):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.request = request
+		self.matching = matching if isinstance(matching, tuple) else (matching,)
+		self.addresses = addresses
+		self.seconds = seconds
+		self.asking = {}		# Asker address -> name.
+		self.gathered = Gathered()
+		self.aborted = False
+
+	def clear(self):
+		"""Abandon the outstanding requests. Return true if there is nothing to wait for."""
+		for a, k in self.asking.items():
+			self.send(ar.Stop(), a)
+		return not self.asking
+
+	def result(self):
+		"""Complete with the responses so far. Does not return."""
+		if self.aborted:
+			self.complete(ar.Aborted())
+		self.complete(self.gathered)
+
+def Gather_INITIAL_Start(self, message):
+	for k, a in self.addresses.items():
+		if a is None:
+			self.gathered.missing.append(k)
+			continue
+		c = self.create(Asker, self.request, self.matching, a)
+		self.asking[c] = k
+	if not self.asking:
+		self.result()
+	if self.seconds:
+		self.start(ar.T1, self.seconds)
+	return GATHERING
+
+def Gather_GATHERING_Completed(self, message):		# A response, or not.
+	k = self.asking.pop(self.return_address, None)
+	if k is None:
+		return GATHERING
+	if isinstance(message.value, self.matching):
+		self.gathered.responses[k] = message.value
+	else:
+		self.gathered.missing.append(k)
+	if self.asking:
+		return GATHERING
+	self.result()
+
+def Gather_GATHERING_T1(self, message):				# Deadline.
+	self.gathered.missing.extend(self.asking.values())
+	if self.clear():
+		self.result()
+	return CLEARING
+
+def Gather_GATHERING_Stop(self, message):			# Intervention.
+	self.aborted = True
+	if self.clear():
+		self.result()
+	return CLEARING
+
+def Gather_CLEARING_Completed(self, message):
+	self.asking.pop(self.return_address, None)
+	if self.asking:
+		return CLEARING
+	self.result()
+
+GATHER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	GATHERING: (
+		(ar.Completed, ar.T1, ar.Stop), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(Gather, GATHER_DISPATCH)
+
+#
+#
+def ask_many(self, request, matching, addresses, seconds=None):
+	"""Send the request to every address and gather the responses. Return a Gathered or Aborted.
+
+	:param self: the calling function object
+	:type self: Point
+	:param request: message sent to every address
+	:type request: registered message
+	:param matching: response types to be accepted
+	:type matching: tuple
+	:param addresses: name and address of each recipient
+	:type addresses: dict
+	:param seconds: overall deadline
+	:type seconds: float
+	:rtype: Gathered or Aborted
+	"""
+	a = self.create(Gather, request, matching, addresses, seconds)
+	m = self.select(ar.Completed, ar.Stop)
+	if isinstance(m, ar.Completed):
+		return m.value
+	self.send(ar.Stop(), a)
+	self.select(ar.Completed)
+	return ar.Aborted()
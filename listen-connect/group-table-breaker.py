@@ -0,0 +1,130 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A client for many servers, with a circuit breaker for each.
+
+A copy of group-table-scatter.py except that the session sends a series
+of requests, one at a time, and routes each to the next server that will
+accept traffic (see breaking.py). A server that times out or fails too
+often is taken out of the rotation. Requests fail fast while all the
+breakers are open, rather than waiting for the timeout. A breaker lets
+a probe request through after the open period, and closes again on a
+success.
+
+Each request is sent using ask_many() (see gathering.py) to a single
+member, so that a late response from a sick server is not mistaken for
+the response to a later request.
+
+A sick server can be simulated with listen-server-coalesce.py, started
+with a work duration longer than the timeout of this client, e.g.
+--work=5.0 --cache-size=0.
+
+The output is a BreakerReport, i.e. the state and counts for each server.
+'''
+import ansar.connect as ar
+from breaking import BreakerTable, CircuitOpen, OPEN_SECONDS
+from gathering import ask_many
+
+# Where are the servers and how
+# to send.
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, requests=None, interval=None, open_seconds=None):
+		self.connecting_ipp = connecting_ipp or []
+		self.seconds = seconds
+		self.requests = requests
+		self.interval = interval
+		self.open_seconds = open_seconds
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.VectorOf(ar.UserDefined(ar.HostPort)),
+	'seconds': float,
+	'requests': int,
+	'interval': float,
+	'open_seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The session, created at the moment GroupTable
+# determines that all address information is in
+# place. Route each request through the breakers.
+def client(self, group, names, settings):
+	breakers = BreakerTable(names, open_seconds=settings.open_seconds or OPEN_SECONDS)
+	expected = (ar.Ack, ar.Nak)
+
+	for _ in range(settings.requests or 1):
+		k = breakers.route()
+		if k is None:
+			self.warning(CircuitOpen('group'))		# Fail fast.
+		else:
+			m = ask_many(self, ar.Enquiry(), expected, {k: getattr(group, k)}, seconds=settings.seconds)
+			if isinstance(m, ar.Aborted):
+				return m
+			breakers.record(k, k in m.responses)
+
+		if settings.interval:
+			m = self.select(ar.Stop, seconds=settings.interval)
+			if isinstance(m, ar.Stop):
+				return ar.Aborted()
+
+	return breakers.report()
+
+ar.bind(client)
+
+# A client that uses a GroupTable to manage a
+# collection of connections and create a session
+# when the connections are in place.
+READY_OR_NOT = 30.0
+
+def main(self, settings):
+	# Describe the group, a member for
+	# each server.
+	member = {f'server-{i}': ar.CreateFrame(ar.ConnectToAddress, ipp) for i, ipp in enumerate(settings.connecting_ipp)}
+	group = ar.GroupTable(**member)
+
+	# Describe the session.
+	session = ar.CreateFrame(client, list(member.keys()), settings)
+
+	# Start the group engine.
+	a = group.create(self, seconds=READY_OR_NOT, session=session)
+	m = self.select(ar.Completed, ar.Stop)
+
+	# Wait for its completion.
+	if isinstance(m, ar.Completed):
+		return m.value
+
+	# Or intervention.
+	self.send(ar.Stop(), a)
+	self.select(ar.Completed)
+	return ar.Aborted()
+
+ar.bind(main)
+
+#
+#
+factory_settings = Settings(connecting_ipp=[
+		ar.HostPort(host='127.0.0.1', port=5011),
+		ar.HostPort(host='127.0.0.1', port=5017),
+	], seconds=1.0, requests=40, interval=0.25, open_seconds=5.0)
+
+if __name__ == '__main__':
+	ar.create_object(main, factory_settings=factory_settings)
@@ -0,0 +1,137 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A client for listen-server using a LargeGroup of many connections.
+
+A variation of group-table.py where the group has hundreds of members,
+i.e. ConnectToAddress objects for the same server. The group is a
+LargeGroup (see grouping.py) that creates no more than the parallel
+number of connections at a time and passes addresses to the client in
+batches. Readiness is a count rather than a scan of the table.
+
+Once Ready, the Enquiry is sent over every connection at once and the
+responses are gathered (see gathering.py).
+
+The output is the GroupFigures, e.g. the seconds to Ready and the
+number of batches that carried the updates.
+
+Notes:
+* all connections are from this process, i.e. the members are limited
+  by the file descriptors of a process. Also by those of the server.
+'''
+import time
+import ansar.connect as ar
+from grouping import LargeGroup, GroupBatch
+from gathering import ask_many
+
+# Where is the server and how many connections?
+class Settings(object):
+	def __init__(self, connecting_ipp=None, members=None, parallel=None, batch=None, seconds=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.members = members
+		self.parallel = parallel
+		self.batch = batch
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'members': int,
+	'parallel': int,
+	'batch': int,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+class GroupFigures(object):
+	def __init__(self, members=0, batches=0, updates=0, ready=None, responses=0, missing=0):
+		self.members = members
+		self.batches = batches
+		self.updates = updates
+		self.ready = ready
+		self.responses = responses
+		self.missing = missing
+
+GROUP_FIGURES_SCHEMA = {
+	'members': int,
+	'batches': int,
+	'updates': int,
+	'ready': ar.Float8(),
+	'responses': int,
+	'missing': int,
+}
+
+ar.bind(GroupFigures, object_schema=GROUP_FIGURES_SCHEMA)
+
+READY_OR_NOT = 60.0
+
+def client(self, settings):
+	# Describe the group.
+	member = {f'server-{i}': ar.CreateFrame(ar.ConnectToAddress, settings.connecting_ipp)
+		for i in range(settings.members)}
+	group = LargeGroup(member, parallel=settings.parallel, batch=settings.batch)
+
+	# Start the group engine.
+	started = time.perf_counter()
+	a = group.create(self, seconds=READY_OR_NOT)
+
+	def stop_group():
+		self.send(ar.Stop(), a)
+		self.select(ar.Completed)
+
+	figures = GroupFigures(members=settings.members)
+	while True:
+		m = self.select(GroupBatch, ar.Ready, ar.NotReady, ar.Completed, ar.Stop)
+
+		if isinstance(m, GroupBatch):			# Address information. Loop for more.
+			group.update(m)
+			figures.batches += 1
+			figures.updates += len(m.updates)
+		elif isinstance(m, ar.Ready):			# Full set of addresses. Pop out of loop.
+			break
+		elif isinstance(m, ar.NotReady):
+			continue
+		elif isinstance(m, ar.Completed):		# Group exhausted. Pop out of object.
+			return m.value
+		elif isinstance(m, ar.Stop):			# Intervention.
+			stop_group()
+			return ar.Aborted()
+	figures.ready = time.perf_counter() - started
+
+	# Request over every connection.
+	g = ask_many(self, ar.Enquiry(), (ar.Ack, ar.Nak), group.address, seconds=settings.seconds)
+	stop_group()
+	if isinstance(g, ar.Aborted):
+		return g
+	figures.responses = len(g.responses)
+	figures.missing = len(g.missing)
+	return figures
+
+ar.bind(client)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5011),
+	members=200, parallel=32, batch=64, seconds=5.0)
+
+if __name__ == '__main__':
+	ar.create_object(client, factory_settings=factory_settings)
@@ -0,0 +1,98 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A client for many instances of listen-server, using scatter-gather.
+
+A copy of group-table-session.py except that the group has a member for
+each of the configured servers and the session sends the Enquiry to all
+of them at once (see gathering.py). Responses are gathered as they
+arrive, within a single deadline. The time taken is about that of a
+single request rather than one request for each server.
+
+The output is the Gathered message, i.e. the Ack from each server and
+the names of any servers that failed to respond in time.
+'''
+import ansar.connect as ar
+from gathering import ask_many
+
+# Where are the servers?
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None):
+		self.connecting_ipp = connecting_ipp or []
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.VectorOf(ar.UserDefined(ar.HostPort)),
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The session, created at the moment GroupTable
+# determines that all address information is in
+# place. Send to all members.
+def client(self, group, names, seconds):
+	addresses = {k: getattr(group, k) for k in names}
+	m = ask_many(self, ar.Enquiry(), (ar.Ack, ar.Nak), addresses, seconds=seconds)
+	return m
+
+ar.bind(client)
+
+# A client that uses a GroupTable to manage a
+# collection of connections and create a session
+# when the connections are in place.
+READY_OR_NOT = 30.0
+
+def main(self, settings):
+	# Describe the group, a member for
+	# each server.
+	member = {f'server-{i}': ar.CreateFrame(ar.ConnectToAddress, ipp) for i, ipp in enumerate(settings.connecting_ipp)}
+	group = ar.GroupTable(**member)
+
+	# Describe the session.
+	session = ar.CreateFrame(client, list(member.keys()), settings.seconds)
+
+	# Start the group engine.
+	a = group.create(self, seconds=READY_OR_NOT, session=session)
+	m = self.select(ar.Completed, ar.Stop)
+
+	# Wait for its completion.
+	if isinstance(m, ar.Completed):
+		return m.value
+
+	# Or intervention.
+	self.send(ar.Stop(), a)
+	self.select(ar.Completed)
+	return ar.Aborted()
+
+ar.bind(main)
+
+#
+#
+factory_settings = Settings(connecting_ipp=[
+		ar.HostPort(host='127.0.0.1', port=5011),
+		ar.HostPort(host='127.0.0.1', port=5012),
+		ar.HostPort(host='127.0.0.1', port=5013),
+	], seconds=3.0)
+
+if __name__ == '__main__':
+	ar.create_object(main, factory_settings=factory_settings)
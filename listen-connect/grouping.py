@@ -0,0 +1,361 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A GroupTable for hundreds to thousands of members.
+
+The GroupTable of the ansar runtime suits a handful of members. Every
+address delivered by a member is checked against the whole table for
+readiness, every change of address is a GroupUpdate to the owner and
+all the members are created together at the start, e.g. a thousand
+connects at once. A LargeGroup has the same role with;
+
+* incremental readiness, i.e. a count of the members without an
+  address, updated as each address comes and goes. Ready is the
+  count reaching zero,
+* batched updates, i.e. changes of address are collected into a
+  GroupBatch and sent to the owner when the batch is full, at the end
+  of a short period, or immediately before a Ready or NotReady,
+* a cap on member creation, i.e. no more than the parallel number
+  of members are waiting for their first address. Each first arrival
+  of a member allows the creation of the next. So does a member that
+  departs before its first address or waits longer than the patience,
+  e.g. a server that is down, i.e. no member holds back the creation
+  of the rest.
+
+Members are named CreateFrames, as for a GroupTable, but passed as a
+map rather than as named arguments, e.g. built with a comprehension;
+
+	members = {f'server-{i}': ar.CreateFrame(ar.ConnectToAddress, ipp) for i in range(500)}
+	group = LargeGroup(members, parallel=64)
+	a = group.create(self, seconds=30.0)
+
+Messages from the group are GroupBatch, Ready, NotReady and finally
+Completed. A GroupBatch is sent ahead of the Ready or NotReady that
+it explains. Addresses are recorded in the address member of the table
+by group.update(m), i.e. group.address[name]. With a batch size of
+one, each batch holds the single update that a GroupTable would send.
+
+A member that terminates ends the group, as for a GroupTable.
+'''
+import time
+import ansar.connect as ar
+
+__all__ = [
+	'GroupBatch',
+	'LargeGroup',
+	'LargeGroupObject',
+	'PARALLEL',
+	'BATCH',
+	'PERIOD',
+	'PATIENCE',
+]
+
+PARALLEL = 64		# Members waiting for their first address.
+BATCH = 64			# Updates in a GroupBatch.
+PERIOD = 0.05		# Seconds before a partial batch is sent.
+PATIENCE = 5.0		# Seconds a member may wait before the next is created.
+
+class GroupBatch(object):
+	def __init__(self, updates=None):
+		self.updates = updates or []
+
+GROUP_BATCH_SCHEMA = {
+	'updates': ar.VectorOf(ar.UserDefined(ar.GroupUpdate)),
+}
+
+ar.bind(GroupBatch, object_schema=GROUP_BATCH_SCHEMA)
+
+class LargeGroup(object):
+	"""Table of many objects that each acquire an address, e.g. connections.
+
+	:param member_frame: name and CreateFrame of each member
+	:type member_frame: dict
+	:param parallel: members waiting for their first address, or None
+	:type parallel: int
+	:param batch: updates in a GroupBatch, or None
+	:type batch: int
+	:param period: seconds before a partial batch is sent, or None
+	:type period: float
+	:param patience: seconds a member holds a place in the cap, or None
+	:type patience: float
+	"""
+	def __init__(self, member_frame, parallel=None, batch=None, period=None, patience=None):
+		self.member_frame = member_frame
+		self.parallel = parallel or PARALLEL
+		self.batch = batch or BATCH
+		self.period = PERIOD if period is None else period
+		self.patience = patience or PATIENCE
+		self.address = {}
+
+	def create(self, owner, seconds=None):
+		"""Create the object that manages the members. Return its address."""
+		self.address = {k: None for k in self.member_frame.keys()}
+		return owner.create(LargeGroupObject, self.member_frame,
+			self.parallel, self.batch, self.period, self.patience, seconds)
+
+	def update(self, message):
+		"""Record the addresses in a GroupBatch or GroupUpdate."""
+		if isinstance(message, ar.GroupUpdate):
+			updates = [message]
+		else:
+			updates = message.updates
+		for u in updates:
+			if u.key in self.address:
+				self.address[u.key] = u.address
+
+	def missing(self):
+		"""Return the count of members without an address."""
+		return sum(1 for a in self.address.values() if a is None)
+
+#
+#
+class FlushTimer(object): pass
+class ReadyTimer(object): pass
+class PatienceTimer(object): pass
+
+ar.bind(FlushTimer)
+ar.bind(ReadyTimer)
+ar.bind(PatienceTimer)
+
+class INITIAL: pass
+class PENDING: pass
+class READY: pass
+class CLEARING: pass
+
+class LargeGroupObject(ar.Point, ar.StateMachine):
+	"""Create the members of a LargeGroup and track their addresses.
+
+	:param table: name and CreateFrame of each member
+	:type table: dict
+	:param parallel: members waiting for their first address
+	:type parallel: int
+	:param batch: updates in a GroupBatch
+	:type batch: int
+	:param period: seconds before a partial batch is sent
+	:type period: float
+	:param patience: seconds a member holds a place in the cap
+	:type patience: float
+	:param seconds: time limit on achieving the ready state, or None
+	:type seconds: float
+	"""
+	def __init__(self, table, parallel, batch, period, patience, seconds=None):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.table = table
+		self.parallel = parallel
+		self.batch = batch
+		self.period = period
+		self.patience = patience
+		self.limit = seconds
+
+		self.waiting = iter(table.items())	# Not yet created.
+		self.starting = {}					# Created, no address yet. Name to time of creation.
+		self.patient = False				# PatienceTimer running.
+		self.on_record = {}					# Name to current address.
+		self.missing = len(table)			# Members without an address.
+		self.due = []					# Updates not yet sent.
+		self.flushing = False
+		self.return_value = None
+
+	def next_member(self):
+		"""Create members until the cap is reached or there are no more."""
+		while len(self.starting) < self.parallel:
+			try:
+				k, f = next(self.waiting)
+			except StopIteration:
+				break
+			a = self.create(f.object_type, *f.args, group_address=None, **f.kw)
+			self.assign(a, k)
+			self.starting[k] = time.monotonic()
+		if self.starting and not self.patient:
+			s = min(self.starting.values()) + self.patience - time.monotonic()
+			self.start(PatienceTimer, max(s, 0.0))
+			self.patient = True
+
+	def released(self, k):
+		"""Free the place of a member in the cap. Return True if it held one."""
+		if self.starting.pop(k, None) is None:
+			return False
+		self.next_member()
+		return True
+
+	def overdue(self):
+		"""Free the places of members that have waited too long, i.e. the PatienceTimer."""
+		self.patient = False
+		t = time.monotonic() - self.patience
+		for k in [k for k, c in self.starting.items() if c <= t]:
+			del self.starting[k]
+		self.next_member()
+
+	def queue(self, k, address):
+		self.due.append(ar.GroupUpdate(k, address))
+		if len(self.due) >= self.batch:
+			self.flush()
+		elif not self.flushing:
+			self.start(FlushTimer, self.period)
+			self.flushing = True
+
+	def flush(self):
+		if self.due:
+			self.send(GroupBatch(self.due), self.parent_address)
+			self.due = []
+		if self.flushing:
+			self.cancel(FlushTimer)
+			self.flushing = False
+
+	def arrived(self, k, address):
+		"""Record an address. Return True if the group is now ready."""
+		first = k not in self.on_record
+		previous = self.on_record.get(k, None)
+		self.on_record[k] = address
+		if first:
+			self.released(k)
+		if previous is None:
+			self.missing -= 1
+		self.queue(k, address)
+		return self.missing == 0
+
+	def departed(self, k):
+		"""Clear an address. Return True if it was on record."""
+		self.released(k)
+		if self.on_record.get(k, None) is None:
+			return False
+		self.on_record[k] = None
+		self.missing += 1
+		self.queue(k, None)
+		return True
+
+	def clear(self, value):
+		self.flush()
+		if self.patient:
+			self.cancel(PatienceTimer)
+			self.patient = False
+		if self.working():
+			self.return_value = value
+			self.abort()
+			return CLEARING
+		self.complete(value)
+
+def LargeGroupObject_INITIAL_Start(self, message):
+	if not self.table:
+		self.complete(ar.Faulted('empty table', 'a group with no members has nothing to do'))
+	if self.limit is not None:
+		self.start(ReadyTimer, self.limit)
+	self.next_member()
+	return PENDING
+
+def LargeGroupObject_PENDING_UseAddress(self, message):
+	k = self.progress()
+	if k is None:
+		self.warning(f'Unknown sender {self.return_address}')
+		return PENDING
+	if not self.arrived(k, message.address):
+		return PENDING
+	self.flush()
+	if self.limit is not None:
+		self.cancel(ReadyTimer)
+	self.send(ar.Ready(), self.parent_address)
+	return READY
+
+def LargeGroupObject_PENDING_NoAddress(self, message):
+	k = self.progress()
+	if k is not None:
+		self.departed(k)
+	return PENDING
+
+def LargeGroupObject_PENDING_FlushTimer(self, message):
+	self.flushing = False
+	self.flush()
+	return PENDING
+
+def LargeGroupObject_PENDING_PatienceTimer(self, message):
+	self.overdue()
+	return PENDING
+
+def LargeGroupObject_PENDING_ReadyTimer(self, message):
+	return self.clear(ar.TimedOut(message))
+
+def LargeGroupObject_PENDING_Completed(self, message):
+	k = self.debrief()
+	if k is not None and self.on_record.get(k, None) is not None:
+		self.queue(k, None)
+	return self.clear(message.value)
+
+def LargeGroupObject_PENDING_Stop(self, message):
+	return self.clear(ar.Aborted())
+
+def LargeGroupObject_READY_UseAddress(self, message):		# Change of address.
+	k = self.progress()
+	if k is not None:
+		self.arrived(k, message.address)
+	return READY
+
+def LargeGroupObject_READY_NoAddress(self, message):
+	k = self.progress()
+	if k is None or not self.departed(k):
+		return READY
+	self.flush()
+	self.send(ar.NotReady(), self.parent_address)
+	return PENDING
+
+def LargeGroupObject_READY_FlushTimer(self, message):
+	self.flushing = False
+	self.flush()
+	return READY
+
+def LargeGroupObject_READY_PatienceTimer(self, message):
+	self.overdue()
+	return READY
+
+def LargeGroupObject_READY_Completed(self, message):
+	k = self.debrief()
+	if k is not None and self.on_record.get(k, None) is not None:
+		self.queue(k, None)
+		self.flush()
+		self.send(ar.NotReady(), self.parent_address)
+	return self.clear(message.value)
+
+def LargeGroupObject_READY_Stop(self, message):
+	return self.clear(ar.Aborted())
+
+def LargeGroupObject_CLEARING_Completed(self, message):
+	self.debrief()
+	if self.working():
+		return CLEARING
+	self.complete(self.return_value)
+
+LARGE_GROUP_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	PENDING: (
+		(ar.UseAddress, ar.NoAddress, FlushTimer, PatienceTimer, ReadyTimer, ar.Completed, ar.Stop), ()
+	),
+	READY: (
+		(ar.UseAddress, ar.NoAddress, FlushTimer, PatienceTimer, ar.Completed, ar.Stop), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(LargeGroupObject, LARGE_GROUP_DISPATCH)
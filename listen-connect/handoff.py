@@ -0,0 +1,75 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Shared listening ports, for restarts without refused connections.
+
+A restart of a server leaves a window where nothing is listening at
+the port, and every connect is refused. With SO_REUSEPORT, two server
+processes can listen at the same port at the same time. The kernel
+spreads new connections across them. One process can then stop
+listening and drain its sessions while the other carries on. That is
+a rolling restart with no refused connects, provided at least one
+process is listening throughout.
+
+The ansar runtime creates its own listening sockets. A call to
+reuse_port(), before the first call to ar.listen(), arranges for the
+SO_REUSEPORT option to be set on every TCP socket that the runtime
+binds. Clients do not bind, i.e. only listening sockets are affected.
+Every process sharing the port must make the same call.
+
+A connect that has completed but is still waiting to be accepted when
+its process closes the port is reset by the kernel. A draining server
+should stop listening first and continue to accept sessions that
+arrive in the meantime (see listen-server-handoff.py).
+'''
+import socket
+import types
+
+__all__ = [
+	'reuse_port',
+]
+
+def reuse_port():
+	"""Arrange for SO_REUSEPORT on the listening sockets of the ansar runtime. Return True on success."""
+	if not hasattr(socket, 'SO_REUSEPORT'):
+		return False
+	try:
+		from ansar.connect import socketry
+	except ImportError:
+		return False
+	base = socketry.socket.socket
+	if getattr(base, 'reuse_port', False):
+		return True
+
+	class ReusePort(base):
+		reuse_port = True
+
+		def bind(self, address):
+			if self.type == socket.SOCK_STREAM and self.family in (socket.AF_INET, socket.AF_INET6):
+				self.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+			base.bind(self, address)
+
+	patched = types.ModuleType('socket')
+	patched.__dict__.update(socketry.socket.__dict__)
+	patched.socket = ReusePort
+	socketry.socket = patched
+	return True
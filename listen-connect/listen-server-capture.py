@@ -0,0 +1,189 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based server that can record its inbound traffic.
+
+A copy of listen-server-session except that, where a capture file is
+configured, every session and every inbound message is recorded (see
+capturing.py). The file can be replayed against this or any other of
+the listen-server variants by replay-capture.py, e.g.;
+
+$ python3 listen-server-capture.py --capture-file=traffic.cap
+
+Essential actions of the 2-state session machine (Session);
+* INITIAL - receive Start, note session, shift to RUNNING
+* RUNNING - receive Enquiry, note message, send Ack, shift to RUNNING
+* RUNNING - receive Stop, note close, complete
+
+Essential actions of the 3-state controller machine (Server);
+* INITIAL - receive Start, open any capture file, call listen(), shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive Accepted, shift to RUNNING
+* RUNNING - receive Stop, close any capture file, complete
+
+Refer to listen-server-session.py and capturing.py for further notes.
+'''
+import ansar.connect as ar
+from capturing import CaptureWriter
+
+# Where to setup and where to record.
+class Settings(object):
+	def __init__(self, listening_ipp=None, capture_file=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.capture_file = capture_file
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'capture_file': str,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Accepting end of a session.
+# Instantiated by the sockets subsystem at the moment
+# a transport is successfully established, as directed
+# by the "listen()" call and passing the "session=session"
+# argument.
+# The client is available at "remote_address".
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+
+class Session(ar.Point, ar.StateMachine):
+	def __init__(self, capture, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.capture = capture				# CaptureWriter or None.
+		self.session = None
+		self.expected = (ar.Enquiry,)
+
+def Session_INITIAL_Start(self, message):
+	if self.capture:
+		self.session = self.capture.open_session()
+	return RUNNING
+
+def Session_RUNNING_Enquiry(self, message):
+	if self.capture:
+		self.capture.message(self.session, message)
+	self.reply(ar.Ack())
+	return RUNNING
+
+def Session_RUNNING_Stop(self, message):
+	if self.capture:
+		self.capture.close_session(self.session)
+	self.complete(message)
+
+def Session_RUNNING_Unknown(self, message):
+	if self.capture:
+		self.capture.message(self.session, message)
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	s = ar.Rejected(client_request=(t, a))
+	self.warning(s)
+	return RUNNING
+
+SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Session, SESSION_DISPATCH)
+
+# Session management and network problems,
+# instantiated by create_object().
+class Server(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+		self.capture = None
+
+	def close(self, value):
+		if self.capture:
+			self.capture.close()
+			self.console(f'Captured {self.capture.session} sessions, {self.capture.messages} messages')
+		self.complete(value)
+
+def Server_INITIAL_Start(self, message):
+	if self.settings.capture_file:
+		try:
+			self.capture = CaptureWriter(self.settings.capture_file)
+		except OSError as e:
+			self.complete(ar.Faulted(f'cannot open capture "{self.settings.capture_file}"', str(e)))
+	session = ar.CreateFrame(Session, self.capture)
+	ar.listen(self, self.settings.listening_ipp, session=session)
+	return STARTING
+
+def Server_STARTING_Listening(self, message):
+	self.listening = message
+	return RUNNING
+
+def Server_STARTING_NotListening(self, message):
+	self.close(message)
+
+def Server_STARTING_Stop(self, message):
+	self.close(message)
+
+def Server_RUNNING_Accepted(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_Abandoned(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_NotAccepted(self, message):
+	self.close(message)
+
+def Server_RUNNING_NotListening(self, message):
+	self.close(message)
+
+def Server_RUNNING_Stop(self, message):
+	self.close(ar.Aborted())
+
+SERVER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Accepted, ar.Abandoned, ar.NotAccepted, ar.NotListening, ar.Stop), ()
+	),
+}
+
+ar.bind(Server, SERVER_DISPATCH)
+
+#
+#
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5022))
+
+if __name__ == '__main__':
+	ar.create_object(Server, factory_settings=factory_settings)
@@ -0,0 +1,238 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based server that coalesces identical requests and caches responses.
+
+A copy of listen-server-session except that sessions do not respond
+to an Enquiry directly. The response is the result of some work, e.g.
+a query of a slow database, simulated here by a Work object with a
+configured duration. Sessions forward each Enquiry to a single
+Coalescer (see coalescing.py), passing the address of the client;
+
+* with coalesce enabled, concurrent Enquiry requests share a single
+  instance of the work,
+* with a cache size above zero, the response is saved and returned
+  to subsequent Enquiry requests until it expires or is evicted,
+* with neither, every Enquiry results in a separate instance of Work.
+
+Activity figures are logged as samples (i.e. --debug-level=TRACE).
+A herd of concurrent requests can be generated with
+connect-client-asyncio.py.
+
+Essential actions of the 2-state work machine (Work);
+* INITIAL - receive Start, start timer, shift to WORKING
+* WORKING - receive T1, complete with Ack
+
+Essential actions of the 2-state session machine (Session);
+* INITIAL - receive Start, shift to RUNNING
+* RUNNING - receive Enquiry, forward to Coalescer, shift to RUNNING
+* RUNNING - receive Stop, complete
+
+Essential actions of the 4-state controller machine (Server);
+* INITIAL - receive Start, create Coalescer, call listen(), shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive Accepted, shift to RUNNING
+* RUNNING - receive Stop, stop Coalescer, shift to CLEARING
+* CLEARING - receive Completed, complete
+
+Refer to listen-server-session.py and coalescing.py for further notes.
+'''
+import ansar.connect as ar
+from coalescing import Coalescer
+
+# Where to setup and how to respond.
+class Settings(object):
+	def __init__(self, listening_ipp=None, work=None, coalesce=None, cache_size=None, ttl=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.work = work
+		self.coalesce = coalesce
+		self.cache_size = cache_size
+		self.ttl = ttl
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'work': float,
+	'coalesce': bool,
+	'cache_size': int,
+	'ttl': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The real work behind a response.
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+class WORKING: pass
+class CLEARING: pass
+
+class Work(ar.Point, ar.StateMachine):
+	def __init__(self, request, seconds):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.request = request
+		self.seconds = seconds
+
+def Work_INITIAL_Start(self, message):
+	if not self.seconds:
+		self.complete(ar.Ack())
+	self.start(ar.T1, self.seconds)
+	return WORKING
+
+def Work_WORKING_T1(self, message):
+	self.complete(ar.Ack())
+
+def Work_WORKING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+WORK_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	WORKING: (
+		(ar.T1, ar.Stop), ()
+	),
+}
+
+ar.bind(Work, WORK_DISPATCH)
+
+# Accepting end of a session. Requests are
+# passed to the coalescer, on behalf of the client.
+class Session(ar.Point, ar.StateMachine):
+	def __init__(self, coalescer, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.coalescer = coalescer
+		self.expected = (ar.Enquiry,)
+
+def Session_INITIAL_Start(self, message):
+	return RUNNING
+
+def Session_RUNNING_Enquiry(self, message):
+	self.forward(message, self.coalescer, self.return_address)
+	return RUNNING
+
+def Session_RUNNING_Stop(self, message):
+	self.complete(message)
+
+def Session_RUNNING_Unknown(self, message):
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	s = ar.Rejected(client_request=(t, a))
+	self.warning(s)
+	return RUNNING
+
+SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Session, SESSION_DISPATCH)
+
+# Session management and network problems,
+# instantiated by create_object().
+class Server(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+		self.coalescer = None
+		self.ending = None
+
+def Server_INITIAL_Start(self, message):
+	s = self.settings
+	work = ar.CreateFrame(Work, s.work)
+	self.coalescer = self.create(Coalescer, work, coalesce=s.coalesce, size=s.cache_size, ttl=s.ttl)
+	session = ar.CreateFrame(Session, self.coalescer)
+	ar.listen(self, s.listening_ipp, session=session)
+	return STARTING
+
+def Server_STARTING_Listening(self, message):
+	self.listening = message
+	return RUNNING
+
+def Server_STARTING_NotListening(self, message):
+	self.ending = message
+	self.send(ar.Stop(), self.coalescer)
+	return CLEARING
+
+def Server_STARTING_Stop(self, message):
+	self.ending = ar.Aborted()
+	self.send(ar.Stop(), self.coalescer)
+	return CLEARING
+
+def Server_RUNNING_Accepted(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_Abandoned(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_NotAccepted(self, message):
+	self.ending = message
+	self.send(ar.Stop(), self.coalescer)
+	return CLEARING
+
+def Server_RUNNING_NotListening(self, message):
+	self.ending = message
+	self.send(ar.Stop(), self.coalescer)
+	return CLEARING
+
+def Server_RUNNING_Stop(self, message):
+	self.ending = ar.Aborted()
+	self.send(ar.Stop(), self.coalescer)
+	return CLEARING
+
+def Server_CLEARING_Completed(self, message):
+	self.complete(self.ending)
+
+SERVER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Accepted, ar.Abandoned, ar.NotAccepted, ar.NotListening, ar.Stop), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(Server, SERVER_DISPATCH)
+
+#
+#
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5017), work=0.5, coalesce=True, cache_size=1000, ttl=2.0)
+
+if __name__ == '__main__':
+	ar.create_object(Server, factory_settings=factory_settings)
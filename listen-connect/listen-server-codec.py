@@ -0,0 +1,236 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based server that negotiates a compact binary codec and compression with clients.
+
+A copy of listen-server-session except that each session accepts a
+Hello message from the client and replies with a Welcome, selecting
+the codec for the remainder of the session (see packing.py). Sessions
+that negotiate the packed codec exchange Packed messages for those
+messages with enough fields to benefit. The Enquiry has no fields and
+is always sent as it is. The reply to the Enquiry of a session that
+opened with a Hello is a ServerList of the configured number of
+addresses, i.e. a message with real fields.
+
+The Welcome also confirms compression, where both the client and the
+server settings ask for the same algorithm, with either codec. Packed
+blocks larger than the threshold are then sent as Compressed messages. Compression figures
+are logged at the end of each session.
+
+Clients that do not send a Hello (e.g. connect-client-session.py)
+continue with the default ansar codec and receive an Ack.
+
+Essential actions of the 2-state session machine (Session);
+* INITIAL - receive Start, shift to RUNNING
+* RUNNING - receive Hello, send Welcome, shift to RUNNING
+* RUNNING - receive Packed or Compressed, forward contents to self, shift to RUNNING
+* RUNNING - receive Enquiry, send ServerList (or Ack), shift to RUNNING
+* RUNNING - receive Stop, complete
+
+Essential actions of the 3-state controller machine (Server);
+* INITIAL - receive Start, call listen(), shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive Accepted, shift to RUNNING
+* RUNNING - receive Stop, complete
+
+The create_object() function is used to create an instance of the Server.
+The Server establishes the listen and then moves to a monitoring role,
+receiving notifications when session objects are created (Accepted) and
+destroyed (Closed/Abandoned).
+
+Instances of the Session object are created by the sockets machinery
+for every accepted client. Session objects do not receive any of the
+session management or network error messages, leaving them to focus on
+the message exchange between client and server. Session objects terminate
+either by their own completion or when they receive a Stop. These events
+result in Closed and Abandoned messages being sent to the controller,
+respectively.
+
+Refer to listen-server-session.py and packing.py for further notes.
+'''
+import ansar.connect as ar
+from packing import Hello, Packed, Compressed, ServerList, Packing, Encoding, PackingError
+from packing import PACKED_CODEC, ZLIB_COMPRESSION, COMPRESSION_THRESHOLD
+
+# Where to setup and which codec and compression to allow.
+class Settings(object):
+	def __init__(self, listening_ipp=None, codec=None, compression=None, threshold=None, servers=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.codec = codec
+		self.compression = compression
+		self.threshold = threshold
+		self.servers = servers
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'codec': str,
+	'compression': str,
+	'threshold': int,
+	'servers': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The messages that may be packed. Must be the same
+# table, in the same order, at both ends.
+PACKING = Packing(ar.Enquiry, ar.Ack, ar.Nak, ServerList)
+
+def server_list(n):
+	return ServerList([ar.HostPort(f'10.0.{i // 250}.{i % 250}', 5011) for i in range(n)])
+
+# Accepting end of a session.
+# Instantiated by the sockets subsystem at the moment
+# a transport is successfully established, as directed
+# by the "listen()" call and passing the "session=session"
+# argument.
+# The client is available at "remote_address".
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+
+class Session(ar.Point, ar.StateMachine):
+	def __init__(self, codec, compression, threshold, servers, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.codec = codec
+		self.compression = compression
+		self.servers = servers
+		self.welcomed = False
+		self.encoding = Encoding(PACKING, threshold=threshold)
+		self.expected = (ar.Enquiry,)
+
+def Session_INITIAL_Start(self, message):
+	return RUNNING
+
+def Session_RUNNING_Hello(self, message):			# Select the codec.
+	self.reply(self.encoding.welcome(message, self.codec, self.compression))
+	self.welcomed = True
+	return RUNNING
+
+def Session_RUNNING_Packed(self, message):			# Unpack and dispatch as normal.
+	try:
+		m = self.encoding.inbound(message)
+	except PackingError as e:
+		self.warning(f'Cannot unpack ({e})')
+		return RUNNING
+	self.forward(m, self.address, self.return_address)
+	return RUNNING
+
+Session_RUNNING_Compressed = Session_RUNNING_Packed
+
+def Session_RUNNING_Enquiry(self, message):
+	if not self.welcomed:
+		self.reply(ar.Ack())
+		return RUNNING
+	self.reply(self.encoding.outbound(server_list(self.servers or SERVERS)))
+	return RUNNING
+
+def Session_RUNNING_Stop(self, message):
+	if self.encoding.compression:
+		self.sample(**self.encoding.metrics.sample())
+	self.complete(message)
+
+def Session_RUNNING_Unknown(self, message):
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	s = ar.Rejected(client_request=(t, a))
+	self.warning(s)
+	return RUNNING
+
+SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(Hello, Packed, Compressed, ar.Enquiry, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Session, SESSION_DISPATCH)
+
+# Session management and network problems,
+# instantiated by create_object().
+class Server(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+
+def Server_INITIAL_Start(self, message):
+	session = ar.CreateFrame(Session, self.settings.codec,
+		self.settings.compression, self.settings.threshold, self.settings.servers)
+	ar.listen(self, self.settings.listening_ipp, session=session)
+	return STARTING
+
+def Server_STARTING_Listening(self, message):
+	self.listening = message
+	return RUNNING
+
+def Server_STARTING_NotListening(self, message):
+	self.complete(message)
+
+def Server_STARTING_Stop(self, message):
+	self.complete(message)
+
+def Server_RUNNING_Accepted(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_Abandoned(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_NotAccepted(self, message):
+	self.complete(message)
+
+def Server_RUNNING_NotListening(self, message):
+	self.complete(message)
+
+def Server_RUNNING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+SERVER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Accepted, ar.Abandoned, ar.NotAccepted, ar.NotListening, ar.Stop), ()
+	),
+}
+
+ar.bind(Server, SERVER_DISPATCH)
+
+#
+#
+SERVERS = 64		# Addresses in a ServerList, i.e. more than the threshold.
+
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5015), codec=PACKED_CODEC,
+	compression=ZLIB_COMPRESSION, threshold=COMPRESSION_THRESHOLD, servers=SERVERS)
+
+if __name__ == '__main__':
+	ar.create_object(Server, factory_settings=factory_settings)
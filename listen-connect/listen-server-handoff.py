@@ -0,0 +1,142 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A listen server that can be restarted without refusing connections.
+
+A variation of listen-server.py. The port is shared (see handoff.py),
+i.e. two instances can listen at the same time, and a Stop begins a
+drain rather than an immediate exit;
+
+* stop listening, i.e. new connections go to the other instance,
+* continue to respond to requests from existing sessions,
+* close each session after its next response, or after it has been
+  idle for DRAIN_IDLE seconds,
+* exit when no sessions remain, or after the drain seconds.
+
+Clients such as connect-to-address.py see a clean close and connect
+again, to the other instance. A rolling restart stops and restarts
+each instance in turn (see the roll target in the Makefile).
+'''
+import time
+import ansar.connect as ar
+from handoff import reuse_port
+
+DRAIN_IDLE = 0.5
+DRAIN_SECONDS = 10.0
+
+# Where to setup.
+class Settings(object):
+	def __init__(self, listening_ipp=None, reuse_port=True, drain_seconds=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.reuse_port = reuse_port
+		self.drain_seconds = drain_seconds
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'reuse_port': ar.Boolean(),
+	'drain_seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def drain(self, settings, sessions):
+	ar.stop_listen(self, settings.listening_ipp)
+	self.console(f'Draining {len(sessions)} sessions')
+
+	ending = time.monotonic() + (settings.drain_seconds or DRAIN_SECONDS)
+	closing = set()
+	while sessions:
+		t = time.monotonic()
+		if t >= ending:
+			break
+		for s, last in sessions.items():
+			if s not in closing and t - last >= DRAIN_IDLE:
+				self.send(ar.Close(), s)
+				closing.add(s)
+
+		m = self.select(ar.Enquiry,
+			ar.Accepted, ar.Abandoned, ar.Closed,
+			ar.NotListening, ar.NotAccepted,
+			ar.Stop,
+			seconds=min(DRAIN_IDLE, ending - t))
+
+		if isinstance(m, ar.Enquiry):
+			s = self.return_address
+			self.reply(ar.Ack())
+			if s not in closing:				# After the response.
+				self.send(ar.Close(), s)
+				closing.add(s)
+		elif isinstance(m, ar.Accepted):		# Arrived before the stop.
+			sessions[self.return_address] = time.monotonic()
+		elif isinstance(m, (ar.Abandoned, ar.Closed)):
+			sessions.pop(self.return_address, None)
+			closing.discard(self.return_address)
+	return ar.Aborted()
+
+def server(self, settings):
+	if settings.reuse_port and not reuse_port():
+		return ar.Faulted('cannot share the port', 'no SO_REUSEPORT')
+
+	# Open the port.
+	ar.listen(self, settings.listening_ipp)
+
+	# Verify port.
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	sessions = {}								# Address -> time of last activity.
+	while True:
+		m = self.select(ar.Enquiry,
+			ar.Accepted, ar.Abandoned,
+			ar.NotAccepted, ar.NotListening,
+			ar.Stop,
+			ar.Other)
+
+		if isinstance(m, ar.Enquiry):
+			sessions[self.return_address] = time.monotonic()
+		elif isinstance(m, ar.Accepted):
+			sessions[self.return_address] = time.monotonic()
+			continue
+		elif isinstance(m, ar.Abandoned):
+			sessions.pop(self.return_address, None)
+			continue
+		elif isinstance(m, (ar.NotAccepted, ar.NotListening)):
+			return m
+		elif isinstance(m, ar.Stop):
+			return drain(self, settings, sessions)
+		elif isinstance(m, ar.Other):
+			t = ar.tof(m.value)
+			s = ar.Rejected(client_request=(t, [ar.tof(ar.Enquiry)]))
+			self.warning(s)
+			continue
+
+		self.reply(ar.Ack())
+
+ar.bind(server)
+
+#
+#
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5023), reuse_port=True, drain_seconds=DRAIN_SECONDS)
+
+if __name__ == '__main__':
+	ar.create_object(server, factory_settings=factory_settings)
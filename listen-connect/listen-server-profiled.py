@@ -0,0 +1,232 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based server that can be profiled while it runs.
+
+A copy of listen-server-session except that a profile can be captured
+for a limited period, without restarting the process (see
+profiling.py);
+
+* a Profile message from any client starts a cProfile and sampling
+  capture. The server replies with Profiled at the end of the period,
+  e.g. python3 connect-client-profile.py --profile-seconds=10.0,
+* SIGPROF starts a sampling capture of the configured period, e.g.
+  kill -PROF <pid>.
+
+Nothing is collected outside a capture. Files are stored in the
+configured folder (default is the temporary folder). A missing folder
+or a failure to store the files is a Faulted reply, not the end of
+the server.
+
+Essential actions of the 2-state session machine (Session);
+* INITIAL - receive Start, shift to RUNNING
+* RUNNING - receive Enquiry, send Ack, shift to RUNNING
+* RUNNING - receive Profile, forward to server, shift to RUNNING
+* RUNNING - receive Stop, complete
+
+Essential actions of the 3-state controller machine (Server);
+* INITIAL - receive Start, call listen(), shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive Accepted, shift to RUNNING
+* RUNNING - receive Profile, begin capture, start timer, shift to RUNNING
+* RUNNING - receive T2, end capture, send Profiled, shift to RUNNING
+* RUNNING - receive Stop, end any capture, complete
+
+Refer to listen-server-session.py and profiling.py for further notes.
+'''
+import tempfile
+import ansar.connect as ar
+from profiling import Profile, Capture, on_signal
+
+# Where to setup and where to put the profiles.
+class Settings(object):
+	def __init__(self, listening_ipp=None, profile_folder=None, profile_seconds=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.profile_folder = profile_folder
+		self.profile_seconds = profile_seconds
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'profile_folder': str,
+	'profile_seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Accepting end of a session.
+# Instantiated by the sockets subsystem at the moment
+# a transport is successfully established, as directed
+# by the "listen()" call and passing the "session=session"
+# argument.
+# The client is available at "remote_address".
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+
+class Session(ar.Point, ar.StateMachine):
+	def __init__(self, server, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.server = server
+		self.expected = (ar.Enquiry, Profile)
+
+def Session_INITIAL_Start(self, message):
+	return RUNNING
+
+def Session_RUNNING_Enquiry(self, message):
+	self.reply(ar.Ack())
+	return RUNNING
+
+def Session_RUNNING_Profile(self, message):			# Admin request.
+	self.forward(message, self.server, self.return_address)
+	return RUNNING
+
+def Session_RUNNING_Stop(self, message):
+	self.complete(message)
+
+def Session_RUNNING_Unknown(self, message):
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	s = ar.Rejected(client_request=(t, a))
+	self.warning(s)
+	return RUNNING
+
+SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, Profile, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Session, SESSION_DISPATCH)
+
+# Session management, network problems
+# and profile captures,
+# instantiated by create_object().
+class Server(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+		self.capture = None
+		self.requester = None
+
+	def profile_folder(self):
+		return self.settings.profile_folder or tempfile.gettempdir()
+
+	def end_capture(self):
+		profiled = self.capture.end()
+		self.capture = None
+		return profiled
+
+def Server_INITIAL_Start(self, message):
+	if signalled is not None:
+		try:
+			signalled.configure(self.profile_folder(), self.settings.profile_seconds or PROFILE_SECONDS)
+		except ValueError as e:
+			self.warning(f'Signalled captures use the defaults ({e})')
+	session = ar.CreateFrame(Session, self.address)
+	ar.listen(self, self.settings.listening_ipp, session=session)
+	return STARTING
+
+def Server_STARTING_Listening(self, message):
+	self.listening = message
+	return RUNNING
+
+def Server_STARTING_NotListening(self, message):
+	self.complete(message)
+
+def Server_STARTING_Stop(self, message):
+	self.complete(message)
+
+def Server_RUNNING_Accepted(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_Abandoned(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_Profile(self, message):
+	if self.capture is not None:
+		self.reply(ar.Faulted('cannot profile', 'capture in progress'))
+		return RUNNING
+	try:
+		self.capture = Capture(self.profile_folder(), message.seconds or self.settings.profile_seconds or PROFILE_SECONDS)
+	except ValueError as e:
+		self.reply(ar.Faulted('cannot profile', str(e)))
+		return RUNNING
+	self.requester = self.return_address
+	self.capture.begin()
+	self.start(ar.T2, self.capture.seconds)
+	return RUNNING
+
+def Server_RUNNING_T2(self, message):
+	profiled = self.end_capture()
+	if isinstance(profiled, ar.Faulted):
+		self.warning(str(profiled))
+	else:
+		self.console(f'Profile stored in "{profiled.pstats_file}"')
+	self.send(profiled, self.requester)
+	return RUNNING
+
+def Server_RUNNING_NotAccepted(self, message):
+	self.complete(message)
+
+def Server_RUNNING_NotListening(self, message):
+	self.complete(message)
+
+def Server_RUNNING_Stop(self, message):
+	if self.capture is not None:
+		self.end_capture()
+	self.complete(ar.Aborted())
+
+SERVER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Accepted, ar.Abandoned, Profile, ar.T2, ar.NotAccepted, ar.NotListening, ar.Stop), ()
+	),
+}
+
+ar.bind(Server, SERVER_DISPATCH)
+
+#
+#
+PROFILE_SECONDS = 10.0
+
+signalled = None			# Captures started by SIGPROF.
+
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5020), profile_seconds=PROFILE_SECONDS)
+
+if __name__ == '__main__':
+	signalled = on_signal(tempfile.gettempdir(), PROFILE_SECONDS)
+	ar.create_object(Server, factory_settings=factory_settings)
@@ -0,0 +1,213 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based server that spreads the processing of requests over threads.
+
+A copy of listen-server-session except that sessions do not respond to
+an Enquiry directly. The server creates a configured number of shards
+(see sharding.py), each a machine with its own thread and queue. Every
+session forwards its requests to a single shard, allocated in rotation
+as the session starts. The shard produces the Ack and sends it to the
+client. Ordering of the requests within a session is preserved.
+
+To represent the cost of real work, each response is the result of a
+configured number of iterations of a simple calculation. Shard figures
+are logged as samples (i.e. --debug-level=TRACE).
+
+Essential actions of the 2-state session machine (Session);
+* INITIAL - receive Start, select shard, shift to RUNNING
+* RUNNING - receive Enquiry, forward to shard, shift to RUNNING
+* RUNNING - receive Stop, forward Abandoned to shard, complete
+
+Essential actions of the 4-state controller machine (Server);
+* INITIAL - receive Start, create shards, call listen(), shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive Accepted, shift to RUNNING
+* RUNNING - receive Stop, stop shards, shift to CLEARING
+* CLEARING - receive Completed, complete when all shards are done
+
+Refer to listen-server-session.py and sharding.py for further notes.
+'''
+import os
+import time
+import ansar.connect as ar
+from sharding import Dispatched, Shard, ShardRing
+
+# Where to setup and how many shards.
+class Settings(object):
+	def __init__(self, listening_ipp=None, shards=None, work=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.shards = shards
+		self.work = work
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'shards': int,
+	'work': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# The work behind a response, run
+# on the thread of a shard.
+def responding(work):
+	def respond(request):
+		n = 0
+		for i in range(work or 0):
+			n += i * i
+		return ar.Ack()
+	return respond
+
+# Accepting end of a session. Requests are
+# passed to the shard for this session.
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+class CLEARING: pass
+
+class Session(ar.Point, ar.StateMachine):
+	def __init__(self, ring, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.ring = ring
+		self.client = None
+		self.shard = None
+		self.expected = (ar.Enquiry,)
+
+def Session_INITIAL_Start(self, message):
+	self.shard = self.ring.next()
+	return RUNNING
+
+def Session_RUNNING_Enquiry(self, message):
+	d = Dispatched(message, time.monotonic())
+	self.client = self.return_address
+	self.forward(d, self.shard, self.return_address)
+	return RUNNING
+
+def Session_RUNNING_Stop(self, message):		# Drop any backlog for the client.
+	if self.client is not None:
+		d = Dispatched(ar.Abandoned(), time.monotonic())
+		self.forward(d, self.shard, self.client)
+	self.complete(message)
+
+def Session_RUNNING_Unknown(self, message):
+	t = ar.tof(message)
+	a = [ar.tof(e) for e in self.expected]
+	s = ar.Rejected(client_request=(t, a))
+	self.warning(s)
+	return RUNNING
+
+SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Session, SESSION_DISPATCH)
+
+# Session management and network problems,
+# instantiated by create_object().
+class Server(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+		self.shards = []
+		self.ending = None
+
+	def clear(self, ending):
+		self.ending = ending
+		for a in self.shards:
+			self.send(ar.Stop(), a)
+		return CLEARING
+
+def Server_INITIAL_Start(self, message):
+	s = self.settings
+	respond = responding(s.work)
+	n = s.shards or os.cpu_count() or 1
+	self.shards = [self.create(Shard, i, respond) for i in range(n)]
+	session = ar.CreateFrame(Session, ShardRing(list(self.shards)))
+	ar.listen(self, s.listening_ipp, session=session)
+	return STARTING
+
+def Server_STARTING_Listening(self, message):
+	self.listening = message
+	return RUNNING
+
+def Server_STARTING_NotListening(self, message):
+	return self.clear(message)
+
+def Server_STARTING_Stop(self, message):
+	return self.clear(ar.Aborted())
+
+def Server_RUNNING_Accepted(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_Abandoned(self, message):
+	t = ar.tof(message)
+	self.console(f'Session <{t}> at {self.return_address}')
+	return RUNNING
+
+def Server_RUNNING_NotAccepted(self, message):
+	return self.clear(message)
+
+def Server_RUNNING_NotListening(self, message):
+	return self.clear(message)
+
+def Server_RUNNING_Stop(self, message):
+	return self.clear(ar.Aborted())
+
+def Server_CLEARING_Completed(self, message):
+	self.shards.remove(self.return_address)
+	if self.shards:
+		return CLEARING
+	self.complete(self.ending)
+
+SERVER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Accepted, ar.Abandoned, ar.NotAccepted, ar.NotListening, ar.Stop), ()
+	),
+	CLEARING: (
+		(ar.Completed,), ()
+	),
+}
+
+ar.bind(Server, SERVER_DISPATCH)
+
+#
+#
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5018), shards=4, work=10000)
+
+if __name__ == '__main__':
+	ar.create_object(Server, factory_settings=factory_settings)
@@ -0,0 +1,194 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A session-based server for connection storms.
+
+A copy of listen-server-session except for the handling of large
+numbers of connects arriving together;
+
+* accepts are batched, i.e. up to the batch size of pending connects
+  are accepted on each readiness of the listening socket. The batch
+  also bounds the work done between servicing the other sockets, i.e.
+  established sessions continue to be serviced during a storm,
+* the listen backlog is configurable (see tuning.py), e.g. the
+  default of 5 overflows almost immediately during a storm,
+* there is no log entry for each Accepted and Abandoned. The Server
+  counts them and logs AcceptMetrics (see accepting.py) along with the
+  number of live sessions, once a second while there is activity,
+* sessions are as light as possible, i.e. no work at Start and
+  bound with execution_trace=False. Anything expensive is deferred
+  until the first message from the client.
+
+Essential actions of the 2-state session machine (Session);
+* INITIAL - receive Start, shift to RUNNING
+* RUNNING - receive Enquiry, send Ack, shift to RUNNING
+* RUNNING - receive Stop, complete
+
+Essential actions of the 3-state controller machine (Server);
+* INITIAL - receive Start, call listen(), start timer, shift to STARTING
+* STARTING - receive Listening, shift to RUNNING
+* RUNNING - receive Accepted/Abandoned, count, shift to RUNNING
+* RUNNING - receive T1, log figures, shift to RUNNING
+* RUNNING - receive Stop, complete
+
+Refer to listen-server-session.py for further notes.
+'''
+import ansar.connect as ar
+from tuning import SocketTuning, tune
+from accepting import batch_accept, AcceptSampler
+
+# Where to setup.
+class Settings(object):
+	def __init__(self, listening_ipp=None, batch=None, backlog=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.batch = batch
+		self.backlog = backlog
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'batch': int,
+	'backlog': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Accepting end of a session.
+class INITIAL: pass
+class STARTING: pass
+class RUNNING: pass
+
+class Session(ar.Point, ar.StateMachine):
+	def __init__(self, **kv):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+
+def Session_INITIAL_Start(self, message):
+	return RUNNING
+
+def Session_RUNNING_Enquiry(self, message):
+	self.reply(ar.Ack())
+	return RUNNING
+
+def Session_RUNNING_Stop(self, message):
+	self.complete(message)
+
+def Session_RUNNING_Unknown(self, message):
+	t = ar.tof(message)
+	s = ar.Rejected(client_request=(t, [ar.tof(ar.Enquiry)]))
+	self.warning(s)
+	return RUNNING
+
+SESSION_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(ar.Enquiry, ar.Stop, ar.Unknown), ()
+	),
+}
+
+ar.bind(Session, SESSION_DISPATCH, execution_trace=False)
+
+# Session management and network problems,
+# instantiated by create_object().
+SAMPLE_PERIOD = 1.0
+
+class Server(ar.Point, ar.StateMachine):
+	def __init__(self, settings):
+		ar.Point.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.settings = settings
+		self.listening = None
+		self.sampler = None
+		self.sessions = 0
+		self.changed = False
+
+def Server_INITIAL_Start(self, message):
+	if not batch_accept(self.settings.batch or 1):
+		self.complete(ar.Faulted('cannot batch accepts', 'no access to the sockets of the runtime'))
+	tune(SocketTuning(backlog=self.settings.backlog))
+	session = ar.CreateFrame(Session)
+	ar.listen(self, self.settings.listening_ipp, session=session)
+	self.start(ar.T1, SAMPLE_PERIOD, repeating=True)
+	return STARTING
+
+def Server_STARTING_Listening(self, message):
+	self.listening = message
+	self.sampler = AcceptSampler(message.listening_ipp.port)
+	return RUNNING
+
+def Server_STARTING_NotListening(self, message):
+	self.complete(message)
+
+def Server_STARTING_Stop(self, message):
+	self.complete(message)
+
+def Server_RUNNING_Accepted(self, message):
+	self.sessions += 1
+	self.changed = True
+	return RUNNING
+
+def Server_RUNNING_Abandoned(self, message):
+	self.sessions -= 1
+	self.changed = True
+	return RUNNING
+
+def Server_RUNNING_T1(self, message):
+	m = self.sampler.sample()
+	if not self.changed and not m.overflows and not m.queue_depth:
+		return RUNNING
+	self.changed = False
+	self.sample(sessions=self.sessions, accepted=m.accepted, rate=f'{m.rate:.1f}',
+		mean_batch=m.mean_batch, largest_batch=m.largest_batch,
+		queue_depth=m.queue_depth,
+		overflows=m.overflows, drops=m.drops)
+	return RUNNING
+
+def Server_RUNNING_NotAccepted(self, message):
+	self.complete(message)
+
+def Server_RUNNING_NotListening(self, message):
+	self.complete(message)
+
+def Server_RUNNING_Stop(self, message):
+	self.complete(ar.Aborted())
+
+SERVER_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	STARTING: (
+		(ar.Listening, ar.NotListening, ar.Stop), ()
+	),
+	RUNNING: (
+		(ar.Accepted, ar.Abandoned, ar.T1, ar.NotAccepted, ar.NotListening, ar.Stop), ()
+	),
+}
+
+ar.bind(Server, SERVER_DISPATCH)
+
+#
+#
+factory_settings = Settings(ar.HostPort('127.0.0.1', 5024), batch=64, backlog=1024)
+
+if __name__ == '__main__':
+	ar.create_object(Server, factory_settings=factory_settings)
@@ -0,0 +1,135 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A server for listen-server clients, over TLS.
+
+A copy of listen-server except that, where enabled in the tls member
+of the settings, clients connect with TLS. The ansar listen is at the
+private address (e.g. the loopback interface) and a TlsTerminator (see
+securing.py) accepts TLS connections at the public address, relaying
+the plain bytes to the private address.
+
+The server issues session tickets, i.e. clients that keep the session
+of a previous connection (e.g. connect-client-tls.py) resume without
+a full handshake. The counts of full and resumed handshakes are
+logged at each Accepted.
+
+Certificate and key are generated by the certs target of the Makefile.
+
+Notes:
+* with TLS disabled the server listens at the public address, i.e.
+  it is listen-server.
+* sessions are at the private address, i.e. the return address of
+  an Accepted is the relay and not the client.
+'''
+import ansar.connect as ar
+from securing import TlsSettings, server_context, TlsTerminator
+
+# Where to setup.
+class Settings(object):
+	def __init__(self, listening_ipp=None, private_ipp=None, tls=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.private_ipp = private_ipp or ar.HostPort()
+		self.tls = tls or TlsSettings()
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'private_ipp': ar.UserDefined(ar.HostPort),
+	'tls': ar.UserDefined(TlsSettings),
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+def server(self, settings):
+	tls = settings.tls
+	if tls.enabled:
+		try:
+			context = server_context(tls)
+		except OSError as e:
+			return ar.Faulted(f'cannot load certificate "{tls.certificate}"', str(e))
+		listening_ipp = settings.private_ipp
+	else:
+		listening_ipp = settings.listening_ipp
+
+	# Open the port.
+	ar.listen(self, listening_ipp)
+
+	m = self.select(ar.Listening, ar.NotListening, ar.Stop)
+	if not isinstance(m, ar.Listening):
+		return m
+
+	# Secure the public port.
+	terminator = None
+	if tls.enabled:
+		try:
+			terminator = TlsTerminator(settings.listening_ipp.inet(), m.listening_ipp.inet(), context)
+		except OSError as e:
+			return ar.Faulted(f'cannot listen at {settings.listening_ipp}', str(e))
+		terminator.start()
+		self.console(f'TLS at {settings.listening_ipp} (tickets {tls.tickets})')
+
+	def done(value):
+		if terminator is not None:
+			terminator.end()
+		return value
+
+	while True:
+		m = self.select(ar.Enquiry,
+			ar.Accepted, ar.Abandoned,
+			ar.NotAccepted, ar.NotListening,
+			ar.Stop,
+			ar.Other)
+
+		expected = (ar.Enquiry,)
+		if isinstance(m, expected):
+			pass
+		elif isinstance(m, (ar.Accepted, ar.Abandoned)):
+			t = ar.tof(m)
+			if terminator is not None and isinstance(m, ar.Accepted):
+				f = terminator.figures
+				ms = 'none' if f.handshake_ms is None else f'{f.handshake_ms:.2f}ms'
+				self.console(f'Session <{t}> (full {f.full}, resumed {f.resumed}, handshake {ms})')
+			else:
+				self.console(f'Session <{t}> at {self.return_address}')
+			continue
+		elif isinstance(m, (ar.NotAccepted, ar.NotListening)):
+			return done(m)
+		elif isinstance(m, ar.Stop):
+			return done(ar.Aborted())
+		elif isinstance(m, ar.Other):
+			t = ar.tof(m.value)
+			a = [ar.tof(e) for e in expected]
+			s = ar.Rejected(client_request=(t, a))
+			self.warning(s)
+			continue
+
+		self.reply(ar.Ack())
+
+ar.bind(server)
+
+#
+#
+factory_settings = Settings(listening_ipp=ar.HostPort('127.0.0.1', 5025), private_ipp=ar.HostPort('127.0.0.1', 5026),
+	tls=TlsSettings(enabled=True, certificate='server.crt', key='server.key'))
+
+if __name__ == '__main__':
+	ar.create_object(server, factory_settings=factory_settings)
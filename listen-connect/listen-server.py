@@ -35,16 +35,22 @@ Notes:
 * pre-defined messages (i.e. Enquiry and Ack/Nak) are used as
   request-response messages to minimize the size of this example.
   Any registered messages (i.e. ar.bind()) can be used.
+* socket options (e.g. TCP_NODELAY, buffer sizes) can be set in the
+  tuning member of the settings. Effective values are logged after
+  the Listening (see tuning.py).
 '''
 import ansar.connect as ar
+from tuning import SocketTuning, tune, effective
 
 # Where to setup.
 class Settings(object):
-	def __init__(self, listening_ipp=None):
+	def __init__(self, listening_ipp=None, tuning=None):
 		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.tuning = tuning or SocketTuning()
 
 SETTINGS_SCHEMA = {
 	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'tuning': ar.UserDefined(SocketTuning),
 }
 
 ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
@@ -62,6 +68,10 @@ ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
 # - network problems.
 
 def server(self, settings):
+	# Socket options, if any.
+	if not settings.tuning.default():
+		tune(settings.tuning)
+
 	# Open the port.
 	ar.listen(self, settings.listening_ipp)
 
@@ -70,6 +80,10 @@ def server(self, settings):
 	if not isinstance(m, ar.Listening):
 		return m
 
+	e = effective(m.listening_ipp)
+	if e is not None:
+		self.console(f'Socket options {vars(e)}')
+
 	# Accept sessions, receive client messages,
 	# detect network problems and intervention.
 	while True:
@@ -0,0 +1,269 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''An open-loop load generator, stepping the rate to find saturation.
+
+A closed-loop client (e.g. connect-client-session.py) sends a request
+only after the previous response. When the server stalls, the client
+stops sending and the stall shows as a single slow response. This
+generator sends Enquiry requests at a target rate regardless of the
+responses;
+
+* requests are spread across a configured number of connections,
+* arrivals are either constant (evenly spaced) or poisson (random
+  intervals with the target mean),
+* latency is measured from the intended time of each request, not the
+  actual send, i.e. a late send counts against the server,
+* latencies are counted in a Histogram (see measuring.py).
+
+The rate starts at the configured value and increases by the step for
+a number of steps, each lasting the configured seconds. A step ends
+when every request has completed (or timed out). A step is saturated
+when the achieved rate falls below 90% of the target or requests
+failed. The generator stops after the first saturated step, i.e. the
+knee is between the last two steps.
+
+Each step is a LoadPoint, i.e. target and achieved rates with latency
+percentiles in milliseconds. The output is a LoadCurve of all the steps
+and, where configured, a CSV file of the same figures for plotting
+percentile against throughput.
+
+Every connection and request runs within the thread of the function
+object (see awaiting.py). Requests beyond the outstanding limit are
+counted as failed, without sending. A Stop (e.g. control-c) cancels the
+step in progress and the output is Aborted.
+'''
+import time
+import random
+import asyncio
+import ansar.connect as ar
+import awaiting
+from measuring import Histogram
+
+CONSTANT = 'constant'
+POISSON = 'poisson'
+
+KNEE_RATIO = 0.9				# Of target rate.
+MAXIMUM_OUTSTANDING = 10000
+
+class Settings(object):
+	def __init__(self, connecting_ipp=None, seconds=None, connections=None, arrivals=None,
+			rate=None, step=None, steps=None, step_seconds=None, curve_file=None):
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.seconds = seconds
+		self.connections = connections
+		self.arrivals = arrivals
+		self.rate = rate
+		self.step = step
+		self.steps = steps
+		self.step_seconds = step_seconds
+		self.curve_file = curve_file
+
+SETTINGS_SCHEMA = {
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'seconds': float,
+	'connections': int,
+	'arrivals': str,
+	'rate': float,
+	'step': float,
+	'steps': int,
+	'step_seconds': float,
+	'curve_file': str,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+class LoadPoint(object):
+	def __init__(self, target=None, achieved=None, sent=0, completed=0, failed=0,
+			p50=None, p90=None, p99=None, p999=None, maximum=None, saturated=False):
+		self.target = target
+		self.achieved = achieved
+		self.sent = sent
+		self.completed = completed
+		self.failed = failed
+		self.p50 = p50
+		self.p90 = p90
+		self.p99 = p99
+		self.p999 = p999
+		self.maximum = maximum
+		self.saturated = saturated
+
+LOAD_POINT_SCHEMA = {
+	'target': ar.Float8(),
+	'achieved': ar.Float8(),
+	'sent': int,
+	'completed': int,
+	'failed': int,
+	'p50': ar.Float8(),
+	'p90': ar.Float8(),
+	'p99': ar.Float8(),
+	'p999': ar.Float8(),
+	'maximum': ar.Float8(),
+	'saturated': ar.Boolean(),
+}
+
+ar.bind(LoadPoint, object_schema=LOAD_POINT_SCHEMA)
+
+class LoadCurve(object):
+	def __init__(self, arrivals=None, connections=None, points=None):
+		self.arrivals = arrivals
+		self.connections = connections
+		self.points = points or []
+
+LOAD_CURVE_SCHEMA = {
+	'arrivals': ar.Unicode(),
+	'connections': int,
+	'points': ar.VectorOf(ar.UserDefined(LoadPoint)),
+}
+
+ar.bind(LoadCurve, object_schema=LOAD_CURVE_SCHEMA)
+
+CSV_FIELDS = ('target', 'achieved', 'sent', 'completed', 'failed', 'p50', 'p90', 'p99', 'p999', 'maximum', 'saturated')
+
+def write_curve(path, curve):
+	with open(path, 'w') as f:
+		f.write(','.join(CSV_FIELDS) + '\n')
+		for p in curve.points:
+			f.write(','.join(str(getattr(p, k)) for k in CSV_FIELDS) + '\n')
+
+#
+#
+class Step(object):
+	def __init__(self):
+		self.histogram = Histogram()
+		self.sent = 0
+		self.failed = 0
+
+async def until(t):
+	await asyncio.sleep(max(t - time.monotonic(), 0.0))
+
+async def request(aw, server, intended, seconds, step):
+	step.sent += 1
+	m = await aw.ask(ar.Enquiry(), (ar.Ack, ar.Nak), server, seconds=seconds)
+	if not isinstance(m, (ar.Ack, ar.Nak)):		# Timed out or aborted.
+		step.failed += 1
+		return
+	step.histogram.record((time.monotonic() - intended) * 1000000.0)
+
+async def run_step(aw, settings, servers, rate):
+	if settings.arrivals == CONSTANT:
+		gap = lambda: 1.0 / rate
+	else:
+		gap = lambda: random.expovariate(rate)
+
+	step = Step()
+	outstanding = set()
+	begun = time.monotonic()
+	ending = begun + settings.step_seconds
+	intended = begun
+	n = 0
+	try:
+		while True:
+			intended += gap()
+			if intended >= ending:
+				break
+			await until(intended)
+			if len(outstanding) >= MAXIMUM_OUTSTANDING:
+				step.failed += 1
+				continue
+			server = servers[n % len(servers)]
+			n += 1
+			t = asyncio.ensure_future(request(aw, server, intended, settings.seconds, step))
+			outstanding.add(t)
+			t.add_done_callback(outstanding.discard)
+		if outstanding:
+			await asyncio.gather(*outstanding)
+	except asyncio.CancelledError:				# Stopped, abandon the requests.
+		for t in list(outstanding):
+			t.cancel()
+		raise
+	elapsed = time.monotonic() - begun
+
+	h = step.histogram
+	def ms(p):
+		v = h.percentile(p)
+		return None if v is None else v / 1000.0
+	completed = h.total
+	achieved = completed / elapsed
+	saturated = achieved < rate * KNEE_RATIO or step.failed > 0
+	return LoadPoint(rate, achieved, step.sent, completed, step.failed,
+		ms(50), ms(90), ms(99), ms(99.9), ms(100), saturated)
+
+async def watch(aw, running):
+	await aw.select(ar.Stop)
+	running.cancel()
+
+async def generate(aw, settings):
+	servers = []
+	for _ in range(settings.connections or 1):
+		ar.connect(aw.point, settings.connecting_ipp)
+		m = await aw.select(ar.Connected, ar.NotConnected, ar.Stop)
+		if isinstance(m, ar.NotConnected):
+			return m
+		elif isinstance(m, ar.Stop):
+			return ar.Aborted()
+		servers.append(aw.return_address)
+
+	curve = LoadCurve(settings.arrivals, len(servers))
+	for i in range(settings.steps or 1):
+		rate = settings.rate + i * (settings.step or 0.0)
+		running = asyncio.ensure_future(run_step(aw, settings, servers, rate))
+		watcher = asyncio.ensure_future(watch(aw, running))
+		try:
+			p = await running
+		except asyncio.CancelledError:
+			for s in servers:
+				aw.point.send(ar.Close(), s)
+			return ar.Aborted()
+		finally:
+			watcher.cancel()
+		aw.point.console(f'Target {rate:.0f}/s, achieved {p.achieved:.0f}/s, p99 {p.p99}ms')
+		curve.points.append(p)
+		if p.saturated:
+			break
+
+	for s in servers:
+		aw.point.send(ar.Close(), s)
+
+	if settings.curve_file:
+		try:
+			write_curve(settings.curve_file, curve)
+		except OSError as e:
+			return ar.Faulted(f'cannot write curve "{settings.curve_file}"', str(e))
+	return curve
+
+def client(self, settings):
+	if settings.arrivals not in (CONSTANT, POISSON):
+		return ar.Faulted('cannot generate load', f'unknown arrivals "{settings.arrivals}"')
+	if not settings.rate or settings.rate <= 0.0:
+		return ar.Faulted('cannot generate load', 'rate must be positive')
+	return awaiting.run(self, generate, settings)
+
+ar.bind(client)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5013), seconds=3.0,
+	connections=8, arrivals=POISSON, rate=100.0, step=100.0, steps=10, step_seconds=5.0)
+
+if __name__ == '__main__':
+	ar.create_object(client, factory_settings=factory_settings)
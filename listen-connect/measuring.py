@@ -0,0 +1,133 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A histogram of latencies with bounded error and fixed memory.
+
+Recording every latency sample costs memory in proportion to the load.
+A Histogram counts values in buckets instead, in the style of the
+HdrHistogram;
+
+* values are integers in a fixed unit (e.g. microseconds),
+* values below 2 x 10^significant are counted exactly,
+* above that, each power of 2 is divided into the same number of
+  buckets, i.e. the error of any value is within 1 part in 10^significant,
+* values above the highest trackable are counted as the highest.
+
+Recording is a few integer operations and a list increment. Percentiles
+are the highest value equivalent to the bucket where the cumulative count
+reaches the percentile. Histograms with the same configuration can be
+added together.
+
+There is no correction for coordinated omission within the histogram.
+An open-loop client avoids the problem by recording latency from the
+intended time of each request, rather than from the actual send (see
+load-generator.py).
+'''
+import math
+
+__all__ = [
+	'Histogram',
+]
+
+class Histogram(object):
+	"""Counts of integer values, within a relative error.
+
+	:param highest: highest value that can be tracked
+	:type highest: int
+	:param significant: number of significant decimal digits, 1 to 5
+	:type significant: int
+	"""
+	def __init__(self, highest=3600 * 1000000, significant=3):
+		self.highest = highest
+		self.significant = significant
+		self.sub_bits = math.ceil(math.log2(2 * 10 ** significant))
+		self.sub_count = 1 << self.sub_bits
+		self.half = self.sub_count >> 1
+		top = max(highest.bit_length() - self.sub_bits, 0)
+		self.counts = [0] * ((top + 2) * self.half)
+		self.total = 0
+		self.sum = 0
+		self.minimum = None
+		self.maximum = None
+
+	def index(self, value):
+		if value < self.sub_count:
+			return value
+		b = value.bit_length() - self.sub_bits
+		return b * self.half + (value >> b)
+
+	def value(self, index):
+		"""Highest value equivalent to the bucket."""
+		b = max(index // self.half - 1, 0)
+		sub = index - b * self.half
+		return ((sub + 1) << b) - 1
+
+	def record(self, value, count=1):
+		"""Add a value, clamped to the trackable range."""
+		v = min(max(int(value), 0), self.highest)
+		self.counts[self.index(v)] += count
+		self.total += count
+		self.sum += v * count
+		if self.minimum is None or v < self.minimum:
+			self.minimum = v
+		if self.maximum is None or v > self.maximum:
+			self.maximum = v
+
+	def add(self, other):
+		"""Merge another histogram of the same configuration."""
+		if other.highest != self.highest or other.significant != self.significant:
+			raise ValueError('histograms of different configurations')
+		for i, c in enumerate(other.counts):
+			self.counts[i] += c
+		self.total += other.total
+		self.sum += other.sum
+		for v in (other.minimum, other.maximum):
+			if v is None:
+				continue
+			if self.minimum is None or v < self.minimum:
+				self.minimum = v
+			if self.maximum is None or v > self.maximum:
+				self.maximum = v
+
+	def percentile(self, p):
+		"""Value at the percentile, e.g. 99.9. Return None if empty."""
+		if self.total == 0:
+			return None
+		target = max(math.ceil(p / 100.0 * self.total), 1)
+		n = 0
+		for i, c in enumerate(self.counts):
+			n += c
+			if n >= target:
+				return min(self.value(i), self.maximum)
+		return self.maximum
+
+	def mean(self):
+		if self.total == 0:
+			return None
+		return self.sum / self.total
+
+	def reset(self):
+		self.counts = [0] * len(self.counts)
+		self.total = 0
+		self.sum = 0
+		self.minimum = None
+		self.maximum = None
@@ -0,0 +1,460 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Compact packing of registered messages, negotiated per connection.
+
+The default encoding of messages is the text-oriented ansar format, i.e.
+the same encoding used for settings and other files. This module adds
+a schema-driven packing of the fields of a message. The type information
+registered with ar.bind() is compiled into a table of struct-based field
+encoders and an instance of a listed message is reduced to a block of
+bytes. There are no field names, no type names and no punctuation.
+
+The block travels inside a Packed message that carries a small integer
+identifying the type. That message is still encoded by the networking
+machinery in the ansar format, i.e. the block is base64 within a text
+envelope. Packing is not a replacement for the default format; it pays
+where field names and values dominate a message, not for small ones.
+Messages without fields (e.g. Enquiry and Ack) and messages that pack
+to fewer bytes than the minimum are sent as they are.
+
+The integer is the position of the type in the table, which means that
+both ends must have the same table. This is checked during a Hello-Welcome exchange at the start of each session;
+
+* connecting end sends Hello, listing the codecs it can use and the
+  types in its table,
+* listening end replies with Welcome, selecting the first codec it
+  shares with the connecting end and that can be supported by the
+  two tables,
+* a mismatch or lack of support results in the default codec.
+
+Types are packed as follows;
+* Boolean, Byte, Integer2-8, Unsigned2-8, Float4-8 - fixed size struct,
+* Block, String, Unicode - 4-byte length and the bytes,
+* UserDefined - null bitmap and then the non-null fields in schema order,
+  or the codec registered for the class with custom_codec(), e.g. the
+  NumericArray in arraying.py,
+* VectorOf - 4-byte count and then the elements,
+* ArrayOf - the elements.
+
+A type that uses any other declaration (e.g. Any, Address) is rejected
+at table construction.
+
+Sessions can also agree on compression, with either codec. The Hello
+proposes an algorithm and the Welcome confirms it (or not), where the
+two tables match. After that each end packs the listed messages that
+have fields and compresses those blocks that are larger than its own
+threshold, sending a Compressed message. Smaller blocks are sent as
+Packed with the packed codec and as the original message with the
+default codec. Messages without fields (e.g. Enquiry and Ack) are never
+packed, i.e. agreeing on compression adds nothing to their cost. The
+Encoding object keeps the counts, bytes and time needed to judge whether
+compression is paying off.
+
+ServerList is a message with real fields, i.e. a list of addresses
+that packs to more than the minimum and, with a few dozen entries,
+more than the threshold. It is the traffic of the codec examples and
+benchmark.
+'''
+import struct
+import time
+import zlib
+import ansar.connect as ar
+
+__all__ = [
+	'ANSAR_CODEC',
+	'PACKED_CODEC',
+	'CODECS',
+	'ZLIB_COMPRESSION',
+	'COMPRESSIONS',
+	'COMPRESSION_THRESHOLD',
+	'PACKED_MINIMUM',
+	'Packed',
+	'Compressed',
+	'Hello',
+	'Welcome',
+	'ServerList',
+	'PackingError',
+	'custom_codec',
+	'Packing',
+	'CompressionMetrics',
+	'Encoding',
+]
+
+ANSAR_CODEC = 'ansar'
+PACKED_CODEC = 'packed'
+CODECS = (ANSAR_CODEC, PACKED_CODEC)
+
+ZLIB_COMPRESSION = 'zlib'
+COMPRESSIONS = (ZLIB_COMPRESSION,)
+
+COMPRESSION_THRESHOLD = 1024		# Default, in bytes.
+PACKED_MINIMUM = 64					# Smaller blocks go as the original message.
+DECOMPRESSED_LIMIT = 64 * 1024 * 1024
+
+# Envelope for an encoded message and the
+# session opening exchange.
+class Packed(object):
+	def __init__(self, code=0, block=None):
+		self.code = code
+		self.block = block or bytearray()
+
+PACKED_SCHEMA = {
+	'code': int,
+	'block': ar.Block(),
+}
+
+ar.bind(Packed, object_schema=PACKED_SCHEMA, copy_before_sending=False)
+
+class Compressed(object):
+	def __init__(self, code=0, block=None):
+		self.code = code
+		self.block = block or bytearray()
+
+ar.bind(Compressed, object_schema=PACKED_SCHEMA, copy_before_sending=False)
+
+class Hello(object):
+	def __init__(self, codecs=None, types=None, compression=None):
+		self.codecs = codecs or []
+		self.types = types or []
+		self.compression = compression
+
+HELLO_SCHEMA = {
+	'codecs': ar.VectorOf(ar.Unicode()),
+	'types': ar.VectorOf(ar.Unicode()),
+	'compression': ar.Unicode(),
+}
+
+ar.bind(Hello, object_schema=HELLO_SCHEMA)
+
+class Welcome(object):
+	def __init__(self, codec=None, compression=None):
+		self.codec = codec
+		self.compression = compression
+
+WELCOME_SCHEMA = {
+	'codec': ar.Unicode(),
+	'compression': ar.Unicode(),
+}
+
+ar.bind(Welcome, object_schema=WELCOME_SCHEMA)
+
+# A message with fields, for the examples.
+class ServerList(object):
+	def __init__(self, servers=None):
+		self.servers = servers or []
+
+SERVER_LIST_SCHEMA = {
+	'servers': ar.VectorOf(ar.UserDefined(ar.HostPort)),
+}
+
+ar.bind(ServerList, object_schema=SERVER_LIST_SCHEMA)
+
+#
+#
+class PackingError(Exception):
+	pass
+
+LENGTH = struct.Struct('<I')
+
+FIXED = {
+	ar.Boolean: '?',
+	ar.Byte: 'B',
+	ar.Integer2: 'h',
+	ar.Integer4: 'i',
+	ar.Integer8: 'q',
+	ar.Unsigned2: 'H',
+	ar.Unsigned4: 'I',
+	ar.Unsigned8: 'Q',
+	ar.Float4: 'f',
+	ar.Float8: 'd',
+}
+
+def fixed_codec(code):
+	s = struct.Struct('<' + code)
+	pack, unpack_from, size = s.pack, s.unpack_from, s.size
+	def put(b, v):
+		b += pack(v)
+	def get(m, i):
+		return unpack_from(m, i)[0], i + size
+	return put, get
+
+def bytes_codec(to_python):
+	def put(b, v):
+		b += LENGTH.pack(len(v))
+		b += v
+	def get(m, i):
+		n = LENGTH.unpack_from(m, i)[0]
+		i += LENGTH.size
+		return to_python(m[i:i + n]), i + n
+	return put, get
+
+def unicode_codec():
+	def put(b, v):
+		e = v.encode('utf-8')
+		b += LENGTH.pack(len(e))
+		b += e
+	def get(m, i):
+		n = LENGTH.unpack_from(m, i)[0]
+		i += LENGTH.size
+		return str(m[i:i + n], 'utf-8'), i + n
+	return put, get
+
+def vector_codec(element, size=None):
+	put_e, get_e = element
+	def put(b, v):
+		if size is None:
+			b += LENGTH.pack(len(v))
+		elif len(v) != size:
+			raise PackingError(f'array of {len(v)} elements, expecting {size}')
+		for e in v:
+			put_e(b, e)
+	def get(m, i):
+		if size is None:
+			n = LENGTH.unpack_from(m, i)[0]
+			i += LENGTH.size
+		else:
+			n = size
+		v = []
+		for _ in range(n):
+			e, i = get_e(m, i)
+			v.append(e)
+		return v, i
+	return put, get
+
+def structure_codec(message):
+	schema = message.__art__.value or {}
+	fields = [(k, compile_codec(t)) for k, t in schema.items()]
+	nulls = (len(fields) + 7) // 8
+
+	def put(b, v):
+		bitmap = 0
+		for j, (k, _) in enumerate(fields):
+			if getattr(v, k, None) is None:
+				bitmap |= 1 << j
+		b += bitmap.to_bytes(nulls, 'little')
+		for j, (k, c) in enumerate(fields):
+			if not bitmap & (1 << j):
+				c[0](b, getattr(v, k))
+
+	def get(m, i):
+		bitmap = int.from_bytes(m[i:i + nulls], 'little')
+		i += nulls
+		v = message()
+		for j, (k, c) in enumerate(fields):
+			if bitmap & (1 << j):
+				setattr(v, k, None)
+				continue
+			e, i = c[1](m, i)
+			setattr(v, k, e)
+		return v, i
+	return put, get
+
+CUSTOM = {}
+
+def custom_codec(message, codec):
+	"""Pack the registered class with codec(), i.e. a function returning put and get."""
+	CUSTOM[message] = codec
+
+def message_codec(message):
+	codec = CUSTOM.get(message, None)
+	if codec is not None:
+		return codec()
+	return structure_codec(message)
+
+def compile_codec(t):
+	c = type(t)
+	code = FIXED.get(c, None)
+	if code is not None:
+		return fixed_codec(code)
+	elif c is ar.Block:
+		return bytes_codec(bytearray)
+	elif c is ar.String:
+		return bytes_codec(bytes)
+	elif c is ar.Unicode:
+		return unicode_codec()
+	elif c is ar.UserDefined:
+		return message_codec(t.element)
+	elif c is ar.VectorOf:
+		return vector_codec(compile_codec(t.element))
+	elif c is ar.ArrayOf:
+		return vector_codec(compile_codec(t.element), t.size)
+	raise PackingError(f'cannot pack "{c.__name__}"')
+
+class Packing(object):
+	"""A table of the registered messages that can be packed.
+
+	:param message: registered message classes
+	:type message: tuple of classes
+	"""
+	def __init__(self, *message):
+		self.message = message
+		self.code = {}
+		self.table = []
+		self.unfielded = set()			# Nothing to pack.
+		for i, m in enumerate(message):
+			put, get = message_codec(m)
+			self.code[m] = (i, put)
+			self.table.append(get)
+			if m not in CUSTOM and not m.__art__.value:
+				self.unfielded.add(m)
+
+	def types(self):
+		"""Portable names of the packed types, in table order."""
+		return [m.__art__.path for m in self.message]
+
+	def pack(self, message):
+		"""Reduce a message to a Packed envelope. Return the envelope."""
+		i, put = self.code[message.__class__]
+		b = bytearray()
+		put(b, message)
+		return Packed(i, b)
+
+	def unpack(self, packed):
+		"""Recover the original message from a Packed envelope. Return the message. Raise PackingError."""
+		if not 0 <= packed.code < len(self.table):
+			raise PackingError(f'unknown type code {packed.code}')
+		get = self.table[packed.code]
+		b = memoryview(packed.block)
+		try:
+			m, i = get(b, 0)
+		except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+			raise PackingError(f'cannot unpack type code {packed.code} ({e})')
+		if i != len(b):
+			raise PackingError(f'unpacked {i} of {len(b)} bytes (type code {packed.code})')
+		return m
+
+class CompressionMetrics(object):
+	"""Running totals for the compression within one session."""
+	def __init__(self):
+		self.compressed = 0			# Number of blocks.
+		self.skipped = 0			# Number of blocks under the threshold.
+		self.original = 0			# Bytes before compression.
+		self.reduced = 0			# Bytes after compression.
+		self.compress_time = 0.0	# Seconds.
+		self.decompressed = 0
+		self.decompress_time = 0.0
+
+	def ratio(self):
+		"""Compressed bytes as a fraction of the original bytes."""
+		if self.original == 0:
+			return 1.0
+		return self.reduced / self.original
+
+	def saved(self):
+		return self.original - self.reduced
+
+	def sample(self):
+		"""Named values suitable for Point.sample()."""
+		return dict(compressed=self.compressed, skipped=self.skipped,
+			original=self.original, reduced=self.reduced,
+			ratio=f'{self.ratio():.3f}', saved=self.saved(),
+			compress_time=f'{self.compress_time:.6f}',
+			decompressed=self.decompressed,
+			decompress_time=f'{self.decompress_time:.6f}')
+
+class Encoding(object):
+	"""The codec and compression in effect for one session.
+
+	:param packing: table of types that can be packed
+	:type packing: Packing
+	:param codec: initial codec
+	:type codec: str
+	:param threshold: compress blocks larger than this, in bytes
+	:type threshold: int
+	:param minimum: send smaller blocks as the original message, in bytes
+	:type minimum: int
+	"""
+	def __init__(self, packing, codec=ANSAR_CODEC, threshold=None, minimum=None):
+		self.packing = packing
+		self.codec = codec
+		self.compression = None
+		self.threshold = COMPRESSION_THRESHOLD if threshold is None else threshold
+		self.minimum = PACKED_MINIMUM if minimum is None else minimum
+		self.metrics = CompressionMetrics()
+
+	def hello(self, codec, compression=None):
+		"""Produce the opening message for the connecting end."""
+		codecs = [codec] if codec == ANSAR_CODEC else [codec, ANSAR_CODEC]
+		return Hello(codecs, self.packing.types(), compression)
+
+	def welcome(self, hello, codec, compression=None):
+		"""Select the session codec and compression at the listening end. Return the reply."""
+		matched = hello.types == self.packing.types()
+		selected = ANSAR_CODEC
+		if codec == PACKED_CODEC and PACKED_CODEC in hello.codecs and matched:
+			selected = PACKED_CODEC
+		self.codec = selected
+		if matched and compression in COMPRESSIONS and hello.compression == compression:
+			self.compression = compression
+		return Welcome(selected, self.compression)
+
+	def welcomed(self, welcome):
+		"""Accept the session codec and compression at the connecting end."""
+		self.codec = welcome.codec if welcome.codec in CODECS else ANSAR_CODEC
+		self.compression = welcome.compression if welcome.compression in COMPRESSIONS else None
+
+	def outbound(self, message):
+		"""Prepare a message for sending. Return the message or an envelope."""
+		c = message.__class__
+		if self.codec != PACKED_CODEC and self.compression is None:
+			return message
+		if c not in self.packing.code or c in self.packing.unfielded:
+			return message
+		p = self.packing.pack(message)
+		n = len(p.block)
+		if self.compression is None or n <= self.threshold:
+			if self.compression is not None:
+				self.metrics.skipped += 1
+			if self.codec != PACKED_CODEC or n < self.minimum:
+				return message
+			return p
+		t = time.perf_counter()
+		b = zlib.compress(p.block)
+		self.metrics.compress_time += time.perf_counter() - t
+		if len(b) >= n:				# No gain.
+			self.metrics.skipped += 1
+			return p if self.codec == PACKED_CODEC else message
+		self.metrics.compressed += 1
+		self.metrics.original += n
+		self.metrics.reduced += len(b)
+		return Compressed(p.code, bytearray(b))
+
+	def inbound(self, envelope):
+		"""Recover the message from a received envelope, or a message sent as it is. Return the message. Raise PackingError."""
+		if not isinstance(envelope, (Packed, Compressed)):
+			return envelope
+		if isinstance(envelope, Compressed):
+			t = time.perf_counter()
+			d = zlib.decompressobj()
+			try:
+				b = d.decompress(envelope.block, DECOMPRESSED_LIMIT)
+			except zlib.error as e:
+				raise PackingError(f'cannot decompress ({e})')
+			if d.unconsumed_tail:
+				raise PackingError(f'decompressed size exceeds {DECOMPRESSED_LIMIT} bytes')
+			if not d.eof or d.unused_data:
+				raise PackingError('compressed block is cut short or has trailing bytes')
+			self.metrics.decompress_time += time.perf_counter() - t
+			self.metrics.decompressed += 1
+			envelope = Packed(envelope.code, bytearray(b))
+		return self.packing.unpack(envelope)
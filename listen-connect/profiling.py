@@ -0,0 +1,294 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Profiling of a running process, on demand and for a limited period.
+
+Nothing is collected outside a capture. A capture is started in one of
+two ways;
+
+* in-band - a Profile message sent to the server (e.g. by
+  connect-client-profile.py). The server enables cProfile on its
+  dispatching thread and starts a Sampler. At the end of the period
+  the profile is stored in pstats format and the server replies with
+  Profiled, including the time spent in each handler,
+* signal - SIGPROF (e.g. kill -PROF <pid>) starts a Sampler only.
+  There is no thread or message involved at the moment of the signal.
+
+A Sampler is a thread that wakes at a fixed interval and records the
+stack of every other thread, from sys._current_frames(). At the end of
+the period the stacks are stored in collapsed-stack format, i.e. one
+line per distinct stack with a count, ready for flamegraph.pl or
+https://www.speedscope.app. It also stores a table of handlers, i.e.
+the name, the number of samples and the estimated seconds.
+
+Handlers are recognized by name, i.e. the <machine>_<STATE>_<message>
+convention used for every state machine (e.g. Session_RUNNING_Enquiry,
+Server_RUNNING_Accepted). With cProfile the figures for each handler
+are the number of calls and the cumulative time. With sampling the
+time is estimated from the number of samples where the handler was on
+the stack.
+
+Files are placed in a folder configured at the server. Their names
+include the process id and the time of the capture. The folder and the
+period are checked as a capture begins, i.e. a missing or unwritable
+folder or a period that is not positive is refused with a ValueError.
+Failure to store the files is reported by the capture, not raised.
+'''
+import os
+import re
+import sys
+import time
+import signal
+import cProfile
+import pstats
+import threading
+from collections import Counter
+import ansar.connect as ar
+
+__all__ = [
+	'SAMPLE_INTERVAL',
+	'MAXIMUM_SECONDS',
+	'Profile',
+	'HandlerTime',
+	'Profiled',
+	'is_handler',
+	'Sampler',
+	'Capture',
+	'SignalCapture',
+	'on_signal',
+]
+
+SAMPLE_INTERVAL = 0.005		# Seconds between samples.
+MAXIMUM_SECONDS = 300.0		# Longest capture.
+
+HANDLER = re.compile(r'^[A-Z][A-Za-z0-9]*_[A-Z][A-Z0-9]*_[A-Z][A-Za-z0-9]*$')
+
+# Request a capture.
+class Profile(object):
+	def __init__(self, seconds=None):
+		self.seconds = seconds
+
+PROFILE_SCHEMA = {
+	'seconds': ar.Float8(),
+}
+
+ar.bind(Profile, object_schema=PROFILE_SCHEMA)
+
+class HandlerTime(object):
+	def __init__(self, name=None, calls=None, seconds=None):
+		self.name = name
+		self.calls = calls
+		self.seconds = seconds
+
+HANDLER_TIME_SCHEMA = {
+	'name': ar.Unicode(),
+	'calls': int,
+	'seconds': ar.Float8(),
+}
+
+ar.bind(HandlerTime, object_schema=HANDLER_TIME_SCHEMA)
+
+# Result of an in-band capture.
+class Profiled(object):
+	def __init__(self, seconds=None, pstats_file=None, folded_file=None, samples=0, handlers=None):
+		self.seconds = seconds
+		self.pstats_file = pstats_file
+		self.folded_file = folded_file
+		self.samples = samples
+		self.handlers = handlers or []
+
+PROFILED_SCHEMA = {
+	'seconds': ar.Float8(),
+	'pstats_file': ar.Unicode(),
+	'folded_file': ar.Unicode(),
+	'samples': int,
+	'handlers': ar.VectorOf(ar.UserDefined(HandlerTime)),
+}
+
+ar.bind(Profiled, object_schema=PROFILED_SCHEMA)
+
+#
+#
+def is_handler(name):
+	"""Decide if a function name follows the handler convention."""
+	return HANDLER.match(name) is not None
+
+def stem(folder):
+	"""Common part of the names of the files for one capture."""
+	when = time.strftime('%Y%m%d-%H%M%S')
+	return os.path.join(folder, f'profile-{os.getpid()}-{when}')
+
+def checked(folder, seconds):
+	"""Verify the folder and period of a capture. Return the period, up to the maximum. Raise ValueError."""
+	if seconds is None or seconds <= 0.0:
+		raise ValueError(f'period of {seconds} seconds')
+	if not os.path.isdir(folder) or not os.access(folder, os.W_OK):
+		raise ValueError(f'folder "{folder}" is missing or not writable')
+	return min(seconds, MAXIMUM_SECONDS)
+
+def label(code):
+	name = os.path.basename(code.co_filename)
+	return f'{code.co_name} ({name}:{code.co_firstlineno})'.replace(';', ',')
+
+class Sampler(threading.Thread):
+	"""Periodic capture of the stacks of all other threads.
+
+	:param folded_file: where to store the collapsed stacks
+	:type folded_file: str
+	:param seconds: duration of the capture, or None to wait for stop()
+	:type seconds: float
+	:param interval: time between samples
+	:type interval: float
+	"""
+	def __init__(self, folded_file, seconds=None, interval=SAMPLE_INTERVAL):
+		threading.Thread.__init__(self, name='sampler', daemon=True)
+		self.folded_file = folded_file
+		self.seconds = seconds
+		self.interval = interval
+		self.halt = threading.Event()
+		self.stacks = Counter()
+		self.handler = Counter()
+		self.samples = 0
+		self.failed = None			# Reason the files were not stored.
+
+	def sample(self):
+		name = {t.ident: t.name for t in threading.enumerate()}
+		for ident, frame in sys._current_frames().items():
+			if ident == self.ident:
+				continue
+			f = []
+			innermost = None
+			while frame is not None:
+				code = frame.f_code
+				f.append(label(code))
+				if innermost is None and is_handler(code.co_name):
+					innermost = code.co_name
+				frame = frame.f_back
+			f.append(name.get(ident, str(ident)))
+			f.reverse()
+			self.stacks[';'.join(f)] += 1
+			if innermost is not None:
+				self.handler[innermost] += 1
+		self.samples += 1
+
+	def run(self):
+		deadline = None if self.seconds is None else time.monotonic() + self.seconds
+		while not self.halt.wait(self.interval):
+			self.sample()
+			if deadline is not None and time.monotonic() >= deadline:
+				break
+		try:
+			self.store()
+		except OSError as e:
+			self.failed = str(e)
+
+	def store(self):
+		with open(self.folded_file, 'w') as f:
+			for s, n in self.stacks.most_common():
+				f.write(f'{s} {n}\n')
+		with open(self.folded_file.replace('.folded', '.handlers'), 'w') as f:
+			for k, n in self.handler.most_common():
+				f.write(f'{k}\t{n}\t{n * self.interval:.6f}\n')
+
+	def stop(self):
+		"""End the capture and wait for the files."""
+		self.halt.set()
+		self.join()
+
+class Capture(object):
+	"""An in-band capture, i.e. cProfile and sampling.
+
+	Must be started and ended on the same thread, i.e. within the
+	handlers of a non-threaded machine. cProfile sees the calls made
+	on that thread, which is the thread that dispatches all the
+	non-threaded machines in the process.
+
+	:param folder: where to store the files
+	:type folder: str
+	:param seconds: duration of the capture
+	:type seconds: float
+	"""
+	def __init__(self, folder, seconds):
+		self.seconds = checked(folder, seconds)
+		s = stem(folder)
+		self.pstats_file = s + '.pstats'
+		self.profile = cProfile.Profile()
+		self.sampler = Sampler(s + '.folded')
+
+	def begin(self):
+		self.sampler.start()
+		self.profile.enable()
+
+	def end(self):
+		"""Stop collection and store the files. Return Profiled or Faulted."""
+		self.profile.disable()
+		self.sampler.stop()
+		if self.sampler.failed is not None:
+			return ar.Faulted('cannot store samples', self.sampler.failed)
+		try:
+			self.profile.dump_stats(self.pstats_file)
+		except OSError as e:
+			return ar.Faulted('cannot store profile', str(e))
+
+		handlers = []
+		stats = pstats.Stats(self.profile).stats
+		for (_, _, name), (_, calls, _, cumulative, _) in stats.items():
+			if is_handler(name):
+				handlers.append(HandlerTime(name, calls, cumulative))
+		handlers.sort(key=lambda h: h.seconds, reverse=True)
+
+		return Profiled(self.seconds, self.pstats_file, self.sampler.folded_file,
+			self.sampler.samples, handlers)
+
+class SignalCapture(object):
+	"""Sampling captures started by a signal. Signals during a capture are ignored.
+
+	:param folder: where to store the files
+	:type folder: str
+	:param seconds: duration of each capture
+	:type seconds: float
+	"""
+	def __init__(self, folder, seconds):
+		self.folder = folder
+		self.seconds = checked(folder, seconds)
+		self.sampler = None
+
+	def configure(self, folder, seconds):
+		"""Change the folder and period of later captures, e.g. from the settings. Raise ValueError."""
+		self.seconds = checked(folder, seconds)
+		self.folder = folder
+
+	def catch(self, number, frame):
+		r = self.sampler
+		if r is not None and r.is_alive():
+			return
+		self.sampler = Sampler(stem(self.folder) + '.folded', seconds=self.seconds)
+		self.sampler.start()
+
+def on_signal(folder, seconds, number=signal.SIGPROF):
+	"""Start a sampling capture on receipt of a signal. Return the SignalCapture.
+
+	Must be called on the main thread, i.e. before create_object().
+	"""
+	s = SignalCapture(folder, seconds)
+	signal.signal(number, s.catch)
+	return s
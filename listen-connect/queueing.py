@@ -0,0 +1,154 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Priority lanes for the messages waiting at a busy machine.
+
+Messages are delivered to a machine in the order they were sent. A
+machine with a backlog of application requests does not see a Stop
+until every request ahead of it has been processed. This module moves
+the backlog out of the delivery queue and into lanes held by the
+machine;
+
+* the handler for an application message does no more than add it to
+  a lane, i.e. the delivery queue moves quickly,
+* the machine sends itself a Drain message to process the lanes, one
+  message per Drain, highest priority lane first,
+* a further Drain is sent while messages remain, i.e. other messages
+  (e.g. Stop) are dispatched between each unit of queued work.
+
+Control messages are not queued. A Stop sent to the machine is
+dispatched directly, after at most one unit of work. There are two
+lanes for the messages that are queued, in order of priority;
+* SESSION - e.g. Abandoned, Closed, passed on by a session that has
+  lost its connection,
+* APPLICATION - everything else.
+
+Further types (e.g. an application heartbeat) can be added to LANE_OF.
+Queued messages from a client that has gone can be dropped with
+discard().
+
+The time spent waiting in each lane is recorded, i.e. the time between
+put() and get(). Counts, mean and maximum queue times are logged as a
+sample for each lane.
+'''
+import time
+from collections import deque
+import ansar.connect as ar
+
+__all__ = [
+	'SESSION',
+	'APPLICATION',
+	'LANES',
+	'Drain',
+	'LaneMetrics',
+	'Lanes',
+]
+
+SESSION = 'session'
+APPLICATION = 'application'
+LANES = (SESSION, APPLICATION)
+
+LANE_OF = {
+	ar.Abandoned: SESSION,
+	ar.Closed: SESSION,
+}
+
+# Process the next message in the lanes.
+class Drain(object):
+	pass
+
+ar.bind(Drain, copy_before_sending=False)
+
+#
+#
+class LaneMetrics(object):
+	def __init__(self, lane):
+		self.lane = lane
+		self.queued = 0
+		self.depth = 0
+		self.peak = 0
+		self.waited = 0.0
+		self.maximum = 0.0
+		self.count = 0
+		self.discarded = 0
+
+	def sample(self, point, **kv):
+		"""Log the figures as a sample and reset the timing figures."""
+		mean = self.waited / self.count if self.count else 0.0
+		point.sample(lane=self.lane, queued=self.queued, depth=self.depth, peak=self.peak, discarded=self.discarded,
+			waited=f'{mean * 1000.0:.3f}', maximum=f'{self.maximum * 1000.0:.3f}', **kv)
+		self.waited = 0.0
+		self.maximum = 0.0
+		self.count = 0
+
+class Lanes(object):
+	"""Messages waiting for processing, in priority order."""
+	def __init__(self):
+		self.lane = {k: deque() for k in LANES}
+		self.metrics = {k: LaneMetrics(k) for k in LANES}
+
+	def lane_of(self, message):
+		"""Classify a message. Return the name of its lane."""
+		return LANE_OF.get(type(message), APPLICATION)
+
+	def put(self, lane, message, return_address):
+		"""Add the message to a lane."""
+		q = self.lane[lane]
+		q.append((message, return_address, time.monotonic()))
+		m = self.metrics[lane]
+		m.queued += 1
+		m.depth = len(q)
+		m.peak = max(m.peak, m.depth)
+
+	def get(self):
+		"""Take the next message in priority order. Return the message and return address, or None."""
+		for k in LANES:
+			q = self.lane[k]
+			if q:
+				message, return_address, put = q.popleft()
+				waited = time.monotonic() - put
+				m = self.metrics[k]
+				m.depth = len(q)
+				m.waited += waited
+				m.maximum = max(m.maximum, waited)
+				m.count += 1
+				return message, return_address
+		return None
+
+	def discard(self, lane, return_address):
+		"""Drop the messages in a lane from the return address. Return the number dropped."""
+		q = self.lane[lane]
+		kept = deque(e for e in q if e[1] != return_address)
+		n = len(q) - len(kept)
+		self.lane[lane] = kept
+		m = self.metrics[lane]
+		m.depth = len(kept)
+		m.discarded += n
+		return n
+
+	def __len__(self):
+		return sum(len(q) for q in self.lane.values())
+
+	def sample(self, point, **kv):
+		"""Log the figures for every lane."""
+		for k in LANES:
+			self.metrics[k].sample(point, **kv)
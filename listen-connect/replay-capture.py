@@ -0,0 +1,181 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Replay of captured traffic against a server.
+
+Loads a file recorded by listen-server-capture.py (see capturing.py) and
+plays the sessions and their messages against the configured server.
+Every recorded session becomes a connection and every recorded message
+is sent over that connection, in the recorded order. Sessions overlap
+as they did in the capture;
+
+* speed 1.0 - sessions open and messages are sent at the recorded
+  times, i.e. the original concurrency and rate,
+* speed N - the same, N times faster,
+* speed 0 - as fast as possible, i.e. all the sessions open at once and
+  each message is sent on receipt of the response to the previous.
+
+With a speed, the sending of messages does not wait for responses,
+i.e. a slow server accumulates outstanding requests as it would with
+the original clients. Connections are made one at a time, so sessions
+that open within the same instant are spread by the connect time.
+
+Each session runs as a coroutine within the thread of the function
+object (see awaiting.py). Any response is accepted and the time from
+the send is recorded as a latency sample. A Stop (e.g. control-c)
+cancels every session, i.e. the replay ends at once.
+
+Output is a BenchReport (see benchmarking.py).
+'''
+import time
+import asyncio
+import ansar.connect as ar
+import awaiting
+from capturing import CaptureReader, CaptureError
+from benchmarking import BenchReport
+
+class Settings(object):
+	def __init__(self, capture_file=None, connecting_ipp=None, speed=None, seconds=None):
+		self.capture_file = capture_file
+		self.connecting_ipp = connecting_ipp or ar.HostPort()
+		self.speed = speed
+		self.seconds = seconds
+
+SETTINGS_SCHEMA = {
+	'capture_file': str,
+	'connecting_ipp': ar.UserDefined(ar.HostPort),
+	'speed': float,
+	'seconds': float,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+# Figures across all sessions.
+class Replayed(object):
+	def __init__(self):
+		self.latency = []
+		self.sent = 0
+		self.failed = 0
+		self.stopped = False
+
+async def until(t):
+	await asyncio.sleep(max(t - time.monotonic(), 0.0))
+
+async def timed_ask(aw, message, server, seconds, replayed):
+	replayed.sent += 1
+	t = time.perf_counter()
+	m = await aw.ask(message, (ar.Other,), server, seconds=seconds)
+	if not isinstance(m, ar.Other):				# Timed out or aborted.
+		replayed.failed += 1
+		return
+	replayed.latency.append((time.perf_counter() - t) * 1000.0)
+
+async def session(aw, settings, workload, recorded, begun, base, connecting, replayed):
+	speed = settings.speed
+	def scheduled(offset):
+		return begun + (offset - base) / speed
+
+	if speed:
+		await until(scheduled(recorded.opened))
+	if replayed.stopped:
+		return
+
+	async with connecting:						# One at a time, see above.
+		ar.connect(aw.point, settings.connecting_ipp)
+		m = await aw.select(ar.Connected, ar.NotConnected, ar.Stop)
+	if isinstance(m, ar.Stop):
+		replayed.stopped = True
+		return
+	elif isinstance(m, ar.NotConnected):
+		replayed.failed += len(recorded.messages)
+		return
+	server = aw.return_address
+
+	pending = []
+	for offset, code in recorded.messages:
+		if replayed.stopped:
+			break
+		message = workload.message(code)
+		if speed:
+			await until(scheduled(offset))
+			pending.append(asyncio.ensure_future(timed_ask(aw, message, server, settings.seconds, replayed)))
+		else:
+			await timed_ask(aw, message, server, settings.seconds, replayed)
+	if pending:
+		await asyncio.gather(*pending)
+
+	if speed and recorded.closed is not None:
+		await until(scheduled(recorded.closed))
+	aw.point.send(ar.Close(), server)
+
+async def watch(aw, replayed, sessions):
+	await aw.stopping.wait()
+	replayed.stopped = True
+	for s in sessions:
+		s.cancel()
+
+async def replay(aw, settings, workload):
+	sessions = sorted(workload.sessions.values(), key=lambda r: r.opened)
+	base = sessions[0].opened if sessions else 0.0
+	connecting = asyncio.Lock()
+	replayed = Replayed()
+
+	begun = time.monotonic()
+	running = [asyncio.ensure_future(session(aw, settings, workload, r, begun, base, connecting, replayed)) for r in sessions]
+	watcher = asyncio.ensure_future(watch(aw, replayed, running))
+	try:
+		await asyncio.gather(*running)
+	except asyncio.CancelledError:
+		if not replayed.stopped:
+			raise
+	watcher.cancel()
+	elapsed = time.monotonic() - begun
+
+	if replayed.stopped:
+		return ar.Aborted()
+
+	report = BenchReport('replay')
+	report.add('sessions', 'count', [len(sessions)])
+	report.add('sent', 'count', [replayed.sent])
+	report.add('failed', 'count', [replayed.failed])
+	report.add('elapsed', 's', [elapsed])
+	report.add('throughput', 'requests/s', [len(replayed.latency) / elapsed if elapsed else 0.0])
+	report.add('latency', 'ms', replayed.latency)
+	return report
+
+def client(self, settings):
+	if not settings.capture_file:
+		return ar.Faulted('cannot replay', 'no capture file')
+	try:
+		workload = CaptureReader(settings.capture_file).load()
+	except (OSError, CaptureError) as e:
+		return ar.Faulted(f'cannot load "{settings.capture_file}"', str(e))
+	return awaiting.run(self, replay, settings, workload)
+
+ar.bind(client)
+
+#
+#
+factory_settings = Settings(connecting_ipp=ar.HostPort(host='127.0.0.1', port=5013), speed=1.0, seconds=3.0)
+
+if __name__ == '__main__':
+	ar.create_object(client, factory_settings=factory_settings)
@@ -0,0 +1,425 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A cache of host name resolutions for the connects of the ansar runtime.
+
+The ansar runtime passes the host of a HostPort straight to the connect
+of a socket, i.e. every connect attempt by every ConnectToAddress is a
+blocking lookup, on the thread that services all the sockets of the
+process. A call to cache_resolution(), before the first connect, routes
+the lookups through a ResolverCache shared by the whole process. The
+connect never waits for a lookup; all queries run on threads of the
+cache;
+
+* numeric addresses are passed through untouched,
+* names are looked up in the hosts file (re-read when it changes) and
+  then with a DNS query for A records, to the nameservers of
+  /etc/resolv.conf or those configured, e.g. a local stub resolver
+  (see stub-resolver.py),
+* an answer is cached for the TTL of the records, limited to the
+  minimum and maximum configured. Entries from the hosts file use
+  the default TTL,
+* a name that does not exist is cached for the negative TTL, i.e. the
+  minimum of the SOA in the answer, or the configured negative TTL
+  where there is none. A negative entry fails the connect at once,
+* an entry used within the last quarter of its TTL is refreshed by a
+  background thread. An expired entry is still used (i.e. stale) while
+  its refresh runs,
+* a refresh that fails to find an address (e.g. a timeout) keeps the
+  previous address, and tries again after the negative TTL. Only an
+  answer from a nameserver that the name does not exist replaces it,
+* a name that is not in the cache fails the connect at once with a
+  temporary failure (EAI_AGAIN) and is looked up in the background,
+  i.e. the retry of the ConnectToAddress finds it. Calling prefetch()
+  for the hosts, before the connects, avoids that first failure,
+* concurrent lookups of the same name share a single query.
+
+Where there is no nameserver (or a query fails), resolution falls back
+to the standard getaddrinfo() with the default TTL. Only IPv4 (A) is
+queried, as for the sockets of the runtime.
+
+ResolverFigures are the counts of hits, misses and queries since the
+creation of the cache.
+'''
+import os
+import time
+import random
+import socket
+import struct
+import threading
+import types
+import ansar.connect as ar
+
+__all__ = [
+	'ResolverFigures',
+	'Resolution',
+	'ResolverCache',
+	'cache_resolution',
+	'query',
+	'hosts_file',
+	'resolv_conf',
+]
+
+A = 1
+CNAME = 5
+SOA = 6
+IN = 1
+NXDOMAIN = 3
+
+HEADER = struct.Struct('>HHHHHH')
+FIXED = struct.Struct('>HHIH')			# Type, class, TTL and length of a record.
+
+class QueryError(Exception):
+	pass
+
+def encode_name(name):
+	b = bytearray()
+	for label in name.rstrip('.').split('.'):
+		e = label.encode('idna')
+		if not e or len(e) > 63:
+			raise QueryError(f'bad name "{name}"')
+		b.append(len(e))
+		b += e
+	b.append(0)
+	return bytes(b)
+
+def skip_name(m, i):
+	"""Offset following the name at i, i.e. labels or a pointer."""
+	while True:
+		n = m[i]
+		if n == 0:
+			return i + 1
+		if n & 0xC0 == 0xC0:
+			return i + 2
+		i += n + 1
+
+def query(name, nameserver, seconds):
+	"""Ask the nameserver for the A records of the name. Return a list of addresses and the TTL.
+
+	An empty list is a name without addresses, with the negative TTL
+	from the SOA or None.
+	"""
+	ident = random.getrandbits(16)
+	request = HEADER.pack(ident, 0x0100, 1, 0, 0, 0) + encode_name(name) + struct.pack('>HH', A, IN)
+	with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+		s.settimeout(seconds)
+		s.sendto(request, nameserver)
+		while True:
+			m, _ = s.recvfrom(4096)
+			if len(m) >= HEADER.size and HEADER.unpack_from(m)[0] == ident:
+				break
+
+	ident, flags, qd, an, ns, _ = HEADER.unpack_from(m)
+	if flags & 0x0200:
+		raise QueryError('truncated answer')
+	rcode = flags & 0x000F
+	if rcode not in (0, NXDOMAIN):
+		raise QueryError(f'server failure (rcode {rcode})')
+
+	i = HEADER.size
+	for _ in range(qd):
+		i = skip_name(m, i) + 4
+	addresses = []
+	ttl = None
+	for _ in range(an):
+		i = skip_name(m, i)
+		t, c, record_ttl, size = FIXED.unpack_from(m, i)
+		i += FIXED.size
+		if c == IN and t in (A, CNAME):
+			ttl = record_ttl if ttl is None else min(ttl, record_ttl)
+			if t == A and size == 4:
+				addresses.append(socket.inet_ntoa(m[i:i + 4]))
+		i += size
+	if addresses:
+		return addresses, ttl
+
+	negative = None
+	for _ in range(ns):
+		i = skip_name(m, i)
+		t, c, record_ttl, size = FIXED.unpack_from(m, i)
+		i += FIXED.size
+		if t == SOA:
+			j = skip_name(m, skip_name(m, i))
+			minimum = struct.unpack_from('>IIIII', m, j)[4]
+			negative = min(record_ttl, minimum)
+		i += size
+	return [], negative
+
+def hosts_file(path):
+	"""Read a hosts file. Return a map of name to the first IPv4 address."""
+	table = {}
+	with open(path) as f:
+		for line in f:
+			field = line.split('#', 1)[0].split()
+			if len(field) < 2 or ':' in field[0]:
+				continue
+			for name in field[1:]:
+				table.setdefault(name.lower(), field[0])
+	return table
+
+def resolv_conf(path='/etc/resolv.conf'):
+	"""The nameservers of the system. Return a list of (address, port)."""
+	servers = []
+	try:
+		with open(path) as f:
+			for line in f:
+				field = line.split()
+				if len(field) >= 2 and field[0] == 'nameserver' and ':' not in field[1]:
+					servers.append((field[1], 53))
+	except OSError:
+		pass
+	return servers
+
+#
+#
+class ResolverFigures(object):
+	def __init__(self, hits=0, misses=0, negative_hits=0, stale=0, refreshes=0, queries=0, failures=0, query_ms=None):
+		self.hits = hits
+		self.misses = misses
+		self.negative_hits = negative_hits
+		self.stale = stale
+		self.refreshes = refreshes
+		self.queries = queries
+		self.failures = failures
+		self.query_ms = query_ms
+
+RESOLVER_FIGURES_SCHEMA = {
+	'hits': int,
+	'misses': int,
+	'negative_hits': int,
+	'stale': int,
+	'refreshes': int,
+	'queries': int,
+	'failures': int,
+	'query_ms': ar.Float8(),
+}
+
+ar.bind(ResolverFigures, object_schema=RESOLVER_FIGURES_SCHEMA)
+
+class Resolution(object):
+	"""A cached answer. No address is a negative entry."""
+	def __init__(self, name, address, ttl, source):
+		self.name = name
+		self.address = address
+		self.ttl = ttl
+		self.source = source
+		self.expires = time.monotonic() + ttl
+		self.refreshing = False
+
+def numeric(host):
+	try:
+		socket.inet_aton(host)
+	except OSError:
+		return False
+	return host.count('.') == 3
+
+class ResolverCache(object):
+	"""Resolutions of host names, shared by the threads of a process.
+
+	:param nameservers: list of (address, port) or None for the system
+	:type nameservers: list
+	:param hosts: path of the hosts file, or None
+	:type hosts: str
+	:param default_ttl: seconds for hosts file and getaddrinfo answers
+	:type default_ttl: float
+	:param negative_ttl: seconds for a missing name without SOA
+	:type negative_ttl: float
+	:param minimum_ttl: lower limit of cached seconds
+	:type minimum_ttl: float
+	:param maximum_ttl: upper limit of cached seconds
+	:type maximum_ttl: float
+	:param seconds: time allowed for a query
+	:type seconds: float
+	"""
+	def __init__(self, nameservers=None, hosts='/etc/hosts', default_ttl=60.0, negative_ttl=10.0,
+			minimum_ttl=1.0, maximum_ttl=3600.0, seconds=2.0):
+		self.nameservers = resolv_conf() if nameservers is None else nameservers
+		self.hosts = hosts
+		self.default_ttl = default_ttl
+		self.negative_ttl = negative_ttl
+		self.minimum_ttl = minimum_ttl
+		self.maximum_ttl = maximum_ttl
+		self.seconds = seconds
+
+		self.cache = {}
+		self.pending = {}
+		self.guard = threading.Lock()
+		self.figures = ResolverFigures()
+		self.query_time = 0.0
+		self.hosts_table = {}
+		self.hosts_changed = None
+
+	def hosts_lookup(self, name):
+		if not self.hosts:
+			return None
+		try:
+			changed = os.stat(self.hosts).st_mtime
+			if changed != self.hosts_changed:
+				self.hosts_table = hosts_file(self.hosts)
+				self.hosts_changed = changed
+		except OSError:
+			return None
+		return self.hosts_table.get(name, None)
+
+	def clamp(self, ttl):
+		return min(max(ttl, self.minimum_ttl), self.maximum_ttl)
+
+	def resolve(self, name):
+		"""Look up the name, without the cache. Return a Resolution."""
+		address = self.hosts_lookup(name)
+		if address is not None:
+			return Resolution(name, address, self.default_ttl, 'hosts')
+
+		for nameserver in self.nameservers:
+			t = time.perf_counter()
+			try:
+				addresses, ttl = query(name, nameserver, self.seconds)
+			except (OSError, QueryError, struct.error, IndexError):
+				self.figures.failures += 1
+				continue
+			finally:
+				self.figures.queries += 1
+				self.query_time += time.perf_counter() - t
+			if addresses:
+				return Resolution(name, addresses[0], self.clamp(ttl), 'dns')
+			ttl = self.negative_ttl if ttl is None else ttl
+			return Resolution(name, None, self.clamp(ttl), 'dns')
+
+		try:
+			a = socket.getaddrinfo(name, None, socket.AF_INET, socket.SOCK_STREAM)
+		except socket.gaierror:
+			return Resolution(name, None, self.clamp(self.negative_ttl), 'system')
+		return Resolution(name, a[0][4][0], self.clamp(self.default_ttl), 'system')
+
+	def store(self, name, r):
+		"""Keep a new resolution, or the previous address where the new one is only a failure."""
+		with self.guard:
+			p = self.cache.get(name, None)
+			if r.address is None and r.source != 'dns' and p is not None and p.address is not None:
+				p.expires = time.monotonic() + self.clamp(self.negative_ttl)
+				p.refreshing = False
+				return
+			self.cache[name] = r
+
+	def fetch(self, name):
+		"""Start a lookup on a thread of its own, unless one is running. Return an event set at its end."""
+		with self.guard:
+			waiting = self.pending.get(name, None)
+			if waiting is not None:
+				return waiting
+			self.pending[name] = waiting = threading.Event()
+
+		def background():
+			try:
+				self.store(name, self.resolve(name))
+			finally:
+				with self.guard:
+					del self.pending[name]
+				waiting.set()
+		threading.Thread(target=background, name='resolver-lookup', daemon=True).start()
+		return waiting
+
+	def lookup(self, host):
+		"""Find the resolution of the host, without waiting. Return a Resolution, or None on a miss."""
+		name = host.lower().rstrip('.')
+		now = time.monotonic()
+		with self.guard:
+			r = self.cache.get(name, None)
+			if r is None:
+				self.figures.misses += 1
+				address = self.hosts_lookup(name)		# No query, no waiting.
+				if address is not None:
+					r = Resolution(name, address, self.default_ttl, 'hosts')
+					self.cache[name] = r
+					return r
+			elif now >= r.expires:
+				self.figures.stale += 1
+			elif r.address is None:
+				self.figures.negative_hits += 1
+			else:
+				self.figures.hits += 1
+			if r is not None and (r.refreshing or r.expires - now >= r.ttl / 4.0):
+				return r
+			if r is not None:
+				r.refreshing = True
+				self.figures.refreshes += 1
+		self.fetch(name)
+		return r
+
+	def address(self, host):
+		"""The address to connect to. Raise socket.gaierror for a missing or unknown name."""
+		if numeric(host):
+			return host
+		r = self.lookup(host)
+		if r is None:
+			raise socket.gaierror(socket.EAI_AGAIN, f'Temporary failure in name resolution (resolving "{host}")')
+		if r.address is None:
+			raise socket.gaierror(socket.EAI_NONAME, f'Name or service not known (cached "{host}")')
+		return r.address
+
+	def prefetch(self, *hosts, seconds=None):
+		"""Resolve in the background, e.g. the servers of a GroupTable before its creation.
+
+		With seconds, wait up to that long for the lookups, e.g. on the
+		thread of a function object. Never on the thread of the sockets.
+		"""
+		waiting = [self.fetch(h.lower().rstrip('.')) for h in hosts if not numeric(h)]
+		if seconds is None:
+			return
+		ending = time.monotonic() + seconds
+		for w in waiting:
+			w.wait(max(ending - time.monotonic(), 0.0))
+
+	def report(self):
+		"""Return a copy of the figures."""
+		f = self.figures
+		ms = self.query_time * 1000.0 / f.queries if f.queries else None
+		return ResolverFigures(f.hits, f.misses, f.negative_hits, f.stale, f.refreshes, f.queries, f.failures, ms)
+
+#
+#
+resolver = None
+
+def cache_resolution(cache):
+	"""Route the host lookups of subsequent connects through the cache. Return True on success."""
+	global resolver
+	try:
+		from ansar.connect import socketry
+	except ImportError:
+		return False
+	resolver = cache
+	base = socketry.socket.socket
+	if getattr(base, 'resolving', False):
+		return True
+
+	class Resolving(base):
+		resolving = True
+
+		def connect_ex(self, address):
+			host, port = address[:2]
+			return base.connect_ex(self, (resolver.address(host), port))
+
+	patched = types.ModuleType('socket')
+	patched.__dict__.update(socketry.socket.__dict__)
+	patched.socket = Resolving
+	socketry.socket = patched
+	return True
@@ -0,0 +1,351 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''TLS for the connections of the ansar runtime, with session resumption.
+
+The sockets of the ansar runtime carry plain bytes (the encrypted
+option of ar.listen() and ar.connect() is a key exchange of the ansar
+runtime, not TLS). TLS is added by a pair of local relays;
+
+* a TlsTerminator accepts TLS connections at the public address of a
+  server and relays the plain bytes to the ansar listen, e.g. at a
+  port on the loopback interface,
+* a TlsTunnel accepts plain connections at a local address of a
+  client and relays them over TLS to the server, i.e. the client
+  connects to the tunnel with ar.connect().
+
+A full handshake (certificate, key exchange) costs a few milliseconds,
+on every connect. A TlsTunnel keeps the session of the most recent
+connection to each server address in a SessionCache, and offers it on
+the next connect. The server accepts the session ticket and the
+connection resumes, without the certificate and the full exchange.
+With TLS 1.3 the ticket arrives after the handshake, i.e. a session
+is stored once the first bytes from the server have been read.
+
+TlsSettings are a member of the settings of the examples, e.g. with
+the file names of the certificate and key of the server (see the
+certs target in the Makefile) and the certificate that a client
+trusts. A connect and handshake that takes longer than
+HANDSHAKE_SECONDS (e.g. a client that connects and sends nothing) is a
+failure. Relays run on threads of their own, one for each connection,
+i.e. all the reads and writes of a TLS socket are on the one thread.
+An end of the plain bytes in one direction is passed on as a half
+close where the receiving end is plain, and ends the connection where
+it is TLS.
+'''
+import ssl
+import time
+import socket
+import selectors
+import threading
+import ansar.connect as ar
+
+__all__ = [
+	'TlsSettings',
+	'TlsFigures',
+	'SessionCache',
+	'server_context',
+	'client_context',
+	'TlsTerminator',
+	'TlsTunnel',
+]
+
+BLOCK = 64 * 1024
+HANDSHAKE_SECONDS = 10.0		# Limit on a connect and handshake.
+
+class TlsSettings(object):
+	def __init__(self, enabled=False, certificate=None, key=None, authority=None, server_name=None,
+			resume=True, tickets=True):
+		self.enabled = enabled
+		self.certificate = certificate
+		self.key = key
+		self.authority = authority
+		self.server_name = server_name
+		self.resume = resume
+		self.tickets = tickets
+
+TLS_SETTINGS_SCHEMA = {
+	'enabled': ar.Boolean(),
+	'certificate': str,
+	'key': str,
+	'authority': str,
+	'server_name': str,
+	'resume': ar.Boolean(),
+	'tickets': ar.Boolean(),
+}
+
+ar.bind(TlsSettings, object_schema=TLS_SETTINGS_SCHEMA)
+
+class TlsFigures(object):
+	def __init__(self, connections=0, full=0, resumed=0, failed=0, handshake_ms=None):
+		self.connections = connections
+		self.full = full
+		self.resumed = resumed
+		self.failed = failed
+		self.handshake_ms = handshake_ms
+
+TLS_FIGURES_SCHEMA = {
+	'connections': int,
+	'full': int,
+	'resumed': int,
+	'failed': int,
+	'handshake_ms': ar.Float8(),
+}
+
+ar.bind(TlsFigures, object_schema=TLS_FIGURES_SCHEMA)
+
+def server_context(tls):
+	"""A context for the accepting end. Raise OSError or ssl.SSLError."""
+	c = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+	c.load_cert_chain(tls.certificate, tls.key)
+	if not tls.tickets:
+		c.options |= ssl.OP_NO_TICKET
+		c.num_tickets = 0
+	return c
+
+def client_context(tls):
+	"""A context for the connecting end, trusting the authority. Raise OSError or ssl.SSLError."""
+	c = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+	if tls.authority:
+		c.load_verify_locations(tls.authority)
+	else:
+		c.load_default_certs()
+	return c
+
+class SessionCache(object):
+	"""The latest TLS session for each server address."""
+	def __init__(self):
+		self.session = {}
+		self.guard = threading.Lock()
+
+	def get(self, address):
+		with self.guard:
+			return self.session.get(address, None)
+
+	def put(self, address, session):
+		if session is None:
+			return
+		with self.guard:
+			self.session[address] = session
+
+	def discard(self, address):
+		with self.guard:
+			self.session.pop(address, None)
+
+#
+#
+class Direction(object):
+	"""The bytes from one end of a relay to the other."""
+	def __init__(self, source, sink, received=None):
+		self.source = source
+		self.sink = sink
+		self.received = received
+		self.waiting = b''
+		self.ended = False
+
+	def move(self):
+		"""Write or read a block, without blocking. Return None, or the socket and events to wait for."""
+		if self.waiting:
+			try:
+				n = self.sink.send(self.waiting)
+			except ssl.SSLWantReadError:
+				return self.sink, selectors.EVENT_READ
+			except (ssl.SSLWantWriteError, BlockingIOError):
+				return self.sink, selectors.EVENT_WRITE
+			self.waiting = self.waiting[n:]
+			return None
+		try:
+			b = self.source.recv(BLOCK)
+		except ssl.SSLWantWriteError:
+			return self.source, selectors.EVENT_WRITE
+		except (ssl.SSLWantReadError, BlockingIOError):
+			return self.source, selectors.EVENT_READ
+		if not b:
+			self.ended = True
+			if not isinstance(self.sink, ssl.SSLSocket):
+				self.sink.shutdown(socket.SHUT_WR)
+			return None
+		if self.received is not None:
+			self.received()
+			self.received = None
+		self.waiting = b
+		return None
+
+def relay(a, b, received=None):
+	"""Copy bytes both ways until both directions end, or a TLS end closes, then close both."""
+	directions = (Direction(a, b, received), Direction(b, a))
+	selector = selectors.DefaultSelector()
+	try:
+		for s in (a, b):
+			s.setblocking(False)
+		while True:
+			waiting = {}
+			moved = False
+			for d in directions:
+				if d.ended:
+					continue
+				w = d.move()
+				if w is None:
+					moved = True
+					continue
+				s, events = w
+				waiting[s] = waiting.get(s, 0) | events
+			if all(d.ended for d in directions):
+				break
+			if any(d.ended and isinstance(d.sink, ssl.SSLSocket) for d in directions):
+				break
+			if moved:
+				continue
+			for s, events in waiting.items():
+				selector.register(s, events)
+			selector.select()
+			for s in waiting:
+				selector.unregister(s)
+	except (OSError, ssl.SSLError):
+		pass
+	selector.close()
+	for s in (a, b):
+		try:
+			s.close()
+		except OSError:
+			pass
+
+def start_relay(a, b, received=None):
+	for s in (a, b):					# Relays forward small writes as they are.
+		s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	threading.Thread(target=relay, args=(a, b, received), name='tls-relay', daemon=True).start()
+
+class Relay(threading.Thread):
+	"""Accept connections at the address and pass each to connected()."""
+	def __init__(self, listening):
+		threading.Thread.__init__(self, name='tls-listen', daemon=True)
+		self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		self.server.bind(listening)
+		self.server.listen(128)
+		self.listening = self.server.getsockname()
+		self.figures = TlsFigures()
+		self.handshake_time = 0.0
+		self.guard = threading.Lock()
+
+	def run(self):
+		while True:
+			try:
+				s, _ = self.server.accept()
+			except OSError:			# Closed by end().
+				break
+			threading.Thread(target=self.connected, args=(s,), name='tls-connect', daemon=True).start()
+
+	def connected(self, s):
+		pass
+
+	def counted(self, resumed, seconds):
+		with self.guard:
+			f = self.figures
+			f.connections += 1
+			if resumed:
+				f.resumed += 1
+			else:
+				f.full += 1
+			self.handshake_time += seconds
+			f.handshake_ms = self.handshake_time * 1000.0 / f.connections
+
+	def failed(self):
+		with self.guard:
+			self.figures.failed += 1
+
+	def end(self):
+		self.server.close()
+
+class TlsTerminator(Relay):
+	"""TLS at the listening address, plain bytes to the backend.
+
+	:param listening: host and port for clients
+	:type listening: tuple
+	:param backend: host and port of the ansar listen
+	:type backend: tuple
+	:param context: from server_context()
+	:type context: ssl.SSLContext
+	"""
+	def __init__(self, listening, backend, context):
+		Relay.__init__(self, listening)
+		self.backend = backend
+		self.context = context
+
+	def connected(self, s):
+		started = time.perf_counter()
+		try:
+			s.settimeout(HANDSHAKE_SECONDS)
+			secured = self.context.wrap_socket(s, server_side=True)
+			secured.settimeout(None)
+		except (OSError, ssl.SSLError):
+			s.close()
+			self.failed()
+			return
+		self.counted(secured.session_reused, time.perf_counter() - started)
+		try:
+			plain = socket.create_connection(self.backend)
+		except OSError:
+			secured.close()
+			return
+		start_relay(secured, plain)
+
+class TlsTunnel(Relay):
+	"""Plain bytes at the local address, TLS to the server.
+
+	:param listening: local host and port, e.g. port 0 for any
+	:type listening: tuple
+	:param server: host and port of the TlsTerminator
+	:type server: tuple
+	:param context: from client_context()
+	:type context: ssl.SSLContext
+	:param server_name: name expected in the certificate
+	:type server_name: str
+	:param cache: sessions for resumption, or None
+	:type cache: SessionCache
+	"""
+	def __init__(self, listening, server, context, server_name, cache=None):
+		Relay.__init__(self, listening)
+		self.remote = server
+		self.context = context
+		self.server_name = server_name
+		self.cache = cache
+
+	def connected(self, s):
+		session = self.cache.get(self.remote) if self.cache is not None else None
+		started = time.perf_counter()
+		try:
+			raw = socket.create_connection(self.remote, timeout=HANDSHAKE_SECONDS)
+			secured = self.context.wrap_socket(raw, server_hostname=self.server_name, session=session)
+			secured.settimeout(None)
+		except (OSError, ssl.SSLError):
+			if session is not None:
+				self.cache.discard(self.remote)
+			s.close()
+			self.failed()
+			return
+		self.counted(secured.session_reused, time.perf_counter() - started)
+
+		def received():					# Tickets have arrived.
+			if self.cache is not None:
+				self.cache.put(self.remote, secured.session)
+		start_relay(secured, s, received)
@@ -0,0 +1,195 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Dispatch of session requests across a fixed set of threads.
+
+All non-threaded machines in a process, including every Session of a
+server, are dispatched by a single thread. This module allows a server
+to spread the processing of requests over a number of shards, each a
+threaded machine with its own queue;
+
+* the server creates the shards at start-up and passes their addresses
+  to every session,
+* each session takes the next shard in rotation at start-up, i.e. all
+  the requests from one session go to the same shard and are processed
+  in the order they were received,
+* the session forwards each request in a Dispatched envelope, passing
+  the address of the client,
+* the shard adds the request to its priority lanes (see queueing.py),
+* the shard takes requests from the lanes, calls the respond function
+  and sends the result directly to the client,
+* a session that stops (e.g. the connection is lost) passes on an
+  Abandoned, which goes into the SESSION lane. It is processed ahead
+  of the backlog, dropping the requests of that client.
+
+Sessions remain responsible for the protocol (i.e. what is expected).
+Shards carry the cost of producing responses. With a free-threaded
+build of python the shards can run on separate cores.
+
+A Stop sent to a shard is processed ahead of any backlog of requests,
+i.e. after at most one request. Messages in the SESSION lane are
+processed ahead of those in the APPLICATION lane.
+
+Each shard keeps metrics, logged as a sample periodically and at
+termination;
+* handled - requests processed,
+* depth - messages waiting in the queue, at the last receive and the peak,
+* latency - the time between dispatch by the session and the entry
+  into a lane, mean and maximum in milliseconds,
+* lanes - queue figures for each lane, i.e. the time between entry and
+  the start of processing (see queueing.py).
+'''
+import time
+import itertools
+import ansar.connect as ar
+from queueing import APPLICATION, Drain, Lanes
+
+__all__ = [
+	'Dispatched',
+	'ShardMetrics',
+	'Shard',
+	'ShardRing',
+]
+
+# Envelope for a request on
+# its way to a shard.
+class Dispatched(object):
+	def __init__(self, request=None, dispatched=None):
+		self.request = request
+		self.dispatched = dispatched
+
+DISPATCHED_SCHEMA = {
+	'request': ar.Any(),
+	'dispatched': ar.Float8(),
+}
+
+ar.bind(Dispatched, object_schema=DISPATCHED_SCHEMA, copy_before_sending=False)
+
+class ShardRing(object):
+	"""The addresses of the shards, allocated in rotation.
+
+	:param shards: addresses of the shards
+	:type shards: list
+	"""
+	def __init__(self, shards):
+		self.shards = shards
+		self.count = itertools.count()
+
+	def next(self):
+		"""Select the shard for a new session. Return the shard address."""
+		return self.shards[next(self.count) % len(self.shards)]
+
+#
+#
+class ShardMetrics(object):
+	def __init__(self, index):
+		self.index = index
+		self.handled = 0
+		self.depth = 0
+		self.peak = 0
+		self.latency = 0.0
+		self.maximum = 0.0
+		self.count = 0
+
+	def received(self, depth, latency):
+		self.handled += 1
+		self.depth = depth
+		self.peak = max(self.peak, depth)
+		self.latency += latency
+		self.maximum = max(self.maximum, latency)
+		self.count += 1
+
+	def sample(self, point):
+		"""Log the figures as a sample and reset the latency figures."""
+		mean = self.latency / self.count if self.count else 0.0
+		point.sample(shard=self.index, handled=self.handled, depth=self.depth, peak=self.peak,
+			latency=f'{mean * 1000.0:.3f}', maximum=f'{self.maximum * 1000.0:.3f}')
+		self.latency = 0.0
+		self.maximum = 0.0
+		self.count = 0
+
+class INITIAL: pass
+class RUNNING: pass
+
+SAMPLE_PERIOD = 10.0
+
+class Shard(ar.Threaded, ar.StateMachine):
+	def __init__(self, index, respond):
+		ar.Threaded.__init__(self)
+		ar.StateMachine.__init__(self, INITIAL)
+		self.respond = respond				# Function from request to response.
+		self.metrics = ShardMetrics(index)
+		self.lanes = Lanes()
+		self.draining = False
+
+	def process(self, request, return_address):
+		if isinstance(request, ar.Abandoned):		# Client has gone.
+			self.lanes.discard(APPLICATION, return_address)
+			return
+		response = self.respond(request)
+		self.send(response, return_address)
+
+def Shard_INITIAL_Start(self, message):
+	self.start(ar.T1, SAMPLE_PERIOD, repeating=True)
+	return RUNNING
+
+def Shard_RUNNING_Dispatched(self, message):
+	latency = time.monotonic() - message.dispatched
+	self.metrics.received(self.message_queue.qsize(), latency)
+	request = message.request
+	lane = self.lanes.lane_of(request)
+	self.lanes.put(lane, request, self.return_address)
+	if not self.draining:
+		self.send(Drain(), self.address)
+		self.draining = True
+	return RUNNING
+
+def Shard_RUNNING_Drain(self, message):			# One unit of work.
+	r = self.lanes.get()
+	if r is not None:
+		self.process(*r)
+	if len(self.lanes):
+		self.send(Drain(), self.address)
+		return RUNNING
+	self.draining = False
+	return RUNNING
+
+def Shard_RUNNING_T1(self, message):
+	self.metrics.sample(self)
+	self.lanes.sample(self, shard=self.metrics.index)
+	return RUNNING
+
+def Shard_RUNNING_Stop(self, message):
+	self.metrics.sample(self)
+	self.lanes.sample(self, shard=self.metrics.index)
+	self.complete(ar.Aborted())
+
+SHARD_DISPATCH = {
+	INITIAL: (
+		(ar.Start,), ()
+	),
+	RUNNING: (
+		(Dispatched, Drain, ar.T1, ar.Stop), ()
+	),
+}
+
+ar.bind(Shard, SHARD_DISPATCH)
@@ -0,0 +1,23 @@
+# -*- mode: python -*-
+# Shared runtime build of the listen-connect executables.
+#
+# Used by "make BUILD_MODE=onedir build". Every executable listed in
+# the EXECUTABLES environment variable is analysed separately and then
+# all of them are collected into a single folder, dist/runtime. The
+# executables start from that folder directly, sharing one copy of
+# the python runtime and libraries. There is no archive to unpack
+# into a temporary folder, as there is for a --onefile executable.
+import os
+import shutil
+
+collected = []
+for name in os.environ.get('EXECUTABLES', '').split():
+	script = f'{name}.py'
+	if not os.path.isfile(script):
+		script = shutil.which(name)		# E.g. ansar-group.
+	a = Analysis([script], pathex=['.'])
+	pyz = PYZ(a.pure)
+	exe = EXE(pyz, a.scripts, [], exclude_binaries=True, name=name, console=True)
+	collected += [exe, a.binaries, a.datas]
+
+COLLECT(*collected, name='runtime')
@@ -0,0 +1,156 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''A local DNS stub, for checking the cache in resolving.py.
+
+Answers A queries over UDP from a configured table of records, each
+with a name, an address and a TTL. Any other name is answered with
+NXDOMAIN and an SOA carrying the negative TTL. Queries are counted
+by name, i.e. whether a client is using a cache shows in the counts
+logged at termination (control-c).
+
+Intended for use with connect-to-address-cached.py, e.g. the default
+record "listen-server.test" is the address of listen-server.py.
+'''
+import socket
+import struct
+import threading
+import ansar.connect as ar
+from resolving import HEADER, FIXED, A, IN, SOA, NXDOMAIN, skip_name
+
+class StubRecord(object):
+	def __init__(self, name=None, address=None, ttl=None):
+		self.name = name
+		self.address = address
+		self.ttl = ttl
+
+STUB_RECORD_SCHEMA = {
+	'name': str,
+	'address': str,
+	'ttl': int,
+}
+
+ar.bind(StubRecord, object_schema=STUB_RECORD_SCHEMA)
+
+class Settings(object):
+	def __init__(self, listening_ipp=None, records=None, negative_ttl=None):
+		self.listening_ipp = listening_ipp or ar.HostPort()
+		self.records = records or []
+		self.negative_ttl = negative_ttl
+
+SETTINGS_SCHEMA = {
+	'listening_ipp': ar.UserDefined(ar.HostPort),
+	'records': ar.VectorOf(ar.UserDefined(StubRecord)),
+	'negative_ttl': int,
+}
+
+ar.bind(Settings, object_schema=SETTINGS_SCHEMA)
+
+#
+#
+def read_name(m, i):
+	labels = []
+	while m[i]:
+		n = m[i]
+		labels.append(bytes(m[i + 1:i + 1 + n]).decode('ascii').lower())
+		i += n + 1
+	return '.'.join(labels)
+
+def answer(m, table, negative_ttl):
+	"""Build the response to a query. Return the bytes and the name, or None."""
+	ident, flags, qd, _, _, _ = HEADER.unpack_from(m)
+	if qd != 1:
+		return None
+	i = HEADER.size
+	name = read_name(m, i)
+	end = skip_name(m, i) + 4
+	t, c = struct.unpack_from('>HH', m, end - 4)
+	question = m[HEADER.size:end]
+	pointer = struct.pack('>H', 0xC000 | HEADER.size)
+
+	r = table.get(name, None)
+	if r is not None and t == A and c == IN:
+		record = pointer + FIXED.pack(A, IN, r.ttl, 4) + socket.inet_aton(r.address)
+		return HEADER.pack(ident, 0x8180, 1, 1, 0, 0) + question + record, name
+	if r is not None:						# Name exists, no such type.
+		return HEADER.pack(ident, 0x8180, 1, 0, 0, 0) + question, name
+
+	soa = encode_soa(negative_ttl)
+	record = pointer + FIXED.pack(SOA, IN, negative_ttl, len(soa)) + soa
+	return HEADER.pack(ident, 0x8180 | NXDOMAIN, 1, 0, 1, 0) + question + record, name
+
+def encode_soa(negative_ttl):
+	mname = b'\x04stub\x00'
+	rname = b'\x04stub\x00'
+	return mname + rname + struct.pack('>IIIII', 1, 3600, 600, 86400, negative_ttl)
+
+def serve(s, table, negative_ttl, counts, running):
+	while running.is_set():
+		try:
+			m, client = s.recvfrom(512)
+		except socket.timeout:
+			continue
+		except OSError:
+			break
+		try:
+			a = answer(m, table, negative_ttl)
+		except (struct.error, IndexError, UnicodeDecodeError):
+			continue
+		if a is None:
+			continue
+		response, name = a
+		counts[name] = counts.get(name, 0) + 1
+		s.sendto(response, client)
+
+def stub(self, settings):
+	table = {r.name.lower().rstrip('.'): r for r in settings.records}
+	s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	try:
+		s.bind(settings.listening_ipp.inet())
+	except OSError as e:
+		s.close()
+		return ar.Faulted(f'cannot listen at {settings.listening_ipp}', str(e))
+	s.settimeout(0.5)
+
+	counts = {}
+	running = threading.Event()
+	running.set()
+	t = threading.Thread(target=serve, args=(s, table, settings.negative_ttl, counts, running), daemon=True)
+	t.start()
+
+	self.select(ar.Stop)
+	running.clear()
+	t.join()
+	s.close()
+	for name, n in sorted(counts.items()):
+		self.console(f'Queries for "{name}": {n}')
+	return ar.Aborted()
+
+ar.bind(stub)
+
+#
+#
+factory_settings = Settings(listening_ipp=ar.HostPort('127.0.0.1', 5353),
+	records=[StubRecord('listen-server.test', '127.0.0.1', 30)], negative_ttl=10)
+
+if __name__ == '__main__':
+	ar.create_object(stub, factory_settings=factory_settings)
@@ -0,0 +1,263 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''End-to-end tracing of request-response exchanges.
+
+A request is sent inside a Traced envelope that carries a trace id and
+a list of Stamps, i.e. the name of a point in the exchange, the time and
+the process. Each end adds a stamp as the envelope passes through and
+the responding end returns the response in an envelope with the same
+trace id and all the stamps so far. The requesting end holds the
+complete history of the exchange;
+
+* send - requesting end, immediately before the send,
+* receive - responding end, as the envelope is dispatched,
+* reply - responding end, immediately before the reply,
+* dispatch - requesting end, as the response is dispatched.
+
+Encoding, socket writes and reads, decoding and queueing happen within
+the ansar sockets machinery, between send and receive (and reply and
+dispatch). They are measured together as the request and response
+spans;
+
+* request - send to receive,
+* handle - receive to reply,
+* response - reply to dispatch,
+* round-trip - send to dispatch.
+
+Stamps are wall-clock times, i.e. the request and response spans are
+only meaningful where the two processes share a clock (e.g. the same
+host or a host synchronized with NTP).
+
+Completed traces can be written to a file in Chrome trace-event format,
+for loading into chrome://tracing or https://ui.perfetto.dev. Every
+event carries the trace id in its args. The durations of each span
+are also collected into a TraceReport, with percentiles.
+'''
+import os
+import time
+import uuid
+import json
+import ansar.connect as ar
+
+__all__ = [
+	'SEND',
+	'RECEIVE',
+	'REPLY',
+	'DISPATCH',
+	'SPANS',
+	'Stamp',
+	'Traced',
+	'SpanFigures',
+	'TraceReport',
+	'Tracer',
+	'spans',
+	'percentile',
+	'TraceFile',
+	'Breakdown',
+]
+
+SEND = 'send'
+RECEIVE = 'receive'
+REPLY = 'reply'
+DISPATCH = 'dispatch'
+
+# Name, beginning and end of each span.
+SPANS = (
+	('request', SEND, RECEIVE),
+	('handle', RECEIVE, REPLY),
+	('response', REPLY, DISPATCH),
+	('round-trip', SEND, DISPATCH),
+)
+
+# A point in the life of a
+# traced exchange.
+class Stamp(object):
+	def __init__(self, point=None, at=None, process=None):
+		self.point = point
+		self.at = at
+		self.process = process
+
+STAMP_SCHEMA = {
+	'point': ar.Unicode(),
+	'at': ar.Float8(),
+	'process': ar.Unicode(),
+}
+
+ar.bind(Stamp, object_schema=STAMP_SCHEMA)
+
+# Envelope for a traced message.
+class Traced(object):
+	def __init__(self, trace_id=None, stamps=None, message=None):
+		self.trace_id = trace_id
+		self.stamps = stamps or []
+		self.message = message
+
+TRACED_SCHEMA = {
+	'trace_id': ar.Unicode(),
+	'stamps': ar.VectorOf(ar.UserDefined(Stamp)),
+	'message': ar.Any(),
+}
+
+ar.bind(Traced, object_schema=TRACED_SCHEMA, copy_before_sending=False)
+
+#
+#
+class SpanFigures(object):
+	def __init__(self, name=None, count=0, p50=None, p90=None, p99=None, maximum=None):
+		self.name = name
+		self.count = count
+		self.p50 = p50
+		self.p90 = p90
+		self.p99 = p99
+		self.maximum = maximum
+
+SPAN_FIGURES_SCHEMA = {
+	'name': ar.Unicode(),
+	'count': int,
+	'p50': ar.Float8(),
+	'p90': ar.Float8(),
+	'p99': ar.Float8(),
+	'maximum': ar.Float8(),
+}
+
+ar.bind(SpanFigures, object_schema=SPAN_FIGURES_SCHEMA)
+
+class TraceReport(object):
+	def __init__(self, traces=0, spans=None, trace_file=None):
+		self.traces = traces
+		self.spans = spans or []
+		self.trace_file = trace_file
+
+TRACE_REPORT_SCHEMA = {
+	'traces': int,
+	'spans': ar.VectorOf(ar.UserDefined(SpanFigures)),
+	'trace_file': ar.Unicode(),
+}
+
+ar.bind(TraceReport, object_schema=TRACE_REPORT_SCHEMA)
+
+#
+#
+class Tracer(object):
+	"""Start, stamp and answer traced messages.
+
+	:param process: name of this process in the stamps
+	:type process: str
+	"""
+	def __init__(self, process):
+		self.process = process
+
+	def begin(self, message):
+		"""Wrap a request in a new trace. Return the envelope."""
+		return Traced(uuid.uuid4().hex, [Stamp(SEND, time.time(), self.process)], message)
+
+	def stamp(self, traced, point):
+		"""Add a stamp for the named point."""
+		traced.stamps.append(Stamp(point, time.time(), self.process))
+
+	def reply(self, traced, message):
+		"""Wrap a response, continuing the trace. Return the envelope."""
+		stamps = traced.stamps + [Stamp(REPLY, time.time(), self.process)]
+		return Traced(traced.trace_id, stamps, message)
+
+def spans(traced):
+	"""Match the stamps in a completed trace against SPANS. Return a list of (name, begin, end)."""
+	at = {s.point: s for s in traced.stamps}
+	found = []
+	for name, b, e in SPANS:
+		begin, end = at.get(b, None), at.get(e, None)
+		if begin is None or end is None:
+			continue
+		found.append((name, begin, end))
+	return found
+
+def percentile(ordered, p):
+	"""Nearest-rank percentile of an ordered list."""
+	if not ordered:
+		return None
+	i = max(0, int(len(ordered) * p / 100.0 + 0.5) - 1)
+	return ordered[min(i, len(ordered) - 1)]
+
+class TraceFile(object):
+	"""Completed traces as Chrome trace events.
+
+	Each span is a complete event (i.e. "ph": "X"). The handle span
+	appears under the responding process and the others under the
+	requesting process, each span name on its own row.
+	"""
+	def __init__(self):
+		self.events = []
+		self.pid = {}
+		self.tid = {name: i for i, (name, _, _) in enumerate(SPANS)}
+
+	def process(self, name):
+		pid = self.pid.get(name, None)
+		if pid is None:
+			pid = len(self.pid) + 1
+			self.pid[name] = pid
+			self.events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': name}})
+		return pid
+
+	def add(self, traced):
+		"""Convert a completed trace to events."""
+		for name, begin, end in spans(traced):
+			where = begin.process if name == 'handle' else traced.stamps[0].process
+			self.events.append({
+				'name': name,
+				'cat': 'trace',
+				'ph': 'X',
+				'ts': begin.at * 1000000.0,
+				'dur': (end.at - begin.at) * 1000000.0,
+				'pid': self.process(where),
+				'tid': self.tid[name],
+				'args': {'trace_id': traced.trace_id},
+			})
+
+	def write(self, path):
+		"""Store the events in the JSON object format."""
+		t = path + '.tmp'
+		with open(t, 'w') as f:
+			json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+		os.replace(t, path)
+
+class Breakdown(object):
+	"""The durations of each span over many traces."""
+	def __init__(self):
+		self.traces = 0
+		self.duration = {name: [] for name, _, _ in SPANS}
+
+	def add(self, traced):
+		self.traces += 1
+		for name, begin, end in spans(traced):
+			self.duration[name].append(end.at - begin.at)
+
+	def report(self, trace_file=None):
+		"""Percentiles for each span, in milliseconds. Return a TraceReport."""
+		figures = []
+		for name, _, _ in SPANS:
+			d = sorted(self.duration[name])
+			if not d:
+				continue
+			ms = [s * 1000.0 for s in (percentile(d, 50), percentile(d, 90), percentile(d, 99), d[-1])]
+			figures.append(SpanFigures(name, len(d), *ms))
+		return TraceReport(self.traces, figures, trace_file)
@@ -0,0 +1,258 @@
+# Author: Scott Woods <scott.18.ansar@gmail.com.com>
+# MIT License
+#
+# Copyright (c) 2017-2024 Scott Woods
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+'''Socket options for the listening and connecting of the ansar runtime.
+
+The ansar runtime creates its own sockets, with fixed options, e.g.
+a listen backlog of 5 and system defaults for everything else. A
+SocketTuning is a settings member, i.e. it can be carried by the
+SETTINGS_SCHEMA of any example and changed with ansar settings or on
+the command line. A call to tune(), before the first ar.listen() or
+ar.connect(), applies it to every TCP socket that the runtime creates
+from then on;
+
+* nodelay - TCP_NODELAY, i.e. no Nagle delay of small writes,
+* send_buffer, receive_buffer - SO_SNDBUF and SO_RCVBUF, in bytes,
+* backlog - the listen backlog,
+* quickack - TCP_QUICKACK, i.e. no delayed acknowledgements (Linux),
+* user_timeout - TCP_USER_TIMEOUT in seconds, i.e. how long sent data
+  may go unacknowledged before the connection is dropped (Linux),
+* keepalive - SO_KEEPALIVE, with keep_idle, keep_interval (seconds)
+  and keep_count probes.
+
+A member left as None is left at the system default. Buffers are set on
+the listening socket before the listen, i.e. they are inherited by the
+accepted sockets and affect the window scaling of the handshake. The
+remaining options are set on the listening socket, on each accepted
+socket and on each client socket, before the connect.
+
+Effective values (i.e. as reported by getsockopt, after any doubling
+or clamping by the kernel) are recorded against the local address of
+each listening and client socket, until it is closed. The ansar
+Listening and Connected messages are fixed, so the values are collected
+with effective(), passing the listening_ipp or connected_ipp of those
+messages.
+
+The runtime also listens and connects internally, i.e. the socket pair
+that wakes its select() loop. That pair is created as the runtime
+starts, before any tune(), and is left as the runtime created it.
+Listens at an ephemeral port (i.e. port 0) are tuned as any other.
+
+The socket class of the runtime is also extended by reuse_port() (see
+handoff.py) and cache_resolution() (see resolving.py). Each extension
+is installed once, over whatever is in place, i.e. they can be used
+together and in any order. A later tune() replaces the options of the
+earlier.
+'''
+import socket
+import types
+import threading
+import ansar.connect as ar
+
+__all__ = [
+	'SocketTuning',
+	'EffectiveOptions',
+	'tune',
+	'effective',
+]
+
+class SocketTuning(object):
+	def __init__(self, nodelay=None, send_buffer=None, receive_buffer=None, backlog=None,
+			quickack=None, user_timeout=None, keepalive=None, keep_idle=None, keep_interval=None, keep_count=None):
+		self.nodelay = nodelay
+		self.send_buffer = send_buffer
+		self.receive_buffer = receive_buffer
+		self.backlog = backlog
+		self.quickack = quickack
+		self.user_timeout = user_timeout
+		self.keepalive = keepalive
+		self.keep_idle = keep_idle
+		self.keep_interval = keep_interval
+		self.keep_count = keep_count
+
+	def default(self):
+		"""True if nothing is to be changed."""
+		return all(v is None for v in self.__dict__.values())
+
+SOCKET_TUNING_SCHEMA = {
+	'nodelay': ar.Boolean(),
+	'send_buffer': int,
+	'receive_buffer': int,
+	'backlog': int,
+	'quickack': ar.Boolean(),
+	'user_timeout': float,
+	'keepalive': ar.Boolean(),
+	'keep_idle': int,
+	'keep_interval': int,
+	'keep_count': int,
+}
+
+ar.bind(SocketTuning, object_schema=SOCKET_TUNING_SCHEMA)
+
+class EffectiveOptions(object):
+	def __init__(self, nodelay=None, send_buffer=None, receive_buffer=None, backlog=None,
+			quickack=None, user_timeout=None, keepalive=None, keep_idle=None, keep_interval=None, keep_count=None):
+		self.nodelay = nodelay
+		self.send_buffer = send_buffer
+		self.receive_buffer = receive_buffer
+		self.backlog = backlog
+		self.quickack = quickack
+		self.user_timeout = user_timeout
+		self.keepalive = keepalive
+		self.keep_idle = keep_idle
+		self.keep_interval = keep_interval
+		self.keep_count = keep_count
+
+ar.bind(EffectiveOptions, object_schema=SOCKET_TUNING_SCHEMA)
+
+# Option, level, name and conversion to the
+# setsockopt value. Missing names (i.e. not
+# Linux) are skipped.
+TCP = socket.IPPROTO_TCP
+SOL = socket.SOL_SOCKET
+
+def flag(b):
+	return 1 if b else 0
+
+def ms(s):
+	return int(s * 1000.0)
+
+CONNECTION = (
+	('nodelay', TCP, 'TCP_NODELAY', flag),
+	('quickack', TCP, 'TCP_QUICKACK', flag),
+	('user_timeout', TCP, 'TCP_USER_TIMEOUT', ms),
+	('keepalive', SOL, 'SO_KEEPALIVE', flag),
+	('keep_idle', TCP, 'TCP_KEEPIDLE', int),
+	('keep_interval', TCP, 'TCP_KEEPINTVL', int),
+	('keep_count', TCP, 'TCP_KEEPCNT', int),
+)
+
+BUFFERS = (
+	('send_buffer', SOL, 'SO_SNDBUF', int),
+	('receive_buffer', SOL, 'SO_RCVBUF', int),
+)
+
+def apply(s, tuning, options):
+	for member, level, name, convert in options:
+		v = getattr(tuning, member)
+		n = getattr(socket, name, None)
+		if v is None or n is None:
+			continue
+		try:
+			s.setsockopt(level, n, convert(v))
+		except OSError:
+			pass
+
+def read(s, backlog=None):
+	e = EffectiveOptions(backlog=backlog)
+	for member, level, name, _ in CONNECTION + BUFFERS:
+		n = getattr(socket, name, None)
+		if n is None:
+			continue
+		try:
+			v = s.getsockopt(level, n)
+		except OSError:
+			continue
+		if name == 'TCP_USER_TIMEOUT':
+			v = v / 1000.0
+		elif name in ('TCP_NODELAY', 'TCP_QUICKACK', 'SO_KEEPALIVE'):
+			v = v != 0
+		setattr(e, member, v)
+	return e
+
+# Effective values by local address.
+current = None
+recorded = {}
+guard = threading.Lock()
+
+def local(s):
+	try:
+		return tuple(s.getsockname()[:2])
+	except OSError:
+		return None
+
+def record(s, backlog=None):
+	a = local(s)
+	if a is None:
+		return
+	e = read(s, backlog)
+	with guard:
+		recorded[a] = e
+	s.recorded = a
+
+def forget(s):
+	a = getattr(s, 'recorded', None)
+	with guard:
+		if a is not None:
+			recorded.pop(a, None)
+
+def effective(ipp):
+	"""Return the EffectiveOptions of the socket at the local address, or None."""
+	with guard:
+		return recorded.get((ipp.host, ipp.port), None)
+
+def tune(tuning):
+	"""Apply the tuning to the sockets subsequently created by the ansar runtime. Return True on success."""
+	global current
+	try:
+		from ansar.connect import socketry
+	except ImportError:
+		return False
+	current = tuning
+	base = socketry.socket.socket
+	if getattr(base, 'tuned', False):			# Installed by an earlier tune().
+		return True
+
+	class Tuned(base):
+		tuned = True
+
+		def bind(self, address):
+			apply(self, current, BUFFERS)
+			base.bind(self, address)
+
+		def listen(self, backlog=5):
+			apply(self, current, CONNECTION)
+			if current.backlog is not None:
+				backlog = current.backlog
+			base.listen(self, backlog)
+			record(self, backlog)
+
+		def accept(self):
+			accepted, address = base.accept(self)
+			apply(accepted, current, CONNECTION)
+			return accepted, address
+
+		def connect_ex(self, address):
+			apply(self, current, BUFFERS + CONNECTION)
+			e = base.connect_ex(self, address)
+			record(self)
+			return e
+
+		def close(self):
+			forget(self)
+			base.close(self)
+
+	patched = types.ModuleType('socket')
+	patched.__dict__.update(socketry.socket.__dict__)
+	patched.socket = Tuned
+	socketry.socket = patched
+	return True